@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Benchmark for parallel archive compression
+
+Writes a synthetic run directory, then archives it with the single threaded
+zipfile writer the backup used to have, and with create_archive for each codec
+and core count, and compares throughput, scaling with cores, speedup over the
+zipfile writer, and compression ratio.
+
+Usage:
+   $ python  bench_archive  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           bench_archive
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.dont_write_bytecode = 1
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin'))
+
+import sumologic_backup # pylint: disable=wrong-import-position
+
+PARSER = argparse.ArgumentParser(description="""
+Compares archive compression of a synthetic run across codecs and core counts
+""")
+
+PARSER.add_argument("-n", type=int, metavar='<items>', dest='ITEMS', default=20000, \
+                    help="set number of exports in the run (default: 20000)")
+
+PARSER.add_argument("-c", metavar='<cores>', dest='CORES', default=None, \
+                    help="set comma separated core counts (default: 1,2,4,... up to all cores)")
+
+PARSER.add_argument("-d", metavar='<dir>', dest='WORKDIR', default=None, \
+                    help="set directory to write into (default: temp)")
+
+ARGS = PARSER.parse_args()
+
+WORDS = ('error', 'warn', 'count', 'by', 'where', 'sum', 'avg', 'timeslice', 'host', \
+         'source', 'category', 'latency', 'status', 'parse', 'json', 'field', 'outlier')
+
+def synthetic_export(rng, number):
+    """
+    Returns a synthetic export: mostly searches, and some dashboards with many panels
+    """
+
+    def query_text(words):
+        return ' | '.join(' '.join(rng.choice(WORDS) for _word in range(rng.randint(3, 8))) \
+                          for _stage in range(max(words // 6, 1)))
+
+    if rng.random() < .75:
+        return {'type': 'SavedSearchWithScheduleSyncDefinition', 'name': f'search {number}', \
+                'search': {'queryText': query_text(rng.randint(10, 60)), \
+                           'defaultTimeRange': '-15m', 'byReceiptTime': False}}
+    return {'type': 'DashboardV2SyncDefinition', 'name': f'dashboard {number}', \
+            'panels': [ {'key': f'panel{panel:04d}', 'title': f'panel {panel}', \
+                         'queries': [ {'queryString': query_text(30), 'queryType': 'Logs'} ]} \
+                        for panel in range(rng.randint(4, 40)) ]}
+
+def synthetic_run(count, workdir):
+    """
+    Writes a run directory of count exports in folders of 100, returning it and its bytes
+    """
+
+    rng = random.Random(7)
+    rundir = os.path.join(tempfile.mkdtemp(prefix='bench_archive.', dir=workdir), \
+                          '20200101.000000')
+    size = 0
+    for number in range(count):
+        folder = os.path.join(rundir, 'content', f'{0xA000000000000000 + number // 100:016X}')
+        os.makedirs(folder, exist_ok=True)
+        payload = json.dumps(synthetic_export(rng, number)) + '\n'
+        with open(os.path.join(folder, f'{0xB000000000000000 + number:016X}.json'), 'w', \
+                  encoding='utf8') as exportobject:
+            exportobject.write(payload)
+        size += len(payload)
+    return rundir, size
+
+def zipfile_baseline(rundir):
+    """
+    Archives the run as the backup used to, one file at a time in a single thread
+    """
+
+    archivefile = os.path.join(os.path.dirname(rundir), 'baseline.zip')
+    with zipfile.ZipFile(archivefile, 'w', zipfile.ZIP_DEFLATED) as zipobject:
+        for foldername, _subfolders, filenames in os.walk(rundir):
+            for filename in filenames:
+                filepath = os.path.join(foldername, filename)
+                zipobject.write(filepath, os.path.relpath(filepath, rundir))
+    return archivefile
+
+def main():
+    """
+    Runs the benchmark for each codec and core count and prints a comparison table
+    """
+
+    (rundir, size) = synthetic_run(ARGS.ITEMS, ARGS.WORKDIR)
+    if ARGS.CORES:
+        corecounts = [ int(cores) for cores in ARGS.CORES.split(',') ]
+    else:
+        corecounts = [ 2**power for power in range(8) if 2**power < (os.cpu_count() or 1) ]
+        corecounts.append(os.cpu_count() or 1)
+
+    layouts = [ ('zipfile', None, [1]), ('deflate', False, corecounts) ]
+    if sumologic_backup.load_zstandard() is not None:
+        layouts += [ ('zstd', False, corecounts), ('zstd', True, corecounts) ]
+
+    print(f'{ARGS.ITEMS} exports, {size / 2**20:.1f} MiB, {os.cpu_count()} cores')
+    print(f'{"codec":>14} {"cores":>5} {"seconds":>8} {"MiB/s":>7} {"scaling":>8} ' + \
+          f'{"vs zipfile":>10} {"ratio":>6}')
+    baseline = None
+    for (codec, seekable, cores_list) in layouts:
+        single = None
+        for cores in cores_list:
+            starttime = time.perf_counter()
+            if codec == 'zipfile':
+                archivefile = zipfile_baseline(rundir)
+            else:
+                archivefile = sumologic_backup.create_archive(rundir, codec, None, cores, \
+                                                              seekable)
+            seconds = time.perf_counter() - starttime
+            single = single or seconds
+            baseline = baseline or seconds
+            label = f'{codec}.seekable' if seekable else codec
+            print(f'{label:>14} {cores:>5} {seconds:>8.2f} {size / seconds / 2**20:>7.1f} ' + \
+                  f'{single / seconds:>8.2f} {baseline / seconds:>10.2f} ' + \
+                  f'{size / os.path.getsize(archivefile):>6.1f}')
+            os.remove(archivefile)
+
+    shutil.rmtree(os.path.dirname(rundir))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: End to end backup benchmark against the offline mock content API
+
+Starts mock_sumo_api, runs sumologic_backup against it once per worker count,
+and reports items/sec, requests/sec, per call latency, and peak RSS. Latency is
+shown as measured at the mock, and as measured by the client in the run report.
+
+Usage:
+   $ python  bench_backup  [ options ] [ -- backup options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           bench_backup
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.dont_write_bytecode = 1
+
+BENCHDIR = os.path.dirname(os.path.abspath(__file__))
+
+BACKUPSCRIPT = os.path.join(BENCHDIR, '..', 'bin', 'sumologic_backup.py')
+
+MOCKSCRIPT = os.path.join(BENCHDIR, 'mock_sumo_api.py')
+
+PARSER = argparse.ArgumentParser(description="""
+Benchmarks sumologic_backup against the offline mock content API
+""")
+
+PARSER.add_argument("-w", metavar='<workers>', dest='WORKERS', default='1,4,8', \
+                    help="set comma separated worker counts to run (default: 1,4,8)")
+
+PARSER.add_argument("-t", metavar='<target>', dest='TARGET', default='Global', \
+                    help="set backup target, Personal or Global (default: Global)")
+
+PARSER.add_argument("-r", metavar='<rate>', dest='RATELIMIT', default='0', \
+                    help="set backup API requests per second, 0 for unlimited (default: 0)")
+
+PARSER.add_argument("-m", metavar='<mockoptions>', dest='MOCKOPTIONS', default='', \
+                    help="set options for mock_sumo_api, for example '-d 4 -l 0.05 -r 0.01'")
+
+PARSER.add_argument("-o", metavar='<jsonfile>', dest='OUTPUT', default=None, \
+                    help="also write the results to a JSON file")
+
+PARSER.add_argument('BACKUPOPTIONS', nargs=argparse.REMAINDER, \
+                    help="extra options for sumologic_backup, after --")
+
+ARGS = PARSER.parse_args()
+
+def start_mock():
+    """
+    Starts the mock API, returning the process and its endpoint
+    """
+
+    mock = subprocess.Popen([sys.executable, MOCKSCRIPT] + ARGS.MOCKOPTIONS.split(), \
+                            stdout=subprocess.PIPE, text=True)
+    banner = mock.stdout.readline()
+    if not banner.startswith('Listening: '):
+        mock.kill()
+        sys.exit(f'Mock Failed :: {banner}')
+    return mock, banner.split()[1]
+
+def fetch_stats(endpoint):
+    """
+    Returns the request statistics kept by the mock API
+    """
+
+    statsurl = endpoint.replace('/api', '/_stats')
+    with urllib.request.urlopen(statsurl) as response:
+        return json.loads(response.read())
+
+def count_items(outputdir):
+    """
+    Counts the items the backup journaled as written
+    """
+
+    items = 0
+    for journalfile in glob.glob(os.path.join(outputdir, '*', 'manifest', '*.journal.jsonl')):
+        with open(journalfile, 'r', encoding='utf8') as journalobject:
+            items += sum(1 for line in journalobject if '"done"' in line)
+    return items
+
+def read_report(outputdir):
+    """
+    Returns the run report the backup wrote, or an empty report
+    """
+
+    for reportfile in glob.glob(os.path.join(outputdir, '*', 'manifest', '*.report.json')):
+        with open(reportfile, 'r', encoding='utf8') as reportobject:
+            return json.load(reportobject)
+    return {'p50': 0.0, 'p99': 0.0, 'stages': {}}
+
+def run_backup(endpoint, workers, outputdir):
+    """
+    Runs one backup against the mock, returning its wall time and peak RSS in MiB
+    """
+
+    environment = dict(os.environ, SUMO_UID='benchmark', SUMO_KEY='benchmark', \
+                       SUMO_END=endpoint)
+    extra = [ option for option in ARGS.BACKUPOPTIONS if option != '--' ]
+    command = [sys.executable, BACKUPSCRIPT, '-t', ARGS.TARGET, '-o', outputdir, \
+               '-j', str(workers), '-r', ARGS.RATELIMIT, '-v', '3'] + extra
+
+    starttime = time.perf_counter()
+    backup = subprocess.Popen(command, env=environment) # pylint: disable=consider-using-with
+    (_pid, status, usage) = os.wait4(backup.pid, 0)
+    elapsed = time.perf_counter() - starttime
+    backup.returncode = os.waitstatus_to_exitcode(status)
+    if backup.returncode != 0:
+        sys.exit(f'Backup Failed :: exit code {backup.returncode}')
+    return elapsed, usage.ru_maxrss / 1024
+
+def main():
+    """
+    Runs the benchmark for each worker count and prints a results table
+    """
+
+    results = []
+    print(f'{"workers":>7} {"items":>7} {"seconds":>8} {"items/s":>8} {"requests":>9} ' + \
+          f'{"req/s":>7} {"p50 ms":>7} {"p99 ms":>7} {"cli p50":>7} {"cli p99":>7} ' + \
+          f'{"429s":>5} {"RSS MiB":>8}')
+    for workers in [ int(workers) for workers in ARGS.WORKERS.split(',') ]:
+        (mock, endpoint) = start_mock()
+        try:
+            with tempfile.TemporaryDirectory(prefix='bench_backup.') as outputdir:
+                (elapsed, peakrss) = run_backup(endpoint, workers, outputdir)
+                items = count_items(outputdir)
+                report = read_report(outputdir)
+            stats = fetch_stats(endpoint)
+        finally:
+            mock.terminate()
+            mock.wait()
+
+        result = {'workers': workers, 'items': items, 'seconds': elapsed, \
+                  'items_per_sec': items / elapsed, 'requests': stats['requests'], \
+                  'requests_per_sec': stats['requests'] / elapsed, \
+                  'p50_ms': stats['p50'] * 1000, 'p99_ms': stats['p99'] * 1000, \
+                  'client_p50_ms': report['p50'] * 1000, 'client_p99_ms': report['p99'] * 1000, \
+                  'stages': report['stages'], \
+                  'throttled': stats['throttled'], 'peak_rss_mib': peakrss}
+        results.append(result)
+        print(f'{workers:>7} {items:>7} {elapsed:>8.1f} {result["items_per_sec"]:>8.1f} ' + \
+              f'{stats["requests"]:>9} {result["requests_per_sec"]:>7.1f} ' + \
+              f'{result["p50_ms"]:>7.1f} {result["p99_ms"]:>7.1f} ' + \
+              f'{result["client_p50_ms"]:>7.1f} {result["client_p99_ms"]:>7.1f} ' + \
+              f'{stats["throttled"]:>5} {peakrss:>8.1f}')
+
+    if ARGS.OUTPUT:
+        with open(ARGS.OUTPUT, 'w', encoding='utf8') as outputobject:
+            json.dump(results, outputobject, indent=4)
+
+if __name__ == '__main__':
+    main()
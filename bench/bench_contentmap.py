@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Memory benchmark for CONTENTMAP records
+
+Compares the dict of dicts CONTENTMAP used to be with ContentItem records,
+for synthetic content trees of the given sizes.
+
+Usage:
+   $ python  bench_contentmap  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           bench_contentmap
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.dont_write_bytecode = 1
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin'))
+
+import sumologic_backup # pylint: disable=wrong-import-position
+
+PARSER = argparse.ArgumentParser(description="""
+Measures CONTENTMAP memory use for dict records and ContentItem records
+""")
+
+PARSER.add_argument("-n", metavar='<sizes>', dest='SIZES', default='100000,1000000', \
+                    help="set comma separated item counts (default: 100000,1000000)")
+
+PARSER.add_argument("-f", type=int, metavar='<fanout>', dest='FANOUT', default=10, \
+                    help="set items per folder (default: 10)")
+
+ARGS = PARSER.parse_args()
+
+ITEMTYPES = ('Search', 'Dashboard', 'Report', 'Lookups')
+
+def synthetic_children(size, fanout):
+    """
+    Yields folder listing entries for a tree of size items, fanout to a folder with
+    every third item a folder. Entries are built as json.loads would build them,
+    so every id string is a separate object
+    """
+
+    rootid = '%016X' % 1
+    yield {'id': rootid, 'parentId': '%016X' % 0, 'name': 'Personal', \
+           'itemType': 'Folder', 'modifiedAt': '2020-01-01T00:00:00.000Z'}, None
+
+    folders = [rootid]
+    for number in range(2, size + 1):
+        parentid = folders[(number - 2) // fanout]
+        itemtype = 'Folder' if number % 3 == 0 else ITEMTYPES[number % len(ITEMTYPES)]
+        child = {'id': '%016X' % number, 'parentId': ''.join(parentid), \
+                 'name': f'{itemtype} {number:08d} - synthetic content', \
+                 'itemType': itemtype, 'modifiedAt': f'2020-01-01T00:00:{number % 60:02d}.000Z'}
+        if itemtype == 'Folder':
+            folders.append(child['id'])
+        yield child, parentid
+
+def build_dicts(size, fanout):
+    """
+    Builds the dict of dicts CONTENTMAP, with every path stored in each record
+    """
+
+    contentmap = {}
+    for child, parentid in synthetic_children(size, fanout):
+        if parentid is None:
+            (parent_name, parent_oid) = ('/' + child['name'], child['id'])
+            my_path_name = '/' + parent_name
+            my_oid_path = parent_oid
+        else:
+            parent_name = contentmap[parentid]['path']
+            parent_oid = contentmap[parentid]['backuppath']
+            my_path_name = '/'.join((parent_name, child['name']))
+            my_oid_path = '/'.join((parent_oid, child['id']))
+        contentmap[child['id']] = {
+            'parent': child['parentId'], 'myself': child['id'], 'name': child['name'],
+            'path': my_path_name, 'backupname': child['id'], 'backuppath': my_oid_path,
+            'type': child['itemType'], 'modified': child['modifiedAt']}
+    return contentmap
+
+def build_items(size, fanout):
+    """
+    Builds CONTENTMAP from ContentItem records
+    """
+
+    contentmap = sumologic_backup.CONTENTMAP
+    contentmap.clear()
+    for child, parentid in synthetic_children(size, fanout):
+        anchor = None
+        if parentid is None:
+            parent_name = '/' + child['name']
+            anchor = ('/' + parent_name, child['id'], parent_name, parent_name)
+        contentmap[child['id']] = sumologic_backup.ContentItem(child['id'], child['parentId'], \
+            child['name'], child['itemType'], child['modifiedAt'], anchor)
+    return contentmap
+
+def measure(builder, size):
+    """
+    Returns the traced bytes held by a built CONTENTMAP, the build time, and the time
+    to read every path and backup path back
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    starttime = time.perf_counter()
+    contentmap = builder(size, ARGS.FANOUT)
+    buildtime = time.perf_counter() - starttime
+    (traced, _peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    starttime = time.perf_counter()
+    for item in contentmap.values():
+        if isinstance(item, dict):
+            _paths = (item['path'], item['backuppath'])
+        else:
+            _paths = (item.path, item.backuppath)
+    readtime = time.perf_counter() - starttime
+
+    contentmap.clear()
+    return traced, buildtime, readtime
+
+def main():
+    """
+    Runs the benchmark for each size and prints a comparison table
+    """
+
+    print(f'{"items":>10} {"record":>12} {"MiB":>10} {"bytes/item":>11} ' + \
+          f'{"build s":>8} {"paths s":>8}')
+    for size in [ int(size) for size in ARGS.SIZES.split(',') ]:
+        results = {}
+        for (label, builder) in (('dict', build_dicts), ('ContentItem', build_items)):
+            (traced, buildtime, readtime) = measure(builder, size)
+            results[label] = traced
+            print(f'{size:>10} {label:>12} {traced / 2**20:>10.1f} {traced / size:>11.0f} ' + \
+                  f'{buildtime:>8.2f} {readtime:>8.2f}')
+        saving = 100 - 100 * results["ContentItem"] / results["dict"]
+        print(f'{size:>10} {"saving":>12} {saving:>9.1f}%')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Benchmark for the manifest writer and its query index
+
+Writes a synthetic content tree through ManifestWriter, then times item lookups,
+folder listings, and subtree queries against the SQLite index, next to a scan
+of the JSONL manifest for the same item.
+
+Usage:
+   $ python  bench_manifest  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           bench_manifest
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.dont_write_bytecode = 1
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin'))
+
+import sumologic_backup # pylint: disable=wrong-import-position
+import sumologic_manifest # pylint: disable=wrong-import-position
+
+PARSER = argparse.ArgumentParser(description="""
+Measures manifest write time and index query latency for synthetic content trees
+""")
+
+PARSER.add_argument("-n", metavar='<sizes>', dest='SIZES', default='500000', \
+                    help="set comma separated item counts (default: 500000)")
+
+PARSER.add_argument("-f", type=int, metavar='<fanout>', dest='FANOUT', default=10, \
+                    help="set items per folder (default: 10)")
+
+PARSER.add_argument("-q", type=int, metavar='<queries>', dest='QUERIES', default=1000, \
+                    help="set queries of each kind to time (default: 1000)")
+
+ARGS = PARSER.parse_args()
+
+ITEMTYPES = ('Search', 'Dashboard', 'Report', 'Lookups')
+
+def synthetic_items(size, fanout):
+    """
+    Yields anchored ContentItems for a tree of size items, fanout to a folder with
+    every third item a folder
+    """
+
+    root = sumologic_backup.ContentItem('%016X' % 1, '%016X' % 0, '/Personal', 'Folder', \
+        '2020-01-01T00:00:00.000Z', ('//Personal', '%016X' % 1, '/Personal', '/Personal'))
+    yield root
+
+    folders = [root]
+    for number in range(2, size + 1):
+        parent = folders[(number - 2) // fanout]
+        itemtype = 'Folder' if number % 3 == 0 else ITEMTYPES[number % len(ITEMTYPES)]
+        child = parent.anchor_child({'id': '%016X' % number, 'parentId': parent.myself, \
+            'name': f'{itemtype} {number:08d} - synthetic content', 'itemType': itemtype, \
+            'modifiedAt': f'2020-01-01T00:00:{number % 60:02d}.000Z'})
+        if itemtype == 'Folder':
+            folders.append(child)
+        yield child
+
+def timed(query, arguments):
+    """
+    Runs a query once for each argument, returning the mean milliseconds and items found
+    """
+
+    found = 0
+    starttime = time.perf_counter()
+    for argument in arguments:
+        found += sum(1 for _item in query(argument))
+    elapsed = time.perf_counter() - starttime
+    return elapsed * 1000 / len(arguments), found / len(arguments)
+
+def scan_jsonl(jsonfile, itemid):
+    """
+    Finds an item by reading the JSONL manifest from the start
+    """
+
+    with open(jsonfile, 'r', encoding='utf8') as jsonobject:
+        for line in jsonobject:
+            item = json.loads(line)
+            if item['id'] == itemid:
+                return [ item ]
+    return []
+
+def main():
+    """
+    Runs the benchmark for each size and prints a results table
+    """
+
+    print(f'{"items":>10} {"query":>14} {"mean ms":>10} {"items":>10}')
+    for size in [ int(size) for size in ARGS.SIZES.split(',') ]:
+        with tempfile.TemporaryDirectory(prefix='bench_manifest.') as manifestdir:
+            starttime = time.perf_counter()
+            manifest = sumologic_backup.ManifestWriter(manifestdir)
+            for item in synthetic_items(size, ARGS.FANOUT):
+                manifest.add(item)
+            manifest.close()
+            print(f'{size:>10} {"write":>14} {(time.perf_counter() - starttime) * 1000:>10.1f} ' + \
+                  f'{size:>10}')
+
+            index = sumologic_manifest.ManifestIndex(os.path.join(manifestdir, \
+                sumologic_backup.MANIFESTDBNAME))
+            folders = [ item['id'] for item in index.every('Folder') ]
+            itemids = [ '%016X' % random.randint(1, size) for _query in range(ARGS.QUERIES) ]
+            folderids = [ random.choice(folders) for _query in range(ARGS.QUERIES) ]
+            paths = [ index.item(folderid)['path'] for folderid in folderids ]
+
+            jsonfile = os.path.join(manifestdir, sumologic_backup.MANIFESTJSONNAME)
+            queries = (('item', lambda itemid: [ index.item(itemid) ], itemids), \
+                       ('children', index.children, folderids), \
+                       ('subtree', index.subtree, folderids), \
+                       ('path', index.below, paths), \
+                       ('jsonl scan', lambda itemid: scan_jsonl(jsonfile, itemid), \
+                        itemids[:max(ARGS.QUERIES // 100, 1)]))
+            for (label, query, arguments) in queries:
+                (meantime, found) = timed(query, arguments)
+                print(f'{size:>10} {label:>14} {meantime:>10.3f} {found:>10.1f}')
+            index.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Benchmark for the packfile store against the content tree
+
+Writes the same synthetic exports through TreeStore and PackStore, with zstd
+and zlib, and compares write throughput, disk footprint, and single item
+lookup latency.
+
+Usage:
+   $ python  bench_packfile  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           bench_packfile
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import contextlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.dont_write_bytecode = 1
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin'))
+
+import sumologic_backup # pylint: disable=wrong-import-position
+
+PARSER = argparse.ArgumentParser(description="""
+Compares the content tree and the packfile store for synthetic exports
+""")
+
+PARSER.add_argument("-n", type=int, metavar='<items>', dest='ITEMS', default=20000, \
+                    help="set number of exports (default: 20000)")
+
+PARSER.add_argument("-q", type=int, metavar='<lookups>', dest='LOOKUPS', default=2000, \
+                    help="set random single item lookups to time (default: 2000)")
+
+PARSER.add_argument("-d", metavar='<dir>', dest='WORKDIR', default=None, \
+                    help="set directory to write into, for example an NFS mount (default: temp)")
+
+ARGS = PARSER.parse_args()
+
+WORDS = ('error', 'warn', 'count', 'by', 'where', 'sum', 'avg', 'timeslice', 'host', \
+         'source', 'category', 'latency', 'status', 'parse', 'json', 'field', 'outlier', \
+         'transpose', 'sort', 'limit', 'if', 'isNull', 'lookup', 'threat', 'geo', 'ip')
+
+def query_text(rng, words):
+    """
+    Returns a made up search query of some number of words
+    """
+
+    return ' | '.join(' '.join(rng.choice(WORDS) for _word in range(rng.randint(3, 8))) \
+                      for _stage in range(max(words // 6, 1)))
+
+def synthetic_export(rng, number):
+    """
+    Returns a synthetic export: mostly searches, some dashboards with many panels,
+    and a few large lookups
+    """
+
+    kind = rng.random()
+    if kind < .70:
+        return {'type': 'SavedSearchWithScheduleSyncDefinition', 'name': f'search {number}', \
+                'search': {'queryText': query_text(rng, rng.randint(10, 60)), \
+                           'defaultTimeRange': '-15m', 'byReceiptTime': False}}
+    if kind < .95:
+        return {'type': 'DashboardV2SyncDefinition', 'name': f'dashboard {number}', \
+                'panels': [ {'key': f'panel{panel:04d}', 'title': f'panel {panel}', \
+                             'queries': [ {'queryString': query_text(rng, 30), \
+                                           'queryType': 'Logs'} ], \
+                             'visualSettings': json.dumps({'general': {'mode': 'timeSeries', \
+                                 'type': rng.choice(['line', 'bar', 'area'])}})} \
+                            for panel in range(rng.randint(4, 40)) ]}
+    return {'type': 'LookupTableSyncDefinition', 'name': f'lookup {number}', \
+            'rows': [ [ f'{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.0', \
+                        rng.choice(WORDS), rng.randint(0, 10000) ] \
+                      for _row in range(rng.randint(500, 3000)) ]}
+
+def synthetic_items(count):
+    """
+    Returns anchored items and their exports, all in one folder
+    """
+
+    rng = random.Random(7)
+    items = []
+    for number in range(1, count + 1):
+        contentid = f'{0xB000000000000000 + number:016X}'
+        items.append((sumologic_backup.ContentItem(contentid, '0000000000000000', \
+            f'item {number}', 'Search', '', (f'/item {number}', contentid, contentid, \
+            f'/item {number}')), synthetic_export(rng, number)))
+    return items
+
+def footprint(rundir):
+    """
+    Returns the file count, bytes, and allocated bytes under a directory
+    """
+
+    (files, size, allocated) = (0, 0, 0)
+    for foldername, _subfolders, filenames in os.walk(rundir):
+        for filename in filenames:
+            stat = os.stat(os.path.join(foldername, filename))
+            files += 1
+            size += stat.st_size
+            allocated += stat.st_blocks * 512
+    return files, size, allocated
+
+def percentile(values, fraction):
+    """
+    Returns a percentile of a list of values
+    """
+
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+def tree_lookup(rundir):
+    """
+    Returns a function reading one export back from the content tree
+    """
+
+    def lookup(contentid):
+        with open(os.path.join(rundir, 'content', contentid) + '.json', 'r', \
+                  encoding='utf8') as backupobject:
+            return json.load(backupobject)
+    return lookup
+
+def run_layout(label, items, workdir):
+    """
+    Writes every export in one layout and times lookups, returning one row of results
+    """
+
+    rundir = tempfile.mkdtemp(prefix=f'bench_packfile.{label}.', dir=workdir)
+    if label == 'tree':
+        os.makedirs(os.path.join(rundir, 'content'))
+        store = sumologic_backup.TreeStore(os.path.join(rundir, 'content'))
+    else:
+        store = sumologic_backup.PackStore(rundir, label.split('.')[1])
+
+    starttime = time.perf_counter()
+    for (item, exportresult) in items:
+        store.write(item, exportresult)
+    store.close()
+    writetime = time.perf_counter() - starttime
+    payloadbytes = sum(len(json.dumps(exportresult)) + 1 for (_item, exportresult) in items)
+
+    (files, size, allocated) = footprint(rundir)
+
+    rng = random.Random(11)
+    contentids = [ rng.choice(items)[0].myself for _lookup in range(ARGS.LOOKUPS) ]
+    latencies = []
+    with contextlib.ExitStack() as stack:
+        if label == 'tree':
+            lookup = tree_lookup(rundir)
+        else:
+            lookup = stack.enter_context(contextlib.closing( \
+                sumologic_backup.PackReader(rundir))).get
+        for contentid in contentids:
+            starttime = time.perf_counter()
+            lookup(contentid)
+            latencies.append(time.perf_counter() - starttime)
+
+    return {'layout': label, 'items': len(items), 'write_seconds': writetime, \
+            'items_per_sec': len(items) / writetime, \
+            'mib_per_sec': payloadbytes / writetime / 2**20, 'files': files, \
+            'bytes': size, 'allocated': allocated, 'ratio': payloadbytes / size, \
+            'lookup_p50_ms': percentile(latencies, .50) * 1000, \
+            'lookup_p99_ms': percentile(latencies, .99) * 1000, 'rundir': rundir}
+
+def main():
+    """
+    Runs the benchmark for each layout and prints a comparison table
+    """
+
+    items = synthetic_items(ARGS.ITEMS)
+    layouts = ['tree', 'pack.zlib']
+    if sumologic_backup.load_zstandard() is not None:
+        layouts.append('pack.zstd')
+
+    print(f'{"layout":>10} {"items/s":>9} {"MiB/s":>7} {"files":>7} {"MiB":>8} ' + \
+          f'{"alloc MiB":>10} {"ratio":>6} {"p50 ms":>7} {"p99 ms":>7}')
+    for label in layouts:
+        result = run_layout(label, items, ARGS.WORKDIR)
+        print(f'{label:>10} {result["items_per_sec"]:>9.0f} {result["mib_per_sec"]:>7.1f} ' + \
+              f'{result["files"]:>7} {result["bytes"] / 2**20:>8.1f} ' + \
+              f'{result["allocated"] / 2**20:>10.1f} {result["ratio"]:>6.1f} ' + \
+              f'{result["lookup_p50_ms"]:>7.3f} {result["lookup_p99_ms"]:>7.3f}')
+        shutil.rmtree(result['rundir'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Check for the include and exclude filters
+
+Matches globs, regexes, and ids against name paths, checks which folders an
+include could still reach, walks a small tree through the filter, and anchors
+folders included by id at their real paths.
+
+Usage:
+   $ python  check_contentfilter  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           check_contentfilter
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import os
+import sys
+import requests
+
+sys.dont_write_bytecode = 1
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin'))
+
+import sumologic_backup # pylint: disable=wrong-import-position
+
+PARSER = argparse.ArgumentParser(description="""
+Checks filter matching, reach, admission, and the anchors of folders included by id
+""")
+
+PARSER.add_argument("-v", type=int, default=0, metavar='<verbose>', \
+                    dest='verbose', help="increase verbosity")
+
+ARGS = PARSER.parse_args()
+
+FAILURES = []
+
+MATCHES = (
+    ('/Team00/**', '/Team00', True),
+    ('/Team00/**', '/Team00/alerts/cpu', True),
+    ('/Team00/**', '/Team001', False),
+    ('/Team0?', '/Team01', True),
+    ('/Team0?', '/Team011', False),
+    ('/Team*/cpu', '/Team00/cpu', True),
+    ('/Team*/cpu', '/Team00/alerts/cpu', False),
+    ('/Personal/**/cpu', '/Personal/cpu', True),
+    ('/Personal/**/cpu', '/Personal/a/b/cpu', True),
+    ('Dashboards', '/Dashboards', True),
+    ('Dashboards', '/Personal/a/b/Dashboards', True),
+    ('Dashboards', '/Personal/Dashboards/cpu', False),
+    ('Dash*', '/Personal/Dashboards', True),
+    ('re:alert', '/Team00/alerts/cpu', True),
+    ('re:^/Team01', '/Team00/alerts', False),
+)
+
+REACHES = (
+    ('/Team00/alerts/cpu', '/Team00', True),
+    ('/Team00/alerts/cpu', '/Team00/alerts', True),
+    ('/Team00/alerts/cpu', '/Team00/other', False),
+    ('/Team00/alerts/cpu', '/Team01', False),
+    ('/Team00/**', '/Team00/alerts/deep', True),
+    ('Dashboards', '/Team01/other', True),
+    ('re:^/Team00', '/Team01', True),
+)
+
+TREE = {
+    'Team00': {'alerts': {'cpu': None, 'noisy': None, 'deep': {'disk': None}}, \
+               'other': {'memory': None}},
+    'Team01': {'other': {'memory': None}},
+}
+
+def check(condition, message):
+    """
+    Records a failed check
+    """
+
+    if not condition:
+        FAILURES.append(message)
+        print(f'Failed: {message}')
+    elif ARGS.verbose > 4:
+        print(f'Passed: {message}')
+
+def check_matches():
+    """
+    Checks each filter against a name path, and an id filter against ids
+    """
+
+    contentfilter = sumologic_backup.ContentFilter()
+    for (text, path, expected) in MATCHES:
+        rule = sumologic_backup.ContentFilter.parse(text)
+        check(contentfilter.matches(rule, 'A000000000000001', path) == expected, \
+              f'{text} {"matches" if expected else "does not match"} {path}')
+    rule = sumologic_backup.ContentFilter.parse('id:A000000000000001')
+    check(contentfilter.matches(rule, 'A000000000000001', '/Team00'), 'id: matches its id')
+    check(not contentfilter.matches(rule, 'A000000000000002', '/Team00'), \
+          'id: does not match another id')
+    for (text, path, expected) in REACHES:
+        rule = sumologic_backup.ContentFilter.parse(text)
+        check(contentfilter.reaches(rule, path) == expected, \
+              f'{text} {"reaches" if expected else "does not reach"} below {path}')
+
+def check_walk():
+    """
+    Walks TREE through an include and an exclude, as discovery does, and checks what is kept
+    """
+
+    contentfilter = sumologic_backup.ContentFilter(['/Team00/alerts/**', '/Team01/missing/**'], \
+        ['/Team00/alerts/noisy'])
+    (kept, contentmap) = ([], {})
+
+    def visit(parent, path, subtree, covered):
+        itemtype = 'Folder' if subtree is not None else 'Search'
+        admitted = contentfilter.admit(path, itemtype, path, covered)
+        if admitted is None:
+            return
+        contentmap[path] = sumologic_backup.ContentItem(path, parent, path, itemtype)
+        if admitted:
+            kept.append(path)
+        for (name, child) in (subtree or {}).items():
+            visit(path, f'{path}/{name}', child, contentfilter.is_covered(path))
+
+    for (name, subtree) in TREE.items():
+        visit('0000000000000000', f'/{name}', subtree, False)
+
+    check(kept == ['/Team00/alerts', '/Team00/alerts/cpu', '/Team00/alerts/deep', \
+                   '/Team00/alerts/deep/disk'], f'walk keeps {kept}')
+    check(contentfilter.provisional == {'/Team00', '/Team01'}, \
+          f'walk lists {sorted(contentfilter.provisional)} on the way to an include')
+    check(contentfilter.unneeded(contentmap) == {'/Team01'}, \
+          'walk drops folders with nothing kept below them')
+
+class FolderSource():
+    """
+    Answers folder lookups from a dictionary, as the API does for a personal and a global tree
+    """
+
+    PERSONAL = {'id': 'P000000000000001', 'name': 'Personal', \
+                'parentId': '0000000000000000', 'itemType': 'Folder'}
+
+    FOLDERS = {
+        'P000000000000002': {'name': 'alerts', 'parentId': 'P000000000000001'},
+        'P000000000000003': {'name': 'deep', 'parentId': 'P000000000000002'},
+        'G000000000000001': {'name': 'Team00', 'parentId': '0000000000000000'},
+        'G000000000000002': {'name': 'dashboards', 'parentId': 'G000000000000001'},
+    }
+
+    def get_myfolders(self):
+        """
+        Returns the personal folder
+        """
+        return dict(self.PERSONAL)
+
+    def get_myfolder(self, myself):
+        """
+        Returns a folder, or raises as the API does for the parent of a global top folder
+        """
+        if myself == self.PERSONAL['id']:
+            return dict(self.PERSONAL)
+        if myself not in self.FOLDERS:
+            raise requests.exceptions.HTTPError(f'404 {myself}')
+        return dict(self.FOLDERS[myself], id=myself, itemType='Folder')
+
+def check_anchors():
+    """
+    Checks that folders included by id are anchored where a full walk would put them
+    """
+
+    source = FolderSource()
+    expected = {
+        'P000000000000001': ('//Personal', 'P000000000000001', '/Personal', '/Personal'),
+        'P000000000000003': ('/Personal/alerts/deep', \
+            'P000000000000001/P000000000000002/P000000000000003', 'P000000000000003', \
+            '/Personal/alerts/deep'),
+        'G000000000000001': ('/Team00', 'G000000000000001/G000000000000001', \
+            'G000000000000001', '/Team00'),
+        'G000000000000002': ('/Team00/dashboards', \
+            'G000000000000001/G000000000000001/G000000000000002', 'G000000000000002', \
+            '/Team00/dashboards'),
+    }
+    contentfilter = sumologic_backup.ContentFilter([ f'id:{folderid}' for folderid in expected ])
+    roots = contentfilter.resolve(source)
+    anchors = { root.myself: root.anchor for (root, _content_list) in roots }
+    for (folderid, anchor) in expected.items():
+        check(anchors.get(folderid) == anchor, f'id:{folderid} is anchored at {anchor[0]}')
+    check(not contentfilter.includes, 'id: folders are taken out of the walked includes')
+
+def main():
+    """
+    Runs the checks, and exits 1 if any failed
+    """
+
+    check_matches()
+    check_walk()
+    check_anchors()
+
+    print(f'Checked: {len(MATCHES) + len(REACHES) + 2} rules, a walk, and anchors - ' + \
+          f'{len(FAILURES)} failed')
+    if FAILURES:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
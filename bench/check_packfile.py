@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Round trip check for the packfile store
+
+Writes synthetic exports through PackStore with each codec, reopens the pack
+with PackReader and looks every item up, then tears the tail of an interrupted
+pack and checks that a resumed PackStore keeps every whole record.
+
+Usage:
+   $ python  check_packfile  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           check_packfile
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.dont_write_bytecode = 1
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin'))
+
+import sumologic_backup # pylint: disable=wrong-import-position
+
+PARSER = argparse.ArgumentParser(description="""
+Checks that exports written to a pack read back, and survive a torn tail
+""")
+
+PARSER.add_argument("-n", type=int, metavar='<items>', dest='ITEMS', default=500, \
+                    help="set number of exports (default: 500)")
+
+PARSER.add_argument("-v", type=int, default=0, metavar='<verbose>', \
+                    dest='verbose', help="increase verbosity")
+
+ARGS = PARSER.parse_args()
+
+FAILURES = []
+
+def check(condition, message):
+    """
+    Records a failed check
+    """
+
+    if not condition:
+        FAILURES.append(message)
+        print(f'Failed: {message}')
+    elif ARGS.verbose > 4:
+        print(f'Passed: {message}')
+
+def synthetic_items(first, count):
+    """
+    Returns anchored items and their exports, of random sizes
+    """
+
+    rng = random.Random(first)
+    items = []
+    for number in range(first, first + count):
+        contentid = f'{0xC000000000000000 + number:016X}'
+        items.append((sumologic_backup.ContentItem(contentid, '0000000000000000', \
+            f'item {number}', 'Search', '', (f'/item {number}', contentid, contentid, \
+            f'/item {number}')), {'type': 'SavedSearchWithScheduleSyncDefinition', \
+            'name': f'item {number}', 'search': {'queryText': 'x' * rng.randint(0, 5000)}}))
+    return items
+
+def check_lookups(rundir, items, label):
+    """
+    Reopens a closed pack and checks every item, and an item it never held
+    """
+
+    reader = sumologic_backup.PackReader(rundir)
+    try:
+        check(reader.count == len(items), f'{label}: index holds {reader.count} items')
+        check(all(reader.get(item.myself) == exportresult for (item, exportresult) in items), \
+              f'{label}: every export reads back unchanged')
+        check(reader.get('FFFFFFFFFFFFFFFF') is None, f'{label}: a missing id is not found')
+        check(sorted(reader) == sorted(item.myself for (item, _exportresult) in items), \
+              f'{label}: index lists every item')
+        indexed = { sumologic_backup.pack_key(item.myself): reader.find(item.myself) \
+                    for (item, _exportresult) in items }
+    finally:
+        reader.close()
+    scanned = sumologic_backup.PackReader.scan(os.path.join(rundir, sumologic_backup.PACKNAME))
+    check(scanned == indexed, f'{label}: a scan of the pack finds the indexed records')
+
+def check_codec(codec):
+    """
+    Writes, reopens, and resumes one pack with a codec
+    """
+
+    rundir = tempfile.mkdtemp(prefix=f'check_packfile.{codec}.')
+    try:
+        items = synthetic_items(1, ARGS.ITEMS)
+        store = sumologic_backup.PackStore(rundir, codec)
+        for (item, exportresult) in items:
+            store.write(item, exportresult)
+        store.close()
+        check_lookups(rundir, items, f'{codec} write')
+
+        more = synthetic_items(ARGS.ITEMS + 1, 10)
+        store = sumologic_backup.PackStore(rundir)
+        check(store.codec == codec, f'{codec} resume: codec is read from the pack')
+        for (item, exportresult) in more:
+            store.write(item, exportresult)
+        store.fileobject.close()
+
+        packfile = os.path.join(rundir, sumologic_backup.PACKNAME)
+        with open(packfile, 'r+b') as packobject:
+            packobject.truncate(os.path.getsize(packfile) - 3)
+
+        store = sumologic_backup.PackStore(rundir)
+        check(len(store.entries) == len(items) + len(more) - 1, \
+              f'{codec} resume: {len(store.entries)} whole records kept after a torn tail')
+        (torn, exportresult) = more[-1]
+        check(sumologic_backup.pack_key(torn.myself) not in store.entries, \
+              f'{codec} resume: the torn record is dropped')
+        store.write(torn, exportresult)
+        store.close()
+        check_lookups(rundir, items + more, f'{codec} resume')
+    finally:
+        shutil.rmtree(rundir)
+
+def main():
+    """
+    Runs the checks for each codec, and exits 1 if any failed
+    """
+
+    codecs = ['zlib']
+    if sumologic_backup.load_zstandard() is not None:
+        codecs.append('zstd')
+    for codec in codecs:
+        check_codec(codec)
+
+    print(f'Checked: {", ".join(codecs)} - {len(FAILURES)} failed')
+    if FAILURES:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Check for the client side rate limiter and retry backoff
+
+Reserves tokens from TokenBucket at several rates and bursts, holds the bucket
+as a throttled response does, times threads sharing one bucket, and checks the
+retry delays taken from Retry-After values.
+
+Usage:
+   $ python  check_tokenbucket  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           check_tokenbucket
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import email.utils
+import os
+import sys
+import threading
+import time
+
+sys.dont_write_bytecode = 1
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin'))
+
+import sumologic_backup # pylint: disable=wrong-import-position
+
+PARSER = argparse.ArgumentParser(description="""
+Checks token bucket waits, holds, shared use across threads, and retry backoff
+""")
+
+PARSER.add_argument("-t", type=float, metavar='<tolerance>', dest='TOLERANCE', default=.05, \
+                    help="set seconds a measured wait may be off by (default: 0.05)")
+
+PARSER.add_argument("-v", type=int, default=0, metavar='<verbose>', \
+                    dest='verbose', help="increase verbosity")
+
+ARGS = PARSER.parse_args()
+
+FAILURES = []
+
+def check(condition, message):
+    """
+    Records a failed check
+    """
+
+    if not condition:
+        FAILURES.append(message)
+        print(f'Failed: {message}')
+    elif ARGS.verbose > 4:
+        print(f'Passed: {message}')
+
+def near(value, expected):
+    """
+    Returns whether a measured value is within the tolerance of what was expected
+    """
+
+    return abs(value - expected) <= ARGS.TOLERANCE
+
+def check_reserve():
+    """
+    Checks the waits handed out by buckets that are never slept on
+    """
+
+    bucket = sumologic_backup.TokenBucket(0)
+    check(all(bucket.reserve() == 0.0 for _token in range(1000)), 'rate 0 never waits')
+
+    bucket = sumologic_backup.TokenBucket(10, burst=5)
+    waits = [ bucket.reserve() for _token in range(8) ]
+    check(all(wait == 0.0 for wait in waits[:5]), 'rate 10 burst 5 hands out 5 tokens at once')
+    check(all(near(wait, .1 * step) for (step, wait) in enumerate(waits[5:], 1)), \
+          'rate 10 spaces the tokens after the burst by 0.1s: ' + \
+          ', '.join(f'{wait:.3f}s' for wait in waits[5:]))
+
+    bucket = sumologic_backup.TokenBucket(4)
+    check(bucket.capacity == 4, 'burst defaults to the rate')
+    check(sumologic_backup.TokenBucket(.5).capacity == 1, 'burst is at least one token')
+
+def check_hold():
+    """
+    Checks that a hold delays every token, with or without a rate
+    """
+
+    for rate in (0, 100):
+        bucket = sumologic_backup.TokenBucket(rate)
+        bucket.hold(.3)
+        bucket.hold(.1)
+        wait = bucket.reserve()
+        check(near(wait, .3), f'rate {rate} waits out the longest hold: {wait:.3f}s')
+
+def check_threads():
+    """
+    Checks that threads sharing a bucket are held to its rate together
+    """
+
+    (rate, threads, calls) = (50, 4, 10)
+    bucket = sumologic_backup.TokenBucket(rate, burst=1)
+
+    def worker():
+        for _call in range(calls):
+            bucket.acquire()
+
+    starttime = time.monotonic()
+    workers = [ threading.Thread(target=worker) for _thread in range(threads) ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - starttime
+    expected = (threads * calls - 1) / rate
+    check(elapsed >= expected - ARGS.TOLERANCE and elapsed <= expected * 1.5 + ARGS.TOLERANCE, \
+          f'{threads} threads share rate {rate}: {elapsed:.3f}s for {threads * calls} calls')
+
+def check_backoff():
+    """
+    Checks retry delays from Retry-After values, and the fallback for values that are not
+    """
+
+    backoff = sumologic_backup.SumoApiClient._backoff # pylint: disable=protected-access
+    jitter = sumologic_backup.RETRY_START
+
+    for value in ('2', '1.5', '0'):
+        delay = backoff(0, value)
+        check(float(value) <= delay <= float(value) + jitter, \
+              f'Retry-After {value} waits {delay:.3f}s')
+
+    value = email.utils.formatdate(time.time() + 3, usegmt=True)
+    delay = backoff(0, value)
+    check(1 <= delay <= 3 + jitter, f'Retry-After as a date waits {delay:.3f}s')
+
+    for value in ('soon', 'inf', 'nan', '-inf', ''):
+        delays = [ backoff(attempt, value) for attempt in range(12) ]
+        check(all(0 <= delay <= sumologic_backup.RETRY_LIMIT + jitter for delay in delays), \
+              f'Retry-After {value!r} falls back to capped exponential backoff')
+
+def main():
+    """
+    Runs the checks, and exits 1 if any failed
+    """
+
+    check_reserve()
+    check_hold()
+    check_threads()
+    check_backoff()
+
+    print(f'Checked: token bucket and backoff - {len(FAILURES)} failed')
+    if FAILURES:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
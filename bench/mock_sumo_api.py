@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Offline stand-in for the Sumo Logic content API used by sumologic_backup
+
+Serves a synthetic content tree through the folder, global folder job, and
+content export job endpoints, with configurable latency, job duration,
+payload size, and injected 429 responses. Folders can be created and content
+imported, for restores, and a share of items can be marked modified at start,
+leaving the folders above them as they were. A share of items can be made slow,
+their export jobs taking 50 times as long as the rest. GET /_stats returns
+request counts and server side latency percentiles per endpoint.
+
+Usage:
+   $ python  mock_sumo_api  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           mock_sumo_api
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import collections
+import http.server
+import json
+import random
+import re
+import sys
+import threading
+import time
+
+sys.dont_write_bytecode = 1
+
+PARSER = argparse.ArgumentParser(description="""
+Serves a synthetic Sumo Logic content API for offline backup benchmarks
+""")
+
+PARSER.add_argument("-p", type=int, default=0, metavar='<port>', dest='PORT', \
+                    help="set listening port, 0 picks a free port (default: 0)")
+
+PARSER.add_argument("-d", type=int, default=3, metavar='<depth>', dest='DEPTH', \
+                    help="set folder depth below each top level folder (default: 3)")
+
+PARSER.add_argument("-f", type=int, default=3, metavar='<folders>', dest='FOLDERS', \
+                    help="set subfolders per folder (default: 3)")
+
+PARSER.add_argument("-i", type=int, default=4, metavar='<items>', dest='ITEMS', \
+                    help="set content items per folder (default: 4)")
+
+PARSER.add_argument("-g", type=int, default=2, metavar='<globals>', dest='GLOBALS', \
+                    help="set top level Global folders, besides Personal (default: 2)")
+
+PARSER.add_argument("-l", type=float, default=.01, metavar='<seconds>', dest='LATENCY', \
+                    help="set latency added to every request (default: 0.01)")
+
+PARSER.add_argument("-j", type=float, default=.2, metavar='<seconds>', dest='JOBTIME', \
+                    help="set duration of export and global folder jobs (default: 0.2)")
+
+PARSER.add_argument("-s", type=int, default=2048, metavar='<bytes>', dest='PAYLOAD', \
+                    help="set size of each export payload (default: 2048)")
+
+PARSER.add_argument("-r", type=float, default=0.0, metavar='<ratio>', dest='THROTTLE', \
+                    help="set share of requests answered with a 429 (default: 0.0)")
+
+PARSER.add_argument("-a", type=int, default=1, metavar='<seconds>', dest='RETRYAFTER', \
+                    help="set Retry-After sent with each 429 (default: 1)")
+
+PARSER.add_argument("-e", type=float, default=0.0, metavar='<ratio>', dest='FAILURES', \
+                    help="set share of export jobs that fail (default: 0.0)")
+
+PARSER.add_argument("-m", type=float, default=0.0, metavar='<ratio>', dest='CHANGES', \
+                    help="set share of items modified since the tree was built (default: 0.0)")
+
+PARSER.add_argument("-x", type=float, default=0.0, metavar='<ratio>', dest='SLOW', \
+                    help="set share of items whose export jobs take 50 times as long " + \
+                    "(default: 0.0)")
+
+PARSER.add_argument("--seed", type=int, default=7, metavar='<seed>', dest='SEED', \
+                    help="set random seed for the tree and injected faults (default: 7)")
+
+ARGS = PARSER.parse_args()
+
+RANDOM = random.Random(ARGS.SEED)
+
+LOCK = threading.Lock()
+
+NODES = {}
+
+JOBS = {}
+
+TOPLEVEL = []
+
+SLOWITEMS = set()
+
+SLOWFACTOR = 50
+
+STATS = {'requests': 0, 'throttled': 0, 'latency': collections.defaultdict(list)}
+
+ITEMTYPES = ('Search', 'Dashboard', 'Report', 'Lookups')
+
+MODIFIED = '2020-01-01T00:00:00.000Z'
+
+def next_id():
+    """
+    Returns a new sixteen digit hex id, as Sumo Logic uses
+    """
+
+    with LOCK:
+        next_id.counter += 1
+        return f'{0xA000000000000000 + next_id.counter:016X}'
+
+next_id.counter = 0
+
+def add_node(name, itemtype, parentid):
+    """
+    Adds a content item to the tree
+    """
+
+    nodeid = next_id()
+    NODES[nodeid] = {'id': nodeid, 'name': name, 'itemType': itemtype, 'parentId': parentid, \
+                     'createdAt': MODIFIED, 'createdBy': 'mock', 'modifiedAt': MODIFIED, \
+                     'modifiedBy': 'mock', 'permissions': ['GrantView', 'View'], 'children': []}
+    if parentid in NODES:
+        NODES[parentid]['children'].append(nodeid)
+    return nodeid
+
+def touch(nodeid):
+    """
+    Marks an item modified now. Folders above it keep their own modification time.
+    """
+
+    now = time.time()
+    NODES[nodeid]['modifiedAt'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now)) + \
+        f'.{int(now * 1000) % 1000:03d}Z'
+
+def build_tree(rootid):
+    """
+    Grows a tree below a folder, breadth first, to the configured shape
+    """
+
+    frontier = collections.deque([(rootid, ARGS.DEPTH)])
+    while frontier:
+        (folderid, depth) = frontier.popleft()
+        for number in range(ARGS.ITEMS):
+            add_node(f'item{number:04d}', RANDOM.choice(ITEMTYPES), folderid)
+        if depth > 0:
+            for number in range(ARGS.FOLDERS):
+                frontier.append((add_node(f'folder{number:04d}', 'Folder', folderid), depth - 1))
+
+def summary(node):
+    """
+    Returns a node as it appears in a folder listing, without its children
+    """
+
+    return {key: value for key, value in node.items() if key != 'children'}
+
+def listing(nodeid):
+    """
+    Returns a folder as the folder endpoints return it
+    """
+
+    folder = summary(NODES[nodeid])
+    folder['children'] = [ summary(NODES[childid]) for childid in NODES[nodeid]['children'] ]
+    return folder
+
+def start_job(contentid=None):
+    """
+    Starts a job, deciding up front whether it will fail
+    """
+
+    jobid = next_id()
+    failing = contentid is not None and RANDOM.random() < ARGS.FAILURES
+    jobtime = ARGS.JOBTIME * SLOWFACTOR if contentid in SLOWITEMS else ARGS.JOBTIME
+    JOBS[jobid] = {'started': time.monotonic(), 'content': contentid, 'failing': failing, \
+                   'jobtime': jobtime}
+    return {'id': jobid}
+
+def job_status(jobid):
+    """
+    Returns the status of a job
+    """
+
+    job = JOBS[jobid]
+    if time.monotonic() - job['started'] < job['jobtime']:
+        return {'status': 'InProgress', 'statusMessage': None, 'error': None}
+    if job['failing']:
+        return {'status': 'Failed', 'statusMessage': None, 'error': job.get('error', \
+                {'code': 'content:export_failed', 'message': 'injected failure'})}
+    return {'status': 'Success', 'statusMessage': None, 'error': None}
+
+def create_folder(body):
+    """
+    Creates an empty folder, refusing a name already used in its parent
+    """
+
+    parentid = body.get('parentId')
+    if parentid not in NODES:
+        raise KeyError(parentid)
+    with LOCK:
+        for childid in NODES[parentid]['children']:
+            if NODES[childid]['name'] == body['name']:
+                return 400, {'errors': [{'code': 'content:duplicate_content', \
+                                         'message': 'name already used in folder'}]}
+    return 200, summary(NODES[add_node(body['name'], 'Folder', parentid)])
+
+def start_import(folderid, body, overwrite):
+    """
+    Starts an import job into a folder. The item is added at once, replacing an item of
+    the same name if overwrite was asked for, and the job fails if it was not.
+    """
+
+    if folderid not in NODES:
+        raise KeyError(folderid)
+    itemtype = body.get('type', 'ContentSyncDefinition').replace('SyncDefinition', '')
+    duplicate = False
+    with LOCK:
+        for childid in list(NODES[folderid]['children']):
+            if NODES[childid]['name'] == body.get('name'):
+                duplicate = True
+                if overwrite:
+                    NODES[folderid]['children'].remove(childid)
+    if not duplicate or overwrite:
+        add_node(body.get('name', 'imported'), itemtype, folderid)
+    job = start_job()
+    if duplicate and not overwrite:
+        JOBS[job['id']].update(failing=True, error={'code': 'content:duplicate_content', \
+            'message': 'name already used in folder'})
+    return 200, job
+
+def export_result(contentid):
+    """
+    Returns a synthetic export payload of the configured size
+    """
+
+    node = NODES[contentid]
+    return {'type': f'{node["itemType"]}SyncDefinition', 'name': node['name'], \
+            'description': '', 'filler': 'x' * ARGS.PAYLOAD}
+
+def percentile(values, fraction):
+    """
+    Returns a percentile of a list of values
+    """
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+def report_stats():
+    """
+    Returns request counts and latency percentiles per endpoint
+    """
+
+    with LOCK:
+        endpoints = {}
+        for (route, latencies) in STATS['latency'].items():
+            endpoints[route] = {'count': len(latencies), \
+                                'p50': percentile(latencies, .50), \
+                                'p99': percentile(latencies, .99)}
+        every = [ latency for latencies in STATS['latency'].values() for latency in latencies ]
+        return {'requests': STATS['requests'], 'throttled': STATS['throttled'], \
+                'p50': percentile(every, .50), 'p99': percentile(every, .99), \
+                'nodes': len(NODES), 'endpoints': endpoints}
+
+ROUTES = (
+    ('GET', re.compile(r'^/v1/collectors$'), 'collectors'),
+    ('GET', re.compile(r'^/v2/content/folders/personal$'), 'personal'),
+    ('GET', re.compile(r'^/v2/content/folders/global$'), 'global_job'),
+    ('GET', re.compile(r'^/v2/content/folders/global/(\w+)/status$'), 'global_status'),
+    ('GET', re.compile(r'^/v2/content/folders/global/(\w+)/result$'), 'global_result'),
+    ('GET', re.compile(r'^/v2/content/folders/(\w+)$'), 'folder'),
+    ('POST', re.compile(r'^/v2/content/(\w+)/export$'), 'export_job'),
+    ('GET', re.compile(r'^/v2/content/(\w+)/export/(\w+)/status$'), 'export_status'),
+    ('GET', re.compile(r'^/v2/content/(\w+)/export/(\w+)/result$'), 'export_result'),
+    ('POST', re.compile(r'^/v2/content/folders$'), 'create_folder'),
+    ('POST', re.compile(r'^/v2/content/folders/(\w+)/import$'), 'import_job'),
+    ('GET', re.compile(r'^/v2/content/folders/(\w+)/import/(\w+)/status$'), 'import_status'),
+)
+
+def dispatch(route, groups, body=None, query=''):
+    """
+    Answers a routed request, returning the status code and body
+    """
+
+    answers = {
+        'collectors': lambda: {'collectors': []},
+        'personal': lambda: listing(PERSONAL),
+        'global_job': start_job,
+        'global_status': lambda: job_status(groups[0]),
+        'global_result': lambda: {'data': [ summary(NODES[nodeid]) for nodeid in TOPLEVEL ]},
+        'folder': lambda: listing(groups[0]),
+        'export_job': lambda: start_job(groups[0]),
+        'export_status': lambda: job_status(groups[1]),
+        'export_result': lambda: export_result(groups[0]),
+        'import_status': lambda: job_status(groups[1]),
+    }
+    try:
+        if route == 'create_folder':
+            return create_folder(body)
+        if route == 'import_job':
+            return start_import(groups[0], body, 'overwrite=true' in query)
+        return 200, answers[route]()
+    except KeyError:
+        return 404, {'errors': [{'code': 'not_found', 'message': 'no such id'}]}
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Routes requests to the mock content API
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        """
+        Keeps the console quiet
+        """
+
+    def reply(self, code, body, headers=None):
+        """
+        Sends a JSON reply
+        """
+        payload = json.dumps(body).encode('utf8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for (header, value) in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def handle_method(self, method):
+        """
+        Handles one request, with the configured latency and 429 injection
+        """
+        length = int(self.headers.get('Content-Length') or 0)
+        request = None
+        if length:
+            try:
+                request = json.loads(self.rfile.read(length))
+            except ValueError:
+                request = None
+
+        (path, _mark, query) = self.path.partition('?')
+        path = path.rstrip('/')
+        if path == '/_stats':
+            self.reply(200, report_stats())
+            return
+
+        starttime = time.monotonic()
+        time.sleep(ARGS.LATENCY)
+        path = path[len('/api'):] if path.startswith('/api') else path
+
+        with LOCK:
+            STATS['requests'] += 1
+            throttled = RANDOM.random() < ARGS.THROTTLE
+            if throttled:
+                STATS['throttled'] += 1
+        if throttled:
+            self.reply(429, {'errors': [{'code': 'rate_limit_exceeded'}]}, \
+                       {'Retry-After': str(ARGS.RETRYAFTER)})
+            return
+
+        (code, body, route) = (404, {'errors': [{'code': 'not_found'}]}, 'unknown')
+        for (verb, pattern, name) in ROUTES:
+            match = pattern.match(path)
+            if verb == method and match:
+                route = name
+                (code, body) = dispatch(route, match.groups(), request, query)
+                break
+
+        self.reply(code, body)
+        with LOCK:
+            STATS['latency'][route].append(time.monotonic() - starttime)
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """
+        Handles GET
+        """
+        self.handle_method('GET')
+
+    def do_POST(self): # pylint: disable=invalid-name
+        """
+        Handles POST
+        """
+        self.handle_method('POST')
+
+PERSONAL = add_node('Personal', 'Folder', '0000000000000000')
+
+def main():
+    """
+    Builds the tree and serves it until interrupted
+    """
+
+    build_tree(PERSONAL)
+    TOPLEVEL.append(PERSONAL)
+    for number in range(ARGS.GLOBALS):
+        folderid = add_node(f'Team{number:02d}', 'Folder', '0000000000000001')
+        build_tree(folderid)
+        TOPLEVEL.append(folderid)
+    for nodeid in list(NODES):
+        if NODES[nodeid]['itemType'] != 'Folder' and RANDOM.random() < ARGS.CHANGES:
+            touch(nodeid)
+    for nodeid in list(NODES):
+        if NODES[nodeid]['itemType'] != 'Folder' and RANDOM.random() < ARGS.SLOW:
+            SLOWITEMS.add(nodeid)
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', ARGS.PORT), MockHandler)
+    server.daemon_threads = True
+    print(f'Listening: http://127.0.0.1:{server.server_port}/api - {len(NODES)} items', \
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
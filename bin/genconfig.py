@@ -42,6 +42,9 @@ PARSER.add_argument('-c', metavar='<cfgfile>', dest='CONFIG', \
 PARSER.add_argument("-i", "--initialize", action='store_true', default=False, \
                     dest='INITIALIZE', help="initialize config file")
 
+PARSER.add_argument("-p", metavar='<profile>', dest='PROFILE', default='Default', \
+                    help="add or replace this section, one per org (default: Default)")
+
 ARGS = PARSER.parse_args(args=None if sys.argv[1:] else ['--help'])
 
 DEFAULTMAP = []
@@ -70,13 +73,14 @@ def collect_config_info(config):
     Collect information to populate the config file with
     """
 
-    config.add_section('Default')
+    if not config.has_section(ARGS.PROFILE):
+        config.add_section(ARGS.PROFILE)
 
     sumo_uid_input = input ("Please enter your Sumo Logic API Key Name: \n")
-    config.set('Default', 'SUMO_UID', sumo_uid_input )
+    config.set(ARGS.PROFILE, 'SUMO_UID', sumo_uid_input )
 
     sumo_key_input = input ("Please enter your Sumo Logic API Key String: \n")
-    config.set('Default', 'SUMO_KEY', sumo_key_input )
+    config.set(ARGS.PROFILE, 'SUMO_KEY', sumo_key_input )
 
 def persist_config_file(config):
     """
@@ -100,9 +104,11 @@ def display_config_file():
         my_config.optionxform = str
         my_config.read(cfg_file)
         print(f'### Contents: {cfg_file} ###\n')
-        for cfgitem in dict(my_config.items('Default')):
-            cfgvalue = my_config.get('Default', cfgitem)
-            print(f'{cfgitem} = {cfgvalue}')
+        for section in my_config.sections():
+            print(f'[{section}]')
+            for cfgitem in dict(my_config.items(section)):
+                cfgvalue = my_config.get(section, cfgitem)
+                print(f'{cfgitem} = {cfgvalue}')
     else:
         print(f'Unable to find: {cfg_file}')
 
@@ -121,6 +127,8 @@ def main():
 
         config.optionxform = str
 
+        config.read(os.path.join( VARTMPDIR, SRCTAG + ".initial.cfg"))
+
         collect_config_info(config)
 
         persist_config_file(config)
@@ -29,11 +29,42 @@ import sys
 import time
 import datetime
 import argparse
+import asyncio
+import base64
+import bisect
+import collections
 import configparser
-import http
+import concurrent.futures
+import contextlib
+import cProfile
+import csv
+import email.utils
+import fnmatch
+import gzip
+import hashlib
+import http.cookiejar
+import importlib
+import io
+import math
+import mmap
+import multiprocessing
+import pstats
+import random
+import struct
+import re
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import threading
 import zipfile
+import zlib
 import requests
 
+zstandard = None
+
+aiohttp = None
+
 sys.dont_write_bytecode = 1
 
 MY_CFG = 'undefined'
@@ -52,6 +83,9 @@ PARSER.add_argument("-k", metavar='<client>', dest='MY_CLIENT', \
 PARSER.add_argument("-c", metavar='<configfile>', dest='CONFIG', \
                     help="Specify config file")
 
+PARSER.add_argument("-p", metavar='<profile>', dest='PROFILE', default='Default', \
+                    help="set config file section to use, on top of Default (default: Default)")
+
 PARSER.add_argument("-t", metavar='<target>', dest='BACKUPTARGET', \
                     default='Personal', help="Specify backup target (Personal or Global)")
 
@@ -64,19 +98,184 @@ PARSER.add_argument("-v", type=int, default=4, metavar='<verbose>', \
 PARSER.add_argument("-z", default=False, metavar='<zipfile>', \
                     dest='ZIPFILE', help="create zipfile (default: False)")
 
-ARGS = PARSER.parse_args()
+PARSER.add_argument("--codec", default='deflate', metavar='<codec>', \
+                    choices=['deflate', 'zstd'], dest='ARCHIVECODEC', \
+                    help="set -z archive codec: deflate for a zip, zstd for a tar.zst " + \
+                    "(default: deflate)")
+
+PARSER.add_argument("--level", type=int, default=None, metavar='<level>', \
+                    dest='ARCHIVELEVEL', help="set -z compression level (default: 6 for " + \
+                    "deflate, 3 for zstd)")
+
+PARSER.add_argument("--cores", type=int, default=os.cpu_count() or 1, metavar='<cores>', \
+                    dest='CORES', help="set processes compressing the -z archive " + \
+                    "(default: all cores)")
+
+PARSER.add_argument("--seekable", action='store_true', default=False, dest='SEEKABLE', \
+                    help="write a zstd archive as one frame per file plus a seek table")
+
+PARSER.add_argument("-j", type=int, default=1, metavar='<workers>', \
+                    dest='WORKERS', help="set number of concurrent export jobs (default: 1)")
+
+PARSER.add_argument("-w", type=float, default=600, metavar='<seconds>', \
+                    dest='JOBTIMEOUT', help="set deadline for each export job (default: 600)")
+
+PARSER.add_argument("-r", type=float, default=None, metavar='<rate>', dest='RATELIMIT', \
+                    help="set API requests per second, 0 for unlimited (default: SUMO_RPS, or 4)")
+
+PARSER.add_argument("-n", type=int, default=5, metavar='<retries>', \
+                    dest='RETRIES', help="set retries for throttled or failed API calls " + \
+                    "(default: 5)")
+
+PARSER.add_argument("-f", type=int, default=2000, metavar='<folders>', \
+                    dest='FOLDERCACHE', help="set folder listings kept in memory (default: 2000)")
+
+PARSER.add_argument("-i", "--incremental", action='store_true', default=False, \
+                    dest='INCREMENTAL', help="export only new or changed content (default: False)")
+
+PARSER.add_argument("-s", default='tree', metavar='<store>', \
+                    choices=['tree', 'blob', 'zip', 'tar.gz', 'tar.zst', 'pack'], dest='STORE', \
+                    help="set storage for exports: tree, blob, zip, tar.gz, tar.zst, pack " + \
+                    "(default: tree)")
+
+PARSER.add_argument("-g", "--gc", type=int, default=None, metavar='<keep>', \
+                    dest='GCKEEP', help="keep the newest <keep> runs, prune the rest, and exit")
+
+PARSER.add_argument("--discovery-age", type=float, default=0, metavar='<hours>', \
+                    dest='DISCOVERYAGE', help="reuse folder listings of earlier runs while " + \
+                    "the folder is unmodified, for up to <hours> (default: 0, list every folder)")
+
+PARSER.add_argument("--schedule", default='longest', metavar='<order>', \
+                    choices=['longest', 'manifest'], dest='SCHEDULE', \
+                    help="set export order: longest first, as earlier runs timed exports, " + \
+                    "or manifest order (default: longest)")
 
-DELAY_TIME = .5
+PARSER.add_argument("--resume", default=None, metavar='<rundir>', \
+                    dest='RESUME', help="resume an interrupted run from its checkpoint")
+
+PARSER.add_argument("--stream", action='store_true', default=False, dest='STREAM', \
+                    help="export content while discovery walks the tree, in bounded memory")
+
+PARSER.add_argument("--prometheus", default=None, metavar='<textfile>', \
+                    dest='PROMFILE', help="also write run metrics to a Prometheus textfile")
+
+PARSER.add_argument("--profiler", default=None, metavar='<profiler>', \
+                    choices=['sample', 'cprofile'], dest='PROFILER', \
+                    help="profile each stage of the run with a sampling profiler or cProfile, " + \
+                    "into the manifest folder")
+
+PARSER.add_argument("--async", action='store_true', default=False, dest='ASYNCIO', \
+                    help="drive every API call from one asyncio event loop, instead of a " + \
+                    "thread per worker (needs aiohttp)")
+
+PARSER.add_argument("--include", action='append', default=None, metavar='<filter>', \
+                    dest='INCLUDES', help="only back up content matching id:<id>, re:<regex>, " + \
+                    "or a path glob, and everything below it (repeatable)")
+
+PARSER.add_argument("--exclude", action='append', default=None, metavar='<filter>', \
+                    dest='EXCLUDES', help="skip content matching id:<id>, re:<regex>, " + \
+                    "or a path glob, and everything below it (repeatable)")
+
+ARGS = None
+
+CONFIGOPTIONS = ('SUMO_TAG', 'SUMO_UID', 'SUMO_KEY', 'SUMO_LOC', 'SUMO_END', 'SUMO_ORG', \
+                 'SUMO_RPS')
+
+POLL_START = .1
+
+POLL_FACTOR = 2
+
+POLL_LIMIT = 5.0
+
+RETRY_CODES = (429, 500, 502, 503, 504)
+
+RETRY_START = .5
+
+RETRY_LIMIT = 30.0
+
+API_TIMEOUT = (10, 60)
 
 CONTENTMAP = {}
 
+FOLDERCACHE = None
+
+CONTENTFILTER = None
+
+DISCOVERYCACHE = None
+
+ENGINE = None
+
 REPORTTAG = 'sumologic-backup'
 
-RIGHTNOW = datetime.datetime.now()
+RUNPATTERN = re.compile(r'^[0-9]{8}[.][0-9]{6}$')
+
+SNAPSHOTNAME = f'{REPORTTAG}.snapshot.jsonl'
+
+CHECKPOINTNAME = f'{REPORTTAG}.contentmap.json'
+
+JOURNALNAME = f'{REPORTTAG}.journal.jsonl'
+
+REPORTNAME = f'{REPORTTAG}.report.json'
+
+INDEXNAME = f'{REPORTTAG}.index.db'
+
+DISCOVERYNAME = f'{REPORTTAG}.discovery.db'
+
+PROFILENAME = f'{REPORTTAG}.profile'
+
+SCHEDULERUNS = 3
+
+PROFILE_INTERVAL = .01
+
+LATENCYBUCKETS = tuple(.001 * 2 ** (step / 2) for step in range(37))
+
+PROFILE_TOP = 25
+
+CPROFILE_ALLTHREADS = sys.version_info >= (3, 12)
+
+MANIFESTNAME = f'{REPORTTAG}.csv'
+
+MANIFESTJSONNAME = f'{REPORTTAG}.manifest.jsonl'
+
+MANIFESTDBNAME = f'{REPORTTAG}.manifest.db'
+
+ARCHIVELEVELS = {'deflate': 6, 'zstd': 3}
+
+ARCHIVEBATCH = 4 * 2**20
+
+SEEKFRAMEMAGIC = 0x184D2A5E
+
+SEEKTABLEMAGIC = 0x8F92EAB1
+
+PACKNAME = 'content.pack'
+
+PACKINDEXNAME = 'content.idx'
+
+PACKMAGIC = b'SUMOPACK'
+
+PACKINDEXMAGIC = b'SUMOPIDX'
+
+PACKVERSION = 1
+
+PACKCODECS = ('zlib', 'zstd')
+
+PACKKEYSIZE = 16
+
+PACKHEADER = struct.Struct('>8sBB')
+
+PACKRECORD = struct.Struct(f'>{PACKKEYSIZE}sII')
+
+PACKINDEXHEADER = struct.Struct('>8sQ')
 
-DATESTAMP = RIGHTNOW.strftime('%Y%m%d')
+PACKENTRY = struct.Struct(f'>{PACKKEYSIZE}sQII')
 
-TIMESTAMP = RIGHTNOW.strftime('%H%M%S')
+ROUTEPATTERN = re.compile(r'/[0-9A-Za-z]{16,}(?=/|$)')
+
+DEFAULT_ENDPOINT = 'https://api.sumologic.com/api'
+
+ENDPOINTCACHE = os.path.join('~', '.cache', REPORTTAG, 'endpoints.json')
+
+ENDPOINT_TTL = 86400
 
 def resolve_option_variables():
     """
@@ -110,26 +309,20 @@ def resolve_config_variables():
         configobj.optionxform = str
         configobj.read(cfgfile)
 
-        if ARGS.verbose > 8:
-            print(dict(configobj.items('Default')))
-
-        if configobj.has_option("Default", "SUMO_TAG"):
-            os.environ['SUMO_TAG'] = configobj.get("Default", "SUMO_TAG")
+        if not configobj.has_section(ARGS.PROFILE):
+            print(f'Profile Not Found :: {ARGS.PROFILE}')
+            sys.exit(1)
 
-        if configobj.has_option("Default", "SUMO_UID"):
-            os.environ['SUMO_UID'] = configobj.get("Default", "SUMO_UID")
+        for section in dict.fromkeys(('Default', ARGS.PROFILE)):
+            if not configobj.has_section(section):
+                continue
 
-        if configobj.has_option("Default", "SUMO_KEY"):
-            os.environ['SUMO_KEY'] = configobj.get("Default", "SUMO_KEY")
+            if ARGS.verbose > 8:
+                print(dict(configobj.items(section)))
 
-        if configobj.has_option("Default", "SUMO_LOC"):
-            os.environ['SUMO_LOC'] = configobj.get("Default", "SUMO_LOC")
-
-        if configobj.has_option("Default", "SUMO_END"):
-            os.environ['SUMO_END'] = configobj.get("Default", "SUMO_END")
-
-        if configobj.has_option("Default", "SUMO_ORG"):
-            os.environ['SUMO_ORG'] = configobj.get("Default", "SUMO_ORG")
+            for option in CONFIGOPTIONS:
+                if configobj.has_option(section, option):
+                    os.environ[option] = configobj.get(section, option)
 
 def initialize_variables():
     """
@@ -146,82 +339,111 @@ def initialize_variables():
 
     except KeyError as myerror:
         print(f'Environment Variable Not Set :: {myerror.args[0]}')
+        sys.exit(1)
 
     return my_uid, my_key
 
-( sumo_uid, sumo_key ) = initialize_variables()
-
 def create_backup_directory():
     """
     Create a backup directory for all of the content retrieved
     """
 
-    time_tag = '.'.join((DATESTAMP, TIMESTAMP))
-    backupdir = os.path.abspath(os.path.join(ARGS.OUTPUTDIR, time_tag, 'content'))
-    os.makedirs(backupdir, exist_ok = True)
+    if ARGS.RESUME:
+        rundir = os.path.abspath(ARGS.RESUME)
+        ARGS.OUTPUTDIR = os.path.dirname(rundir)
+    else:
+        time_tag = datetime.datetime.now().strftime('%Y%m%d.%H%M%S')
+        rundir = os.path.abspath(os.path.join(ARGS.OUTPUTDIR, time_tag))
+
+    backupdir = os.path.join(rundir, 'content')
+    if ARGS.STORE == 'tree':
+        os.makedirs(backupdir, exist_ok = True)
 
-    reportdir = os.path.abspath(os.path.join(ARGS.OUTPUTDIR, time_tag, 'manifest'))
+    reportdir = os.path.join(rundir, 'manifest')
     os.makedirs(reportdir, exist_ok = True)
 
     return backupdir, reportdir
 
-def build_details(source, parent_name, parent_oid_path, child):
+def add_details(child, anchor=None):
     """
-    Build the details for the client entry. If a folder recurse
+    Add the details for the client entry. Only top level entries need an anchor,
+    as paths for everything else are derived from the parent chain.
     """
 
-    my_type = child['itemType']
-    uid_myself = child['id']
-    uid_parent = child['parentId']
+    CONTENTMAP[child['id']] = ContentItem(child['id'], child['parentId'], child['name'], \
+        child['itemType'], child.get('modifiedAt', ''), anchor)
 
-    my_name = child['name']
+def build_details(source, folders):
+    """
+    Build the details for the contents of a list of folders already in CONTENTMAP,
+    listing sibling folders concurrently and reusing cached listings where allowed
+    """
 
-    my_path_list = ( parent_name, my_name )
-    my_path_name = '/'.join(my_path_list)
+    workqueue = collections.deque(folders)
+    pending = {}
 
-    my_oid_list = ( parent_oid_path, uid_myself )
-    my_oid_path = '/'.join(my_oid_list)
+    with open_executor() as executor:
+        while workqueue or pending:
+            while workqueue:
+                uid_myself = workqueue.popleft()
+                content_list = cached_listing(CONTENTMAP[uid_myself])
+                if content_list is not None:
+                    add_listing(uid_myself, content_list, workqueue)
+                else:
+                    pending[executor.submit(source.get_myfolder, uid_myself)] = uid_myself
 
-    if my_type == "Folder":
-        content_list = source.get_myfolder(uid_myself)
-        for content_child in content_list['children']:
-            build_details(source, my_path_name, my_oid_path, content_child)
+            if not pending:
+                continue
 
-    CONTENTMAP[uid_myself] = {}
-    CONTENTMAP[uid_myself]["parent"] = uid_parent
-    CONTENTMAP[uid_myself]["myself"] = uid_myself
-    CONTENTMAP[uid_myself]["name"] = my_name
-    CONTENTMAP[uid_myself]["path"] = my_path_name
-    CONTENTMAP[uid_myself]["backupname"] = uid_myself
-    CONTENTMAP[uid_myself]["backuppath"] = my_oid_path
-    CONTENTMAP[uid_myself]["type"] = my_type
+            done, _not_done = concurrent.futures.wait(pending, \
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                uid_myself = pending.pop(future)
+                content_list = future.result()
+                cache_listing(CONTENTMAP[uid_myself], content_list)
+                add_listing(uid_myself, content_list, workqueue)
 
-def create_manifest(manifestdir):
+def add_listing(uid_myself, content_list, workqueue):
     """
-    Now display the output we want from the CONTENTMAP data structure we made.
+    Adds the children of a folder listing to CONTENTMAP, queueing its subfolders to be listed
+    """
+
+    FOLDERCACHE.put(uid_myself, content_list)
+    for content_child in content_list['children']:
+        if admit_child(CONTENTMAP[uid_myself], content_child) is None:
+            continue
+        add_details(content_child)
+        if content_child['itemType'] == "Folder":
+            workqueue.append(content_child['id'])
+
+def cached_listing(folder):
+    """
+    Returns the listing of a folder from the discovery cache if it is still current, or None
     """
-    manifestname = f'{REPORTTAG}.csv'
-    manifestfile = os.path.join(manifestdir, manifestname)
 
-    with open(manifestfile, 'a', encoding='utf8') as manifestobject:
-        my_header = "uid_myself,uid_parent,my_type,my_name,my_path,backup_oid,backup_path"
-        manifestobject.write(f'{my_header}\n')
+    if DISCOVERYCACHE is None:
+        return None
+    return DISCOVERYCACHE.get(folder)
+
+def cache_listing(folder, content_list):
+    """
+    Keeps a fresh folder listing in the discovery cache for later runs
+    """
 
-        for ckv in CONTENTMAP:
-            content_item, _content_value = ckv[0], ckv[1]
-            uip = CONTENTMAP[content_item]["parent"]
-            uim = CONTENTMAP[content_item]["myself"]
-            myn = CONTENTMAP[content_item]["name"]
-            myp = CONTENTMAP[content_item]["path"]
-            myt = CONTENTMAP[content_item]["type"]
-            mybn = CONTENTMAP[content_item]["backupname"]
-            mybp = CONTENTMAP[content_item]["backuppath"]
+    if DISCOVERYCACHE is not None:
+        DISCOVERYCACHE.put(folder, content_list)
 
-            manifestobject.write(f'{uim},{uip},{myt},\"{myn}\",\"{myp}\",{mybn},{mybp}')
+def create_manifest(manifestdir):
+    """
+    Now display the output we want from the CONTENTMAP data structure we made.
+    """
+    with contextlib.closing(ManifestWriter(manifestdir)) as manifest:
+        for content_item in CONTENTMAP.values():
+            manifest.add(content_item)
 
-def create_personal_folder_content_map(source):
+def personal_folder_root(source):
     """
-    This builds the content map for the 'Personal' folder
+    Returns the 'Personal' folder as a top level item, along with its listing
     """
 
     content_list = source.get_myfolders()
@@ -231,250 +453,2528 @@ def create_personal_folder_content_map(source):
     uid_myself = content_list['id']
     uid_parent = content_list['parentId']
 
-    CONTENTMAP[uid_myself] = {}
-    CONTENTMAP[uid_myself]["parent"] = uid_parent
-    CONTENTMAP[uid_myself]["myself"] = uid_myself
-    CONTENTMAP[uid_myself]["name"] = parent_name
-    CONTENTMAP[uid_myself]["path"] = "/" + parent_name
-    CONTENTMAP[uid_myself]["backupname"] = parent_name
-    CONTENTMAP[uid_myself]["backuppath"] = parent_base_path
-    CONTENTMAP[uid_myself]["type"] = 'Folder'
+    root = ContentItem(uid_myself, uid_parent, parent_name, 'Folder', \
+        content_list.get('modifiedAt', ''), \
+        ("/" + parent_name, parent_base_path, parent_name, parent_name))
+    return root, content_list
 
-    for child in content_list['children']:
-        build_details(source, parent_name, parent_base_path, child)
+def discover_roots(source):
+    """
+    Returns the top level items of the backup target, anchored with their paths,
+    paired with their folder listing when it was fetched already
+    """
 
+    if CONTENTFILTER is None:
+        return target_roots(source)
 
-def create_content_map(source):
+    roots = CONTENTFILTER.resolve(source)
+    if CONTENTFILTER.includes or not roots:
+        for (root, content_list) in target_roots(source):
+            if CONTENTFILTER.admit(root.myself, root.type, root.childpath, False) is not None:
+                roots.append((root, content_list))
+    return roots
+
+def admit_child(folder, child):
     """
-    This will collect the information on object for sumologic and then collect that into a list.
-    the output of the action will provide a tuple of the orgid, objecttype, and id
+    Applies the content filter to a child in the listing of a folder. Returns True to keep
+    it, False to keep a folder only to walk it, and None to leave it out unlisted.
     """
 
-    if ARGS.BACKUPTARGET == 'Personal':
+    if CONTENTFILTER is None:
+        return True
+    return CONTENTFILTER.admit(child['id'], child['itemType'], \
+        f'{folder.childpath}/{child["name"]}', CONTENTFILTER.is_covered(folder.myself))
 
-        create_personal_folder_content_map(source)
+def prune_content_map():
+    """
+    Drops the folders discovery only walked on the way to an include, if nothing below
+    them was included after all
+    """
 
-    else:
+    if CONTENTFILTER is None:
+        return
+    for folderid in CONTENTFILTER.unneeded(CONTENTMAP):
+        del CONTENTMAP[folderid]
+        FOLDERCACHE.pop(folderid)
 
-        gfolder_job = source.get_globalfolder_job()['id']
-        gfolder_status = source.get_globalfolder_job_status(gfolder_job)['status']
+def target_roots(source):
+    """
+    Finds the top level items of the backup target, Personal or Global
+    """
+
+    if ARGS.BACKUPTARGET == 'Personal':
+        return [ personal_folder_root(source) ]
 
-        while gfolder_status != 'Success':
-            gfolder_status = source.get_globalfolder_job_status(gfolder_job)['status']
+    gfolder_job = source.get_globalfolder_job()['id']
 
-        gfolder_result = source.get_globalfolder_job_result(gfolder_job)
-        for child in gfolder_result['data']:
-            if child['name'] == 'Personal':
-                create_personal_folder_content_map(source)
+    try:
+        JobPoller(ARGS.JOBTIMEOUT).wait(lambda: \
+            source.get_globalfolder_job_status(gfolder_job), f'global folder job {gfolder_job}')
+    except JobFailure as myerror:
+        print(f'Discovery Failed :: {myerror}')
+        sys.exit(1)
+
+    gfolder_result = source.get_globalfolder_job_result(gfolder_job)
+    roots = []
+    for child in gfolder_result['data']:
+        if child['name'] == 'Personal':
+            roots.append(personal_folder_root(source))
+        else:
+            uid_myself = child['id']
+            my_name = child['name']
+            my_path_name = '/'.join(("", my_name))
+            if child['itemType'] == 'Folder':
+                my_oid_path = '/'.join((uid_myself, uid_myself))
+                anchor = (my_path_name, my_oid_path, uid_myself, my_path_name)
             else:
+                anchor = (my_path_name, uid_myself, uid_myself, my_path_name)
+            roots.append((ContentItem(uid_myself, child['parentId'], my_name, \
+                child['itemType'], child.get('modifiedAt', ''), anchor), None))
+    return roots
+
+def create_content_map(source):
+    """
+    This will collect the information on object for sumologic and then collect that into a list.
+    the output of the action will provide a tuple of the orgid, objecttype, and id
+    """
+
+    folders = []
+    for (root, content_list) in discover_roots(source):
+        CONTENTMAP[root.myself] = root
+        if content_list is not None:
+            FOLDERCACHE.put(root.myself, content_list)
+            for child in content_list['children']:
+                if admit_child(root, child) is None:
+                    continue
+                add_details(child)
                 if child['itemType'] == 'Folder':
-                    parent_name = ""
-                    parent_base_path = child['id']
-                    _child_name = child['name']
-                    uid_myself = child['id']
-                    uid_parent = child['parentId']
-                    build_details(source, parent_name, parent_base_path, child)
-                else:
-                    uid_myself = child['id']
-                    uid_parent = child['parentId']
-                    my_name = child['name']
-                    my_type = child['itemType']
-
-                    CONTENTMAP[uid_myself] = {}
-                    CONTENTMAP[uid_myself]["parent"] = uid_parent
-                    CONTENTMAP[uid_myself]["myself"] = uid_myself
-                    CONTENTMAP[uid_myself]["name"] = my_name
-                    CONTENTMAP[uid_myself]["path"] = my_name
-                    CONTENTMAP[uid_myself]["backupname"] = uid_myself
-                    CONTENTMAP[uid_myself]["backuppath"] = uid_myself
-                    CONTENTMAP[uid_myself]["type"] = my_type
+                    folders.append(child['id'])
+        elif root.type == 'Folder':
+            folders.append(root.myself)
+
+    build_details(source, folders)
+    prune_content_map()
 
     return CONTENTMAP
 
+def stream_details(source, manifest, backupdir=None):
+    """
+    Discovers content depth first and yields each item as it is found, writing it
+    to the manifest, instead of building CONTENTMAP
+    """
+
+    stack = []
+    ready = []
+    for (root, content_list) in discover_roots(source):
+        if content_list is not None:
+            ready.extend(expand_folder(root, content_list, stack, backupdir))
+        elif root.type == 'Folder':
+            stack.append(root)
+        else:
+            ready.append(root)
+
+    pending = {}
+    with open_executor() as executor:
+        while ready or stack or pending:
+            for content_item in ready:
+                manifest.add(content_item)
+                METRICS.add('items_discovered')
+                yield content_item
+            ready = []
+
+            while stack and len(pending) < max(ARGS.WORKERS, 1):
+                folder = stack.pop()
+                content_list = cached_listing(folder)
+                if content_list is not None:
+                    ready.extend(expand_folder(folder, content_list, stack, backupdir))
+                    break
+                pending[executor.submit(source.get_myfolder, folder.myself)] = folder
+
+            if pending and not ready:
+                done, _not_done = concurrent.futures.wait(pending, \
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    folder = pending.pop(future)
+                    content_list = future.result()
+                    cache_listing(folder, content_list)
+                    ready.extend(expand_folder(folder, content_list, stack, backupdir))
+
+def expand_folder(folder, content_list, stack, backupdir=None):
+    """
+    Caches a folder listing, creates its backup folder if any, stacks its subfolders,
+    and returns the folder and the content items the filter keeps
+    """
+
+    FOLDERCACHE.put(folder.myself, content_list)
+    if backupdir is not None:
+        os.makedirs(os.path.join(backupdir, folder.backuppath), exist_ok = True)
+
+    expanded = [folder]
+    for child in content_list['children']:
+        if admit_child(folder, child) is None:
+            continue
+        content_child = folder.anchor_child(child)
+        if content_child.type == 'Folder':
+            stack.append(content_child)
+        else:
+            expanded.append(content_child)
+    return expanded
+
+def save_content_map(reportdir):
+    """
+    Checkpoints the discovered CONTENTMAP so an interrupted run can skip discovery
+    """
+
+    checkpointfile = os.path.join(reportdir, CHECKPOINTNAME)
+    with open(f'{checkpointfile}.tmp', 'w', encoding='utf8') as checkpointobject:
+        json.dump([ item.to_record() for item in CONTENTMAP.values() ], checkpointobject)
+    os.replace(f'{checkpointfile}.tmp', checkpointfile)
+
+def load_content_map(reportdir):
+    """
+    Loads CONTENTMAP from the checkpoint of an earlier run, returning False if there is none
+    """
+
+    checkpointfile = os.path.join(reportdir, CHECKPOINTNAME)
+    if not os.path.exists(checkpointfile):
+        return False
+    with open(checkpointfile, 'r', encoding='utf8') as checkpointobject:
+        for record in json.load(checkpointobject):
+            item = ContentItem.from_record(record)
+            CONTENTMAP[item.myself] = item
+    return True
+
 def create_backup_folders(backups):
     """
     This creates the intermediary directories so we can archive content an element at a time
     """
 
-    for ckv in CONTENTMAP:
-        content_item, _content_value = ckv[0], ckv[1]
-        backup_type = CONTENTMAP[content_item]["type"]
-        backup_path = CONTENTMAP[content_item]["backuppath"]
+    for content_item in CONTENTMAP:
+        backup_type = CONTENTMAP[content_item].type
+        backup_path = CONTENTMAP[content_item].backuppath
         if backup_type == 'Folder':
             backup_target_dir = os.path.join(backups, backup_path)
             os.makedirs(backup_target_dir, exist_ok = True)
 
-def backup_content(source,backupdir):
+def open_executor():
     """
-    Runs through CONTENTMAP again this time exporting the content into an appropriate location
+    Returns what API calls are submitted to: the asyncio engine of the run, or a pool
+    of ARGS.WORKERS threads
     """
 
-    for ckv in CONTENTMAP:
-        content_item, _content_value = ckv[0], ckv[1]
+    if ENGINE is not None:
+        return contextlib.nullcontext(ENGINE)
+    return concurrent.futures.ThreadPoolExecutor(max_workers=max(ARGS.WORKERS, 1))
 
-        backup_type = CONTENTMAP[content_item]["type"]
-        contentid = CONTENTMAP[content_item]["myself"]
+def export_content(source, contentid, backup_type, journal, priorjob=None):
+    """
+    Exports a single content item, returning the export result. An export job left in
+    flight by an interrupted run is polled again first, and restarted if it is gone.
+    """
 
-        backuptarget = os.path.join(backupdir, CONTENTMAP[contentid]['backuppath']) + '.json'
+    if backup_type != 'Folder':
+        if priorjob is not None:
+            try:
+                JobPoller(ARGS.JOBTIMEOUT).wait(lambda: \
+                    source.check_export_job_status(contentid,priorjob), f'export job {priorjob}')
+                return source.check_export_job_result(contentid,priorjob)
+            except (requests.exceptions.HTTPError, JobFailure):
+                pass
+
+        exportjob = source.start_export_job(contentid)['id']
+        journal.started(contentid, exportjob)
+        JobPoller(ARGS.JOBTIMEOUT).wait(lambda: \
+            source.check_export_job_status(contentid,exportjob), f'export job {exportjob}')
+
+        exportresult = source.check_export_job_result(contentid,exportjob)
+    else:
+        exportresult = FOLDERCACHE.pop(contentid)
+        if exportresult is None:
+            exportresult = source.get_myfolder(contentid)
 
-        if backup_type != 'Folder':
-            exportjob = source.start_export_job(contentid)['id']
-            exportstatus = source.check_export_job_status(contentid,exportjob)['status']
-            while exportstatus != 'Success':
-                exportstatus = source.check_export_job_status(contentid,exportjob)['status']
+    return exportresult
 
-            exportresult = source.check_export_job_result(contentid,exportjob)
-        else:
-            exportresult = source.get_myfolder(contentid)
+async def export_content_async(source, contentid, backup_type, journal, priorjob=None):
+    """
+    Exports a single content item on the asyncio engine, as export_content does
+    """
 
-        if ARGS.verbose > 4:
-            print(f'Exporting: {contentid} - {backuptarget}')
+    client = source.client
+    if backup_type != 'Folder':
+        if priorjob is not None:
+            try:
+                await JobPoller(ARGS.JOBTIMEOUT).wait_async(lambda: \
+                    client.check_export_job_status(contentid,priorjob), f'export job {priorjob}')
+                return await client.check_export_job_result(contentid,priorjob)
+            except (requests.exceptions.HTTPError, JobFailure):
+                pass
+
+        exportjob = (await client.start_export_job(contentid))['id']
+        journal.started(contentid, exportjob)
+        await JobPoller(ARGS.JOBTIMEOUT).wait_async(lambda: \
+            client.check_export_job_status(contentid,exportjob), f'export job {exportjob}')
+
+        exportresult = await client.check_export_job_result(contentid,exportjob)
+    else:
+        exportresult = FOLDERCACHE.pop(contentid)
+        if exportresult is None:
+            exportresult = await client.get_myfolder(contentid)
 
-        with open (backuptarget, "w", encoding='utf8') as backupobject:
-            backupobject.write(json.dumps(exportresult) + '\n')
+    return exportresult
+
+export_content.coroutine = export_content_async
+
+def pack_key(contentid):
+    """
+    Returns the fixed width pack key of an id. Sumo Logic ids are 16 hex characters,
+    and are their own key; anything else is keyed by a truncated digest.
+    """
+
+    key = contentid.encode('utf8')
+    if len(key) > PACKKEYSIZE:
+        key = hashlib.sha256(key).digest()[:PACKKEYSIZE]
+    return key.ljust(PACKKEYSIZE, b'\0')
+
+def open_store(backupdir, reportdir):
+    """
+    Opens the storage backend selected for this run
+    """
+
+    if ARGS.STORE == 'blob':
+        return BlobStore(ARGS.OUTPUTDIR, reportdir)
+    if ARGS.STORE == 'pack':
+        return PackStore(os.path.dirname(backupdir))
+    if ARGS.STORE != 'tree':
+        return ArchiveStore(os.path.dirname(backupdir), ARGS.STORE)
+    return TreeStore(backupdir)
+
+def export_history(currentrun):
+    """
+    Returns the seconds and bytes of each export timed by the journals of the newest
+    SCHEDULERUNS earlier runs in the output directory, the newest timing winning
+    """
 
-def create_zipfile(backupdir):
+    runs = sorted((d for d in os.listdir(ARGS.OUTPUTDIR) \
+                   if RUNPATTERN.match(d) and d != currentrun), reverse=True)
+    history = {}
+    for run in runs[:SCHEDULERUNS]:
+        journalfile = os.path.join(ARGS.OUTPUTDIR, run, 'manifest', JOURNALNAME)
+        if not os.path.exists(journalfile):
+            continue
+        with open(journalfile, 'r', encoding='utf8') as journalobject:
+            for line in journalobject:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry['event'] == 'done' and 'seconds' in entry:
+                    history.setdefault(entry['id'], (entry['seconds'], entry.get('bytes', 0)))
+    return history
+
+def schedule_content(content_items, reportdir):
     """
-    Create the zipfile from the backup directory
+    Orders content for export longest first, by the time earlier runs took per item,
+    or the mean of its type for items without a timing
     """
-    targetzipfile = f'{backupdir}/{REPORTTAG}.{DATESTAMP}.{TIMESTAMP}.zip'
+
+    content_items = list(content_items)
+    history = export_history(os.path.basename(os.path.dirname(reportdir)))
+    if not history:
+        return content_items
+
+    totals = {}
+    for item in content_items:
+        if item.myself in history:
+            (seconds, size) = history[item.myself]
+            total = totals.setdefault(item.type, [0.0, 0, 0])
+            total[0] += seconds
+            total[1] += size
+            total[2] += 1
+    typical = { itemtype: (total[0] / total[2], total[1] / total[2]) \
+                for itemtype, total in totals.items() }
 
     if ARGS.verbose > 4:
-        print(f'Creating: zipfile {targetzipfile}')
+        print(f'Scheduling: {len(content_items)} items - {len(history)} timed by ' + \
+              'earlier runs - longest first')
+    return sorted(content_items, key=lambda item: history.get(item.myself) or \
+                  typical.get(item.type, (0.0, 0)), reverse=True)
+
+def backup_content(source, backupdir, store, journal, content_items):
+    """
+    Runs through the content items again this time exporting the content into an appropriate
+    location, carrying unchanged content forward and skipping content already journaled
+    """
+
+    starttime = time.time()
+    exported = 0
+    carried = 0
+    failed = 0
+
+    contentindex = None
+    if ARGS.INCREMENTAL:
+        contentindex = ContentIndex(os.path.join(ARGS.OUTPUTDIR, INDEXNAME))
+        runtag = os.path.basename(os.path.dirname(backupdir))
+        contentindex.start_run(runtag, ARGS.BACKUPTARGET)
+
+    content_items = iter(content_items)
+    window = max(ARGS.WORKERS, 1) * 2
+    pending = {}
+    exhausted = False
+
+    with open_executor() as executor:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                content_item = next(content_items, None)
+                if content_item is None:
+                    exhausted = True
+                    break
+
+                backup_type = content_item.type
+                contentid = content_item.myself
+
+                if contentid in journal.done:
+                    continue
+
+                if contentindex is not None and backup_type != 'Folder':
+                    prior = contentindex.prior(content_item)
+                    if prior is not None and store.carry(content_item, prior):
+                        contentindex.record(content_item, runtag, prior['digest'])
+                        journal.finished(contentid, prior['digest'])
+                        carried += 1
+                        METRICS.add('items_carried')
+                        continue
+
+                future = executor.submit(export_content, source, contentid, backup_type, \
+                    journal, journal.inflight.get(contentid))
+                pending[future] = content_item
+
+            if not pending:
+                continue
+
+            done, _not_done = concurrent.futures.wait(pending, \
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                content_item = pending.pop(future)
+                contentid = content_item.myself
+
+                try:
+                    exportresult = future.result()
+                except (requests.exceptions.RequestException, JobFailure) as myerror:
+                    failed += 1
+                    METRICS.add('items_failed')
+                    print(f'Failed: {contentid} - {myerror}')
+                    continue
+
+                starttime_write = time.perf_counter()
+                (backuptarget, digest, size) = store.write(content_item, exportresult)
+                METRICS.add('write_seconds', time.perf_counter() - starttime_write)
+
+                if ARGS.verbose > 4:
+                    print(f'Exporting: {contentid} - {backuptarget}')
+
+                if contentindex is not None:
+                    contentindex.record(content_item, runtag, digest)
+
+                journal.finished(contentid, digest, size)
+                exported += 1
+                METRICS.add('items_exported')
+
+    FOLDERCACHE.close()
+    store.close()
+    journal.release()
+    journal.close()
+
+    if contentindex is not None:
+        contentindex.finish_run(runtag, exported, carried, failed)
+        contentindex.close()
+
+    elapsed = time.time() - starttime
+    if ARGS.verbose > 3:
+        rate = exported / elapsed if elapsed > 0 else 0.0
+        print(f'Completed: {exported} items in {elapsed:.1f} seconds - ' + \
+              f'{rate:.2f} items/sec - {carried} unchanged - {failed} failed - ' + \
+              f'{ARGS.WORKERS} workers')
+
+def collect_garbage(keep):
+    """
+    Prunes all but the newest keep runs, and their archives, from the output directory,
+    then removes any blob no longer referenced by the snapshot manifest of a remaining run
+    """
+
+    keep = max(keep, 1)
+    runs = sorted(d for d in os.listdir(ARGS.OUTPUTDIR) if RUNPATTERN.match(d))
+    (pruned, kept) = (runs[:-keep], runs[-keep:])
+
+    for run in pruned:
+        if ARGS.verbose > 4:
+            print(f'Pruning: run {run}')
+        shutil.rmtree(os.path.join(ARGS.OUTPUTDIR, run))
+        for suffix in ('zip', 'tar.zst'):
+            archivefile = os.path.join(ARGS.OUTPUTDIR, f'{REPORTTAG}.{run}.{suffix}')
+            if os.path.exists(archivefile):
+                os.remove(archivefile)
+
+    referenced = set()
+    for run in kept:
+        snapshotfile = os.path.join(ARGS.OUTPUTDIR, run, 'manifest', SNAPSHOTNAME)
+        if os.path.exists(snapshotfile):
+            with open(snapshotfile, 'r', encoding='utf8') as snapshotobject:
+                for line in snapshotobject:
+                    referenced.add(json.loads(line)['digest'])
+
+    removed = 0
+    freed = 0
+    objectdir = os.path.join(ARGS.OUTPUTDIR, 'objects')
+    for foldername, _subfolders, filenames in os.walk(objectdir):
+        for filename in filenames:
+            digest = os.path.basename(foldername) + filename.split('.')[0]
+            if digest not in referenced:
+                objectfile = os.path.join(foldername, filename)
+                freed += os.path.getsize(objectfile)
+                os.remove(objectfile)
+                removed += 1
+
+    if ARGS.verbose > 3:
+        print(f'Collected: {len(pruned)} runs pruned - {len(kept)} runs kept - ' + \
+              f'{removed} blobs removed - {freed} bytes freed')
+
+def create_archive(rundir, codec='deflate', level=None, cores=1, seekable=False):
+    """
+    Archives the run directory next to it, compressing batches of files across cores
+    processes, and returns the archive file
+    """
+    level = ARCHIVELEVELS[codec] if level is None else level
+    suffix = 'zip' if codec == 'deflate' else 'tar.zst'
+    archivefile = os.path.join(os.path.dirname(rundir), \
+        f'{REPORTTAG}.{os.path.basename(rundir)}.{suffix}')
+
+    batches = [[]]
+    batchsize = 0
+    for foldername, _subfolders, filenames in os.walk(rundir):
+        for filename in filenames:
+            filepath = os.path.join(foldername, filename)
+            if batchsize >= ARCHIVEBATCH:
+                batches.append([])
+                batchsize = 0
+            batches[-1].append(os.path.relpath(filepath, rundir))
+            batchsize += os.path.getsize(filepath)
+    tasks = [ (codec, level, seekable, rundir, batch) for batch in batches if batch ]
+
+    with open(archivefile, 'wb') as archiveobject, contextlib.ExitStack() as stack:
+        if codec == 'deflate':
+            zipobject = stack.enter_context(zipfile.ZipFile(archiveobject, 'w', \
+                zipfile.ZIP_DEFLATED))
+        seektable = []
+        for entries in compressed_batches(tasks, cores):
+            for (arcname, zipinfo, payload, size) in entries:
+                if codec == 'deflate':
+                    zipinfo.header_offset = archiveobject.tell()
+                    archiveobject.write(zipinfo.FileHeader())
+                    zipobject.filelist.append(zipinfo)
+                    zipobject.NameToInfo[arcname] = zipinfo
+                archiveobject.write(payload)
+                seektable.append((len(payload), size))
+        if codec == 'deflate':
+            zipobject.start_dir = archiveobject.tell()
+            zipobject._didModify = True # pylint: disable=protected-access
+        else:
+            trailer = load_zstandard().ZstdCompressor(level=level).compress( \
+                b'\0' * 2 * tarfile.BLOCKSIZE)
+            archiveobject.write(trailer)
+            seektable.append((len(trailer), 2 * tarfile.BLOCKSIZE))
+            if seekable:
+                archiveobject.write(seek_table(seektable))
+    return archivefile
+
+def compressed_batches(tasks, cores):
+    """
+    Yields the compressed entries of each batch in order, from a pool of spawned
+    processes, or inline for a single core
+    """
+    if cores <= 1:
+        for task in tasks:
+            yield compress_batch(*task)
+        return
+
+    pending = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=cores, \
+            mp_context=multiprocessing.get_context('spawn')) as executor:
+        for task in tasks:
+            pending.append(executor.submit(compress_batch, *task))
+            if len(pending) >= 2 * cores:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def compress_batch(codec, level, seekable, rundir, batch):
+    """
+    Compresses a batch of files of a run, returning (arcname, zipinfo, payload, size) for
+    each zip entry or zstd frame. Runs in a worker process, so only the output is sent back.
+    """
+    entries = []
+    tarblock = io.BytesIO()
+    for arcname in batch:
+        filepath = os.path.join(rundir, arcname)
+        with open(filepath, 'rb') as fileobject:
+            data = fileobject.read()
+        mtime = os.path.getmtime(filepath)
+        if codec == 'deflate':
+            zipinfo = zipfile.ZipInfo(arcname, time.localtime(mtime)[:6])
+            zipinfo.compress_type = zipfile.ZIP_DEFLATED
+            zipinfo.external_attr = 0o644 << 16
+            zipinfo.file_size = len(data)
+            zipinfo.CRC = zlib.crc32(data)
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+            payload = compressor.compress(data) + compressor.flush()
+            zipinfo.compress_size = len(payload)
+            entries.append((arcname, zipinfo, payload, len(data)))
+            continue
+
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.size = len(data)
+        tarinfo.mtime = int(mtime)
+        tarinfo.mode = 0o644
+        tarblock.write(tarinfo.tobuf(tarfile.GNU_FORMAT))
+        tarblock.write(data)
+        tarblock.write(b'\0' * (-len(data) % tarfile.BLOCKSIZE))
+        if seekable:
+            entries.append((arcname, None, \
+                load_zstandard().ZstdCompressor(level=level).compress(tarblock.getvalue()), \
+                tarblock.tell()))
+            tarblock = io.BytesIO()
+
+    if codec == 'zstd' and tarblock.tell():
+        entries.append((batch[0], None, \
+            load_zstandard().ZstdCompressor(level=level).compress(tarblock.getvalue()), \
+            tarblock.tell()))
+    return entries
+
+def seek_table(frames):
+    """
+    Returns the skippable frame of the zstd seekable format, listing the compressed and
+    decompressed size of each frame, so a reader can seek to any frame of the archive
+    """
+    table = b''.join(struct.pack('<II', compressed, size) for (compressed, size) in frames)
+    table += struct.pack('<IBI', len(frames), 0, SEEKTABLEMAGIC)
+    return struct.pack('<II', SEEKFRAMEMAGIC, len(table)) + table
+
+def load_zstandard():
+    """
+    Returns the zstandard module, imported on first use, or None if it is not installed
+    """
+    global zstandard
+    if zstandard is None:
+        try:
+            zstandard = importlib.import_module('zstandard')
+        except ImportError:
+            return None
+    return zstandard
+
+def load_aiohttp():
+    """
+    Returns the aiohttp module, imported on first use, or None if it is not installed
+    """
+    global aiohttp
+    if aiohttp is None:
+        try:
+            aiohttp = importlib.import_module('aiohttp')
+        except ImportError:
+            return None
+    return aiohttp
+
+def resolve_endpoint_name(endpoint):
+    """
+    Returns the API endpoint for a URL or a deployment name such as us2 or de, or None
+    """
+
+    if not endpoint:
+        return None
+    if '://' not in endpoint:
+        endpoint = DEFAULT_ENDPOINT if endpoint == 'us1' else \
+            'https://api.' + endpoint + '.sumologic.com/api'
+    if endpoint[-1:] == "/":
+        raise Exception("Endpoint should not end with a slash character")
+    return endpoint
+
+def read_endpoint_cache(cachefile, access_id):
+    """
+    Returns the endpoint cached for an access id if it is younger than ENDPOINT_TTL, or None
+    """
 
-    with zipfile.ZipFile(targetzipfile, 'w') as zipobject:
-        for foldername, _subfolders, filenames in os.walk(backupdir):
-            for filename in filenames:
-                filepath = os.path.join(foldername, filename)
-                zipobject.write(filepath, os.path.basename(filepath))
+    if not cachefile or not os.path.exists(cachefile):
+        return None
+    try:
+        with open(cachefile, 'r', encoding='utf8') as cacheobject:
+            cached = json.load(cacheobject)
+    except ValueError:
+        return None
+    entry = cached.get(access_id)
+    if entry and time.time() - entry['resolved'] < ENDPOINT_TTL:
+        return entry['endpoint']
+    return None
+
+def write_endpoint_cache(cachefile, access_id, endpoint):
+    """
+    Caches the endpoint discovered for an access id, replacing the cache file atomically
+    """
+
+    if not cachefile:
+        return
+    cached = {}
+    if os.path.exists(cachefile):
+        try:
+            with open(cachefile, 'r', encoding='utf8') as cacheobject:
+                cached = json.load(cacheobject)
+        except ValueError:
+            cached = {}
+    cached[access_id] = {'endpoint': endpoint, 'resolved': time.time()}
+    os.makedirs(os.path.dirname(cachefile), exist_ok = True)
+    spoolfile = f'{cachefile}.{os.getpid()}.tmp'
+    with open(spoolfile, 'w', encoding='utf8') as cacheobject:
+        json.dump(cached, cacheobject)
+    os.replace(spoolfile, cachefile)
+
+def open_cookie_jar(cookie_file):
+    """
+    Returns a cookie jar saved to cookie_file, loaded from it if it exists, or None to keep
+    cookies in memory for the session only
+    """
 
-def main():
+    if not cookie_file:
+        return None
+    cookiejar = http.cookiejar.LWPCookieJar(cookie_file)
+    if os.path.exists(cookie_file):
+        try:
+            cookiejar.load(ignore_discard=True)
+        except (OSError, http.cookiejar.LoadError):
+            pass
+    return cookiejar
+
+def main(argv=None):
     """
     Setup the Sumo API connection, using the required tuple of region, id, and key.
     Once done, then run through the commands required
     """
 
+    global ARGS, FOLDERCACHE, METRICS, CONTENTFILTER, ENGINE, DISCOVERYCACHE
+    ARGS = PARSER.parse_args(argv)
+
+    if ARGS.GCKEEP is not None:
+        collect_garbage(ARGS.GCKEEP)
+        return
+
+    if ARGS.STORE == 'tar.zst' and load_zstandard() is None:
+        print('Module Not Installed :: zstandard is required for tar.zst archives')
+        sys.exit(1)
+
+    if ARGS.ZIPFILE is not False and ARGS.ARCHIVECODEC == 'zstd' and load_zstandard() is None:
+        print('Module Not Installed :: zstandard is required for zstd archives')
+        sys.exit(1)
+
+    if ARGS.ZIPFILE is not False and ARGS.STORE == 'blob':
+        print('Option Not Supported :: -z archives the run folder, which holds no blobs')
+        sys.exit(1)
+
+    if ARGS.ASYNCIO and load_aiohttp() is None:
+        print('Module Not Installed :: aiohttp is required for --async')
+        sys.exit(1)
+
+    FOLDERCACHE = FolderCache(ARGS.FOLDERCACHE)
+    METRICS = RunMetrics()
+    if ARGS.PROFILER:
+        METRICS.profiler = RunProfiler(ARGS.PROFILER)
+        METRICS.profiler.start()
+    CONTENTFILTER = ContentFilter(ARGS.INCLUDES, ARGS.EXCLUDES) \
+        if ARGS.INCLUDES or ARGS.EXCLUDES else None
+
     if ARGS.verbose > 3:
         print("Step-001: - Authenticating")
 
-    source = SumoApiClient(sumo_uid, sumo_key)
+    with METRICS.stage('authenticate'):
+        ( sumo_uid, sumo_key ) = initialize_variables()
+
+        if ARGS.RATELIMIT is None:
+            ARGS.RATELIMIT = float(os.environ.get('SUMO_RPS', 4))
+
+        if ARGS.ASYNCIO:
+            ENGINE = AsyncEngine()
+            source = ENGINE.blocking(AsyncSumoApiClient(sumo_uid, sumo_key, \
+                os.environ.get('SUMO_END') or os.environ.get('SUMO_LOC'), \
+                pool_size=ARGS.WORKERS, \
+                limiter=TokenBucket(ARGS.RATELIMIT), retries=ARGS.RETRIES, \
+                endpoint_cache=os.path.expanduser(ENDPOINTCACHE)))
+        else:
+            source = SumoApiClient(sumo_uid, sumo_key, \
+                os.environ.get('SUMO_END') or os.environ.get('SUMO_LOC'), \
+                pool_size=ARGS.WORKERS, \
+                limiter=TokenBucket(ARGS.RATELIMIT), retries=ARGS.RETRIES, \
+                endpoint_cache=os.path.expanduser(ENDPOINTCACHE))
 
     if ARGS.verbose > 3:
         print("Step-002: - Creating Supporting directories")
 
-    (backups, reports ) = create_backup_directory()
+    with METRICS.stage('directories'):
+        (backups, reports ) = create_backup_directory()
+        if ARGS.DISCOVERYAGE > 0:
+            DISCOVERYCACHE = DiscoveryCache(os.path.join(ARGS.OUTPUTDIR, DISCOVERYNAME), \
+                os.environ.get('SUMO_ORG') or sumo_uid, ARGS.DISCOVERYAGE * 3600)
 
-    if ARGS.verbose > 3:
-        print("Step-003: - Discovering content targets")
+    streaming = False
+    if ARGS.RESUME and load_content_map(reports):
 
-    _content_manifest = create_content_map(source)
+        if ARGS.verbose > 3:
+            print("Step-003: - Loading content targets from checkpoint")
 
-    if ARGS.verbose > 3:
-        print("Step-004: - Persisting content manifest")
+    elif ARGS.STREAM:
 
-    create_manifest(reports)
+        streaming = True
+        if ARGS.verbose > 3:
+            print("Step-003: - Streaming content targets into the backup")
 
-    if ARGS.verbose > 3:
-        print("Step-005: - Create intermediate backup folders")
+    else:
+
+        if ARGS.verbose > 3:
+            print("Step-003: - Discovering content targets")
+
+        with METRICS.stage('discovery'):
+            _content_manifest = create_content_map(source)
+            save_content_map(reports)
+
+    if not streaming:
+
+        if ARGS.verbose > 3:
+            print("Step-004: - Persisting content manifest")
 
-    create_backup_folders(backups)
+        with METRICS.stage('manifest'):
+            create_manifest(reports)
+
+        if ARGS.verbose > 3:
+            print("Step-005: - Create intermediate backup folders")
+
+        with METRICS.stage('folders'):
+            if ARGS.STORE == 'tree':
+                create_backup_folders(backups)
 
     if ARGS.verbose > 3:
         print("Step-006: - Backing up content per manifest file")
 
-    backup_content(source, backups)
+    with METRICS.stage('stream' if streaming else 'export'):
+        journal = RunJournal(os.path.join(reports, JOURNALNAME))
+        store = open_store(backups, reports)
+        if isinstance(store, ArchiveStore):
+            journal.hold()
+        if streaming:
+            with contextlib.closing(ManifestWriter(reports)) as manifest:
+                backup_content(source, backups, store, journal, stream_details(source, \
+                    manifest, backups if ARGS.STORE == 'tree' else None))
+        else:
+            content_items = CONTENTMAP.values()
+            if ARGS.SCHEDULE == 'longest':
+                content_items = schedule_content(content_items, reports)
+            backup_content(source, backups, store, journal, content_items)
+
+    source.close()
+    if DISCOVERYCACHE is not None:
+        DISCOVERYCACHE.close()
+        DISCOVERYCACHE = None
+    if ENGINE is not None:
+        ENGINE.close()
+        ENGINE = None
+
+    METRICS.add('items_discovered', len(CONTENTMAP))
+    METRICS.write_report(os.path.join(reports, REPORTNAME))
 
     if ARGS.ZIPFILE is not False:
-        create_zipfile(ARGS.OUTPUTDIR)
+        with METRICS.stage('zipfile'):
+            archivefile = create_archive(os.path.dirname(backups), ARGS.ARCHIVECODEC, \
+                ARGS.ARCHIVELEVEL, ARGS.CORES, ARGS.SEEKABLE)
+            if ARGS.verbose > 4:
+                print(f'Created: archive {archivefile}')
+        METRICS.write_report(os.path.join(reports, REPORTNAME))
+
+    if ARGS.PROMFILE:
+        METRICS.write_prometheus(ARGS.PROMFILE)
+
+    if METRICS.profiler is not None:
+        METRICS.profiler.stop()
+        METRICS.profiler.write(reports)
+
+    if METRICS.counters['items_failed']:
+        sys.exit(1)
 
 ### class ###
 
-class SumoApiClient():
+class JobFailure(Exception):
     """
-    This is defined SumoLogic API Client
-    The class includes the HTTP methods, cmdlets, and init methods
+    Raised when a Sumo Logic job fails, or does not finish before its deadline
+    """
+
+class RunMetrics():
+    """
+    Thread safe run instrumentation: stage times, API call latency histograms, bytes,
+    errors, and counters
     """
 
-    def __init__(self, access_id, access_key, endpoint=None, cookie_file='cookies.txt'):
+    def __init__(self):
         """
-        Initializes the Sumo Logic object
+        Initializes empty metrics
         """
-        self.session = requests.Session()
-        self.session.auth = (access_id, access_key)
-        self.session.headers = {'content-type': 'application/json', \
-            'accept': 'application/json'}
-        cookiejar = http.cookiejar.FileCookieJar(cookie_file)
-        self.session.cookies = cookiejar
-        if endpoint is None:
-            self.endpoint = self._get_endpoint()
-        elif len(endpoint) < 3:
-            self.endpoint = 'https://api.' + endpoint + '.sumologic.com/api'
-        else:
-            self.endpoint = endpoint
-        if self.endpoint[-1:] == "/":
-            raise Exception("Endpoint should not end with a slash character")
-
-    def _get_endpoint(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stages = collections.OrderedDict()
+        self.calls = {}
+        self.counters = collections.Counter()
+        self.current = None
+        self.profiler = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
         """
-        SumoLogic REST API endpoint changes based on the geo location of the client.
-        It contacts the default REST endpoint and resolves the 401 to get the right endpoint.
+        Times a pipeline stage, and profiles it if a profiler is attached
         """
-        self.endpoint = 'https://api.sumologic.com/api'
-        self.response = self.session.get('https://api.sumologic.com/api/v1/collectors')
-        endpoint = self.response.url.replace('/v1/collectors', '')
-        return endpoint
+        self.current = name
+        starttime = time.perf_counter()
+        try:
+            if self.profiler is None:
+                yield
+            else:
+                with self.profiler.stage(name):
+                    yield
+        finally:
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - starttime
 
-    def delete(self, method, params=None, headers=None, data=None):
+    def call(self, route, seconds, sent, received, error=None):
         """
-        Defines a Sumo Logic Delete operation
+        Records one API call
         """
-        response = self.session.delete(self.endpoint + method, \
-            params=params, headers=headers, data=data)
-        if response.status_code != 200:
-            response.reason = response.text
-        response.raise_for_status()
-        return response
-
-    def get(self, method, params=None, headers=None):
+        with self.lock:
+            if route not in self.calls:
+                self.calls[route] = {'count': 0, 'seconds': 0.0, 'bytes_sent': 0, \
+                    'bytes_received': 0, 'errors': collections.Counter(), \
+                    'buckets': [0] * (len(LATENCYBUCKETS) + 1), 'max': 0.0}
+            record = self.calls[route]
+            record['count'] += 1
+            record['seconds'] += seconds
+            record['bytes_sent'] += sent
+            record['bytes_received'] += received
+            record['buckets'][bisect.bisect_left(LATENCYBUCKETS, seconds)] += 1
+            record['max'] = max(record['max'], seconds)
+            if error is not None:
+                record['errors'][str(error)] += 1
+
+    def add(self, counter, value=1):
         """
-        Defines a Sumo Logic Get operation
+        Adds to a counter
         """
-        response = self.session.get(self.endpoint + method, \
-            params=params, headers=headers)
-        if response.status_code != 200:
-            response.reason = response.text
-        response.raise_for_status()
-        return response
+        if value:
+            with self.lock:
+                self.counters[counter] += value
 
-    def post(self, method, data, headers=None, params=None):
+    @staticmethod
+    def _percentile(buckets, fraction, largest):
         """
-        Defines a Sumo Logic Post operation
+        Returns a percentile of a latency histogram, interpolated within its bucket
+        and capped at the largest latency seen
         """
-        response = self.session.post(self.endpoint + method, \
-            data=json.dumps(data), headers=headers, params=params)
-        if response.status_code != 200:
-            response.reason = response.text
-        response.raise_for_status()
-        return response
-
-    def put(self, method, data, headers=None, params=None):
+        rank = fraction * sum(buckets)
+        seen = 0
+        for (index, count) in enumerate(buckets):
+            if count and seen + count >= rank:
+                lower = LATENCYBUCKETS[index - 1] if index > 0 else 0.0
+                upper = LATENCYBUCKETS[index] if index < len(LATENCYBUCKETS) else largest
+                return min(lower + (upper - lower) * (rank - seen) / count, largest)
+            seen += count
+        return 0.0
+
+    def report(self):
         """
-        Defines a Sumo Logic Put operation
+        Returns the metrics as a dictionary
         """
-        response = self.session.put(self.endpoint + method, \
-            data=json.dumps(data), headers=headers, params=params)
-        if response.status_code != 200:
-            response.reason = response.text
-        response.raise_for_status()
-        return response
-
-### class ###
-
-### methods ###
-
-    def get_myfolders(self):
+        with self.lock:
+            calls = {}
+            every = [0] * (len(LATENCYBUCKETS) + 1)
+            largest = 0.0
+            for (route, record) in self.calls.items():
+                every = [ total + count for (total, count) in zip(every, record['buckets']) ]
+                largest = max(largest, record['max'])
+                calls[route] = {'count': record['count'], 'seconds': record['seconds'], \
+                    'bytes_sent': record['bytes_sent'], \
+                    'bytes_received': record['bytes_received'], \
+                    'errors': dict(record['errors']), \
+                    'p50': self._percentile(record['buckets'], .50, record['max']), \
+                    'p99': self._percentile(record['buckets'], .99, record['max']), \
+                    'max': record['max'], 'buckets': list(record['buckets'])}
+            return {'started': self.started, 'elapsed': time.time() - self.started, \
+                'stages': dict(self.stages), 'counters': dict(self.counters), \
+                'requests': sum(every), 'p50': self._percentile(every, .50, largest), \
+                'p99': self._percentile(every, .99, largest), 'calls': calls}
+
+    def write_report(self, reportfile):
         """
-        Using an HTTP client, this uses a GET to retrieve all information.
+        Writes the JSON run report
+        """
+        with open(reportfile, 'w', encoding='utf8') as reportobject:
+            json.dump(self.report(), reportobject, indent=4)
+
+    def write_prometheus(self, promfile):
+        """
+        Writes the metrics in Prometheus text format, replacing the file atomically
+        so a node exporter textfile collector never reads a partial file
+        """
+        report = self.report()
+        prefix = REPORTTAG.replace('-', '_')
+        lines = [f'{prefix}_last_run_timestamp_seconds {report["started"]:.0f}', \
+                 f'{prefix}_run_seconds {report["elapsed"]:.3f}']
+        for (stage, seconds) in report['stages'].items():
+            lines.append(f'{prefix}_stage_seconds{{stage="{stage}"}} {seconds:.3f}')
+        for (counter, value) in sorted(report['counters'].items()):
+            lines.append(f'{prefix}_{counter}_total {value}')
+        for (route, record) in report['calls'].items():
+            label = f'route="{route}"'
+            lines.append(f'{prefix}_api_calls_total{{{label}}} {record["count"]}')
+            lines.append(f'{prefix}_api_call_seconds_total{{{label}}} {record["seconds"]:.3f}')
+            lines.append(f'{prefix}_api_bytes_sent_total{{{label}}} {record["bytes_sent"]}')
+            lines.append(f'{prefix}_api_bytes_received_total{{{label}}} ' + \
+                         f'{record["bytes_received"]}')
+            for (error, count) in record['errors'].items():
+                lines.append(f'{prefix}_api_errors_total{{{label},error="{error}"}} {count}')
+            cumulative = 0
+            for (bound, count) in zip(LATENCYBUCKETS, record['buckets']):
+                cumulative += count
+                lines.append(f'{prefix}_api_call_duration_seconds_bucket{{{label},' + \
+                             f'le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{prefix}_api_call_duration_seconds_bucket{{{label},le="+Inf"}} ' + \
+                         f'{record["count"]}')
+            lines.append(f'{prefix}_api_call_duration_seconds_sum{{{label}}} ' + \
+                         f'{record["seconds"]:.3f}')
+            lines.append(f'{prefix}_api_call_duration_seconds_count{{{label}}} ' + \
+                         f'{record["count"]}')
+        with open(f'{promfile}.tmp', 'w', encoding='utf8') as promobject:
+            promobject.write('\n'.join(lines) + '\n')
+        os.replace(f'{promfile}.tmp', promfile)
+
+METRICS = RunMetrics()
+
+class RunProfiler():
+    """
+    Profiles a run stage by stage for --profiler, as folded stack samples of every thread
+    or as cProfile pstats files
+    """
+
+    def __init__(self, mode, interval=PROFILE_INTERVAL):
+        """
+        Initializes the profiler, attributing anything outside a stage to main
+        """
+        self.mode = mode
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.current = 'main'
+        self.profiles = collections.defaultdict(list)
+        self.samples = collections.defaultdict(collections.Counter)
+        self.labels = {}
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        """
+        Starts the sampling thread in sample mode
+        """
+        if self.mode == 'sample':
+            self.sampler = threading.Thread(target=self.sample, name='profiler', daemon=True)
+            self.sampler.start()
+
+    def stop(self):
+        """
+        Stops the sampling thread
+        """
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Attributes everything during a stage to it
+        """
+        previous = self.current
+        self.current = name
+        if self.mode != 'cprofile':
+            try:
+                yield
+            finally:
+                self.current = previous
+            return
+
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles[name].append(profile)
+        if not CPROFILE_ALLTHREADS:
+            threading.setprofile(self.thread_started)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            if not CPROFILE_ALLTHREADS:
+                threading.setprofile(None)
+            self.current = previous
+
+    def thread_started(self, _frame, _event, _arg):
+        """
+        Profiles a thread started during a stage, from its first event on, as part of it.
+        A thread that cannot have its own profiler is left to the one already active.
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            sys.setprofile(None)
+            return
+        with self.lock:
+            self.profiles[self.current].append(profile)
+
+    def label(self, code):
+        """
+        Returns the flame graph frame name of a code object
+        """
+        label = self.labels.get(code)
+        if label is None:
+            label = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+            self.labels[code] = label
+        return label
+
+    def sample(self):
+        """
+        Counts the folded stack of every other thread, rooted at its thread name, until stopped
+        """
+        names = {}
+        myself = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            counter = self.samples[self.current]
+            for (ident, frame) in sys._current_frames().items(): # pylint: disable=protected-access
+                if ident == myself:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self.label(frame.f_code))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {thread.ident: re.sub(r'[-_][0-9]+$', '', thread.name) \
+                             for thread in threading.enumerate()}
+                stack.append(names.get(ident, 'thread'))
+                counter[';'.join(reversed(stack))] += 1
+
+    def write(self, reportdir):
+        """
+        Writes the per stage profiles and the hot function summary to the report folder
+        """
+        summary = io.StringIO()
+        if self.mode == 'sample':
+            for (stage, counter) in self.samples.items():
+                with open(os.path.join(reportdir, f'{PROFILENAME}.{stage}.folded'), 'w', \
+                          encoding='utf8') as profileobject:
+                    for (stack, count) in counter.most_common():
+                        profileobject.write(f'{stack} {count}\n')
+                self.summarize_samples(stage, counter, summary)
+        else:
+            for (stage, profiles) in self.profiles.items():
+                stats = pstats.Stats(profiles[0], stream=summary)
+                for profile in profiles[1:]:
+                    stats.add(profile)
+                stats.dump_stats(os.path.join(reportdir, f'{PROFILENAME}.{stage}.pstats'))
+                summary.write(f'=== {stage}: {len(profiles)} threads profiled\n')
+                stats.sort_stats('tottime').print_stats(PROFILE_TOP)
+        with open(os.path.join(reportdir, f'{PROFILENAME}.txt'), 'w', \
+                  encoding='utf8') as summaryobject:
+            summaryobject.write(summary.getvalue())
+
+    @staticmethod
+    def summarize_samples(stage, counter, summary):
+        """
+        Writes the functions with the most samples in a stage, by self and total samples
+        """
+        total = sum(counter.values())
+        selfcounts = collections.Counter()
+        totalcounts = collections.Counter()
+        for (stack, count) in counter.items():
+            frames = stack.split(';')[1:]
+            if frames:
+                selfcounts[frames[-1]] += count
+            for frame in set(frames):
+                totalcounts[frame] += count
+        summary.write(f'=== {stage}: {total} samples\n')
+        summary.write(f'{"self%":>7} {"total%":>7}  function\n')
+        for (frame, count) in selfcounts.most_common(PROFILE_TOP):
+            summary.write(f'{100.0 * count / total:>7.1f} ' + \
+                          f'{100.0 * totalcounts[frame] / total:>7.1f}  {frame}\n')
+        summary.write('\n')
+
+class JobPoller():
+    """
+    Polling scheduler for Sumo Logic jobs. Small jobs are polled quickly at first,
+    and the interval then backs off exponentially until the job deadline.
+    """
+
+    def __init__(self, deadline, start=POLL_START, factor=POLL_FACTOR, limit=POLL_LIMIT):
+        """
+        Initializes the poller with a deadline in seconds
+        """
+        self.deadline = deadline
+        self.start = start
+        self.factor = factor
+        self.limit = limit
+
+    def intervals(self):
+        """
+        Yields the sleep interval before each poll, stopping when the deadline passes
+        """
+        expires = time.monotonic() + self.deadline
+        interval = self.start
+        while True:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                return
+            yield min(interval, remaining)
+            interval = min(interval * self.factor, self.limit)
+
+    def check(self, jobstatus, jobname):
+        """
+        Returns True once a job status is Success, and raises JobFailure if it Failed
+        """
+        status = jobstatus['status']
+        if status == 'Success':
+            return True
+        if status == 'Failed':
+            raise JobFailure(f'{jobname} failed: {jobstatus.get("error")}')
+        return False
+
+    def wait(self, get_status, jobname, delay=0.0):
+        """
+        Polls get_status until the job succeeds, fails, or runs past the deadline. A delay
+        skips polling for as long as the job is expected to take.
+        """
+        starttime = time.perf_counter()
+        try:
+            if delay > 0:
+                time.sleep(delay)
+                METRICS.add('poll_sleep_seconds', delay)
+            jobstatus = get_status()
+            if self.check(jobstatus, jobname):
+                return jobstatus
+            for interval in self.intervals():
+                time.sleep(interval)
+                METRICS.add('poll_sleep_seconds', interval)
+                METRICS.add('polls')
+                jobstatus = get_status()
+                if self.check(jobstatus, jobname):
+                    return jobstatus
+            raise JobFailure(f'{jobname} did not finish within {self.deadline} seconds')
+        finally:
+            METRICS.add('poll_seconds', time.perf_counter() - starttime)
+
+    async def wait_async(self, get_status, jobname, delay=0.0):
+        """
+        Polls the coroutine get_status as wait does, sleeping without holding a thread
+        """
+        starttime = time.perf_counter()
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+                METRICS.add('poll_sleep_seconds', delay)
+            jobstatus = await get_status()
+            if self.check(jobstatus, jobname):
+                return jobstatus
+            for interval in self.intervals():
+                await asyncio.sleep(interval)
+                METRICS.add('poll_sleep_seconds', interval)
+                METRICS.add('polls')
+                jobstatus = await get_status()
+                if self.check(jobstatus, jobname):
+                    return jobstatus
+            raise JobFailure(f'{jobname} did not finish within {self.deadline} seconds')
+        finally:
+            METRICS.add('poll_seconds', time.perf_counter() - starttime)
+
+class ContentItem():
+    """
+    Compact record for one content item in CONTENTMAP, with interned ids and paths
+    derived from the parent chain
+    """
+
+    __slots__ = ('myself', 'parent', 'name', 'type', 'modified', 'anchor')
+
+    def __init__(self, myself, parent, name, itemtype, modified='', anchor=None):
+        """
+        Initializes the record
+        """
+        self.myself = sys.intern(myself)
+        self.parent = sys.intern(parent)
+        self.name = name
+        self.type = sys.intern(itemtype)
+        self.modified = modified
+        self.anchor = anchor
+
+    def _derive(self, attribute, prefix):
+        """
+        Joins an attribute of each ancestor up to the anchor, without recursion
+        """
+        parts = []
+        item = self
+        while item.anchor is None:
+            parts.append(getattr(item, attribute))
+            item = CONTENTMAP[item.parent]
+        parts.append(item.anchor[prefix])
+        return '/'.join(reversed(parts))
+
+    @property
+    def path(self):
+        """
+        The name path of the item
+        """
+        if self.anchor is not None:
+            return self.anchor[0]
+        return self._derive('name', 3)
+
+    @property
+    def backuppath(self):
+        """
+        The id path of the item, used for its backup file
+        """
+        if self.anchor is not None:
+            return self.anchor[1]
+        return self._derive('myself', 1)
+
+    @property
+    def backupname(self):
+        """
+        The backup name of the item
+        """
+        if self.anchor is not None:
+            return self.anchor[2]
+        return self.myself
+
+    @property
+    def childpath(self):
+        """
+        The name path that the paths of children start with. It is the path, except
+        for the Personal root, whose own path has an extra leading slash.
+        """
+        if self.anchor is not None:
+            return self.anchor[3]
+        return self.path
+
+    def anchor_child(self, child):
+        """
+        Builds the record for a child from a folder listing, anchored with its own paths,
+        so it can be used without CONTENTMAP holding the parent chain
+        """
+        my_path = '/'.join((self.childpath, child['name']))
+        my_oid_path = '/'.join((self.backuppath, child['id']))
+        return ContentItem(child['id'], child['parentId'], child['name'], child['itemType'], \
+            child.get('modifiedAt', ''), (my_path, my_oid_path, child['id'], my_path))
+
+    def to_record(self):
+        """
+        Returns the item as a list for checkpoints
+        """
+        return [self.myself, self.parent, self.name, self.type, self.modified, self.anchor]
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Builds an item from a checkpoint list
+        """
+        (myself, parent, name, itemtype, modified, anchor) = record
+        return cls(myself, parent, name, itemtype, modified, \
+            tuple(anchor) if anchor is not None else None)
+
+class ContentFilter():
+    """
+    Include and exclude filters of id:<id>, re:<regex>, or name path globs, applied during
+    discovery so excluded folders are never listed
+    """
+
+    def __init__(self, includes=None, excludes=None):
+        """
+        Parses the filters
+        """
+        self.includes = [ self.parse(text) for text in includes or () ]
+        self.excludes = [ self.parse(text) for text in excludes or () ]
+        self.selective = bool(self.includes)
+        self.roots = set()
+        self.covered = set()
+        self.provisional = set()
+
+    @staticmethod
+    def parse(text):
+        """
+        Returns a filter as its kind and what it matches
+        """
+        if text.startswith('id:'):
+            return 'id', text[3:]
+        if text.startswith('re:'):
+            return 're', re.compile(text[3:])
+        pattern = text if text.startswith('/') else '/**/' + text
+        return 'glob', tuple(pattern.rstrip('/').split('/'))
+
+    @classmethod
+    def glob(cls, patterns, names, below=False):
+        """
+        Returns whether the names of a path match the glob, one name to a glob part.
+        With below, returns whether a path below it could match instead.
+        """
+        if not names:
+            return below or all(pattern == '**' for pattern in patterns)
+        if not patterns:
+            return False
+        if patterns[0] == '**':
+            return cls.glob(patterns[1:], names, below) or cls.glob(patterns, names[1:], below)
+        return fnmatch.fnmatchcase(names[0], patterns[0]) and \
+            cls.glob(patterns[1:], names[1:], below)
+
+    def matches(self, rule, itemid, path):
+        """
+        Returns whether a filter matches an item
+        """
+        (kind, value) = rule
+        if kind == 'id':
+            return itemid == value
+        if kind == 're':
+            return value.search(path) is not None
+        return self.glob(value, path.split('/'))
+
+    def reaches(self, rule, path):
+        """
+        Returns whether an include could match something below a folder. An id could
+        be anywhere, and so could a regex.
+        """
+        (kind, value) = rule
+        if kind == 'glob':
+            return self.glob(value, path.split('/'), below=True)
+        return True
+
+    @staticmethod
+    def true_anchor(source, content_list, personal):
+        """
+        Returns the anchor a folder has in a full walk, from the chain of its parents
+        """
+        if content_list['id'] == personal['id']:
+            personal_name = "/" + personal['name']
+            return ("/" + personal_name, personal['id'], personal_name, personal_name)
+        chain = [content_list]
+        while True:
+            parentid = chain[-1]['parentId']
+            if parentid == personal['id']:
+                (path, backuppath) = ("/" + personal['name'], personal['id'])
+                break
+            try:
+                chain.append(source.get_myfolder(parentid))
+            except requests.exceptions.HTTPError:
+                top = chain.pop()
+                path = '/'.join(("", top['name']))
+                backuppath = '/'.join((top['id'], top['id']))
+                break
+        for folder in reversed(chain):
+            path = '/'.join((path, folder['name']))
+            backuppath = '/'.join((backuppath, folder['id']))
+        return (path, backuppath, content_list['id'], path)
+
+    def resolve(self, source):
+        """
+        Lists each folder included by id, returning them as top level items anchored at
+        their real paths, with their listings
+        """
+        roots = []
+        personal = None
+        for rule in list(self.includes):
+            if rule[0] != 'id':
+                continue
+            try:
+                content_list = source.get_myfolder(rule[1])
+            except requests.exceptions.HTTPError:
+                continue
+            if content_list.get('itemType', 'Folder') != 'Folder':
+                continue
+            self.includes.remove(rule)
+            self.roots.add(content_list['id'])
+            self.covered.add(content_list['id'])
+            if personal is None:
+                personal = source.get_myfolders()
+            roots.append((ContentItem(content_list['id'], content_list['parentId'], \
+                content_list['name'], 'Folder', content_list.get('modifiedAt', ''), \
+                self.true_anchor(source, content_list, personal)), content_list))
+        return roots
+
+    def admit(self, itemid, itemtype, path, covered):
+        """
+        Returns True to keep an item, False to keep a folder only to walk it, and None to
+        leave an item out, given its name path and whether its folder is kept whole
+        """
+        if itemid in self.roots:
+            return None
+        if any(self.matches(rule, itemid, path) for rule in self.excludes):
+            return None
+        if covered or not self.selective or \
+           any(self.matches(rule, itemid, path) for rule in self.includes):
+            if itemtype == 'Folder':
+                self.covered.add(itemid)
+            return True
+        if itemtype == 'Folder' and any(self.reaches(rule, path) for rule in self.includes):
+            self.provisional.add(itemid)
+            return False
+        return None
+
+    def is_covered(self, folderid):
+        """
+        Returns whether a folder is kept with everything below it
+        """
+        return folderid in self.covered
+
+    def unneeded(self, contentmap):
+        """
+        Returns the folders walked on the way to an include with nothing kept below them
+        """
+        needed = set()
+        for item in contentmap.values():
+            if item.myself in self.provisional:
+                continue
+            parent = item.parent
+            while parent in self.provisional and parent not in needed:
+                needed.add(parent)
+                parent = contentmap[parent].parent
+        return self.provisional - needed
+
+class FolderCache():
+    """
+    Bounded cache of the folder listings fetched during discovery, so the export phase
+    can write them without another API call. Listings past the limit spill to disk.
+    """
+
+    def __init__(self, limit):
+        """
+        Initializes the cache to hold up to limit listings in memory
+        """
+        self.limit = limit
+        self.memory = collections.OrderedDict()
+        self.spilled = set()
+        self.spooldir = None
+        self.lock = threading.Lock()
+
+    def _spoolfile(self, folderid):
+        """
+        Returns the spill file for a folder listing
+        """
+        return os.path.join(self.spooldir, f'{folderid}.json')
+
+    def put(self, folderid, listing):
+        """
+        Adds a listing, spilling the oldest listing to disk if the cache is full
+        """
+        with self.lock:
+            self.memory[folderid] = listing
+            if len(self.memory) <= self.limit:
+                return
+            if self.spooldir is None:
+                self.spooldir = tempfile.mkdtemp(prefix=f'{REPORTTAG}.')
+            spillid, spilled_listing = self.memory.popitem(last=False)
+            with open(self._spoolfile(spillid), 'w', encoding='utf8') as spoolobject:
+                json.dump(spilled_listing, spoolobject)
+            self.spilled.add(spillid)
+
+    def pop(self, folderid):
+        """
+        Removes and returns a listing, or None if it was never cached
+        """
+        with self.lock:
+            if folderid in self.memory:
+                return self.memory.pop(folderid)
+            if folderid not in self.spilled:
+                return None
+            self.spilled.remove(folderid)
+        spoolfile = self._spoolfile(folderid)
+        with open(spoolfile, 'r', encoding='utf8') as spoolobject:
+            listing = json.load(spoolobject)
+        os.remove(spoolfile)
+        return listing
+
+    def close(self):
+        """
+        Drops every cached listing and removes the spill directory
+        """
+        with self.lock:
+            self.memory.clear()
+            self.spilled.clear()
+            if self.spooldir is not None:
+                shutil.rmtree(self.spooldir, ignore_errors=True)
+                self.spooldir = None
+
+class TreeStore():
+    """
+    Stores each export as its own JSON file in the content tree of the run
+    """
+
+    def __init__(self, backupdir):
+        """
+        Initializes the store for the run content directory
+        """
+        self.backupdir = backupdir
+
+    def write(self, item, exportresult):
+        """
+        Writes an export, returning where it went, its digest, which a tree does not keep,
+        and its size
+        """
+        backuptarget = os.path.join(self.backupdir, item.backuppath) + '.json'
+        payload = json.dumps(exportresult) + '\n'
+        with open (backuptarget, "w", encoding='utf8') as backupobject:
+            backupobject.write(payload)
+        METRICS.add('bytes_written', len(payload))
+        return backuptarget, None, len(payload)
+
+    def carry(self, item, prior):
+        """
+        Carries an unchanged export forward from an earlier run, as a hardlink if possible
+        """
+        priorfile = os.path.join(ARGS.OUTPUTDIR, prior['run'], 'content', \
+            prior['backuppath']) + '.json'
+        if not os.path.exists(priorfile):
+            return False
+        backuptarget = os.path.join(self.backupdir, item.backuppath) + '.json'
+        try:
+            os.link(priorfile, backuptarget)
+        except OSError:
+            shutil.copy2(priorfile, backuptarget)
+        return True
+
+    def close(self):
+        """
+        Nothing to finish for a tree
+        """
+
+class BlobStore():
+    """
+    Content addressed store. Each export is canonicalized and stored once in the objects
+    directory by SHA-256 digest, and the run snapshot manifest maps every item to its blob.
+    """
+
+    def __init__(self, outputdir, reportdir):
+        """
+        Initializes the store, opening the snapshot manifest of the run
+        """
+        self.objectdir = os.path.join(outputdir, 'objects')
+        snapshotfile = os.path.join(reportdir, SNAPSHOTNAME)
+        self.snapshot = open(snapshotfile, 'a', encoding='utf8')
+
+    def _objectfile(self, digest):
+        """
+        Returns the blob file for a digest
+        """
+        return os.path.join(self.objectdir, digest[:2], digest[2:]) + '.json'
+
+    def _reference(self, item, digest):
+        """
+        Appends an item to the snapshot manifest
+        """
+        self.snapshot.write(json.dumps({'id': item.myself, \
+            'backuppath': item.backuppath, 'digest': digest}) + '\n')
+
+    def write(self, item, exportresult):
+        """
+        Stores an export unless an identical blob exists, returning the blob, its digest,
+        and its size
+        """
+        payload = json.dumps(exportresult, sort_keys=True, separators=(',', ':')).encode('utf8')
+        digest = hashlib.sha256(payload).hexdigest()
+        objectfile = self._objectfile(digest)
+        if not os.path.exists(objectfile):
+            os.makedirs(os.path.dirname(objectfile), exist_ok = True)
+            spoolfile = f'{objectfile}.{os.getpid()}.tmp'
+            with open(spoolfile, 'wb') as objectobject:
+                objectobject.write(payload)
+            os.replace(spoolfile, objectfile)
+            METRICS.add('bytes_written', len(payload))
+        self._reference(item, digest)
+        return objectfile, digest, len(payload)
+
+    def carry(self, item, prior):
+        """
+        References the blob of an unchanged export, if it is still in the store
+        """
+        if not prior['digest'] or not os.path.exists(self._objectfile(prior['digest'])):
+            return False
+        self._reference(item, prior['digest'])
+        return True
+
+    def close(self):
+        """
+        Closes the snapshot manifest
+        """
+        self.snapshot.close()
+
+class ArchiveStore():
+    """
+    Streams each export into a zip, tar.gz, or tar.zst archive entry named by its backup path,
+    renaming the archive into place only once it is closed
+    """
+
+    def __init__(self, rundir, codec):
+        """
+        Opens the next free archive part in the run directory, removing any torn part
+        """
+        self.codec = codec
+        for filename in os.listdir(rundir):
+            if filename.startswith('.content.') and filename.endswith('.partial'):
+                os.remove(os.path.join(rundir, filename))
+        self.archivefile = os.path.join(rundir, f'content.{codec}')
+        part = 0
+        while os.path.exists(self.archivefile):
+            part += 1
+            self.archivefile = os.path.join(rundir, f'content.{part}.{codec}')
+        self.partialfile = os.path.join(rundir, \
+            f'.{os.path.basename(self.archivefile)}.partial')
+
+        self.priors = {}
+        self.readers = []
+        self.spooldir = None
+
+        self.fileobject = open(self.partialfile, 'wb')
+        self.compressor = None
+        if codec == 'zip':
+            self.archive = zipfile.ZipFile(self.fileobject, 'w', zipfile.ZIP_DEFLATED)
+        elif codec == 'tar.zst':
+            self.compressor = load_zstandard().ZstdCompressor().stream_writer(self.fileobject, \
+                closefd=False)
+            self.archive = tarfile.open(fileobj=self.compressor, mode='w')
+        else:
+            self.compressor = gzip.GzipFile(fileobj=self.fileobject, mode='wb')
+            self.archive = tarfile.open(fileobj=self.compressor, mode='w')
+
+    def add(self, arcname, payload):
+        """
+        Adds one entry to the archive and flushes it through to the file
+        """
+        if self.codec == 'zip':
+            zipinfo = zipfile.ZipInfo(arcname, time.localtime()[:6])
+            zipinfo.compress_type = zipfile.ZIP_DEFLATED
+            self.archive.writestr(zipinfo, payload)
+        else:
+            tarinfo = tarfile.TarInfo(arcname)
+            tarinfo.size = len(payload)
+            tarinfo.mtime = int(time.time())
+            self.archive.addfile(tarinfo, io.BytesIO(payload))
+            if self.codec == 'tar.zst':
+                self.compressor.flush(load_zstandard().FLUSH_BLOCK)
+            else:
+                self.compressor.flush()
+        self.fileobject.flush()
+        METRICS.add('bytes_written', len(payload))
+
+    def write(self, item, exportresult):
+        """
+        Streams an export into the archive, returning its entry, no digest, and its size
+        """
+        arcname = f'content/{item.backuppath}.json'
+        payload = (json.dumps(exportresult) + '\n').encode('utf8')
+        self.add(arcname, payload)
+        return f'{self.archivefile}:{arcname}', None, len(payload)
+
+    def prior_entries(self, run):
+        """
+        Returns the entries of the archive parts of an earlier run, indexing them the first time
+        """
+        entries = self.priors.get(run)
+        if entries is not None:
+            return entries
+        entries = self.priors[run] = {}
+        priordir = os.path.join(ARGS.OUTPUTDIR, run)
+        for filename in sorted(os.listdir(priordir)):
+            if not filename.startswith('content.') or \
+               not filename.endswith(('.zip', '.tar.gz', '.tar.zst')):
+                continue
+            archivefile = os.path.join(priordir, filename)
+            if filename.endswith('.zip'):
+                archive = zipfile.ZipFile(archivefile, 'r')
+                for name in archive.namelist():
+                    entries[name] = (archive, name)
+            else:
+                if self.spooldir is None:
+                    self.spooldir = tempfile.mkdtemp(prefix='sumologic_backup.')
+                spoolfile = os.path.join(self.spooldir, f'{len(self.readers)}.tar')
+                with open(archivefile, 'rb') as archiveobject, \
+                     open(spoolfile, 'wb') as spoolobject:
+                    if filename.endswith('.zst'):
+                        reader = load_zstandard().ZstdDecompressor().stream_reader(archiveobject, \
+                            read_across_frames=True)
+                    else:
+                        reader = gzip.GzipFile(fileobj=archiveobject, mode='rb')
+                    with reader:
+                        shutil.copyfileobj(reader, spoolobject)
+                archive = tarfile.open(spoolfile, 'r:')
+                for member in archive:
+                    entries[member.name] = (archive, member)
+            self.readers.append(archive)
+        return entries
+
+    def carry(self, item, prior):
+        """
+        Copies an unchanged export into the archive from an earlier run, out of its content
+        tree or its archive parts
+        """
+        priorfile = os.path.join(ARGS.OUTPUTDIR, prior['run'], 'content', \
+            prior['backuppath']) + '.json'
+        if os.path.exists(priorfile):
+            with open(priorfile, 'rb') as priorobject:
+                payload = priorobject.read()
+        else:
+            entry = self.prior_entries(prior['run']).get(f'content/{prior["backuppath"]}.json')
+            if entry is None:
+                return False
+            (archive, member) = entry
+            if isinstance(archive, zipfile.ZipFile):
+                payload = archive.read(member)
+            else:
+                payload = archive.extractfile(member).read()
+        self.add(f'content/{item.backuppath}.json', payload)
+        return True
+
+    def close(self):
+        """
+        Finishes the archive, renames the part to its final name, and closes the archives
+        of earlier runs
+        """
+        self.archive.close()
+        if self.compressor is not None:
+            self.compressor.close()
+        self.fileobject.close()
+        os.replace(self.partialfile, self.archivefile)
+        for archive in self.readers:
+            archive.close()
+        if self.spooldir is not None:
+            shutil.rmtree(self.spooldir, ignore_errors=True)
+
+class PackStore():
+    """
+    Packfile store: compressed exports appended to content.pack, with a sorted content.idx
+    that PackReader maps into memory
+    """
+
+    def __init__(self, rundir, codec=None):
+        """
+        Opens the pack of the run, picking up the records of an interrupted run if there are any
+        """
+        self.packfile = os.path.join(rundir, PACKNAME)
+        self.indexfile = os.path.join(rundir, PACKINDEXNAME)
+        self.entries = {}
+        self.readers = {}
+
+        if os.path.exists(self.packfile):
+            self.codec = PackReader.read_header(self.packfile)
+            self.entries = PackReader.scan(self.packfile)
+            self.fileobject = open(self.packfile, 'ab')
+        else:
+            self.codec = codec or ('zstd' if load_zstandard() is not None else 'zlib')
+            self.fileobject = open(self.packfile, 'wb')
+            self.fileobject.write(PACKHEADER.pack(PACKMAGIC, PACKVERSION, \
+                PACKCODECS.index(self.codec)))
+
+        if self.codec == 'zstd':
+            self.compressor = load_zstandard().ZstdCompressor()
+        else:
+            self.compressor = None
+
+    def _compress(self, payload):
+        """
+        Compresses one record
+        """
+        if self.compressor is not None:
+            return self.compressor.compress(payload)
+        return zlib.compress(payload)
+
+    def add(self, contentid, record, size):
+        """
+        Appends a compressed record and flushes it through to the file, as the journal
+        will record the item as written, returning its offset in the pack
+        """
+        key = pack_key(contentid)
+        self.fileobject.write(PACKRECORD.pack(key, len(record), size))
+        offset = self.fileobject.tell()
+        self.fileobject.write(record)
+        self.fileobject.flush()
+        self.entries[key] = (offset, len(record), size)
+        METRICS.add('bytes_written', PACKRECORD.size + len(record))
+        return offset
+
+    def write(self, item, exportresult):
+        """
+        Compresses an export into the pack, returning its record, no digest, and its size
+        """
+        payload = (json.dumps(exportresult) + '\n').encode('utf8')
+        offset = self.add(item.myself, self._compress(payload), len(payload))
+        return f'{self.packfile}@{offset}', None, len(payload)
+
+    def carry(self, item, prior):
+        """
+        Copies an unchanged export forward from the pack or the content tree of an earlier
+        run. The pack of each earlier run is mapped once, on its first carried item.
+        """
+        priordir = os.path.join(ARGS.OUTPUTDIR, prior['run'])
+        reader = self.readers.get(prior['run'])
+        if reader is None and os.path.exists(os.path.join(priordir, PACKINDEXNAME)):
+            reader = self.readers[prior['run']] = PackReader(priordir)
+        if reader is not None:
+            entry = reader.find(item.myself)
+            if entry is None:
+                return False
+            if reader.codec == self.codec:
+                self.add(item.myself, reader.record(entry), entry[2])
+            else:
+                payload = reader.payload(entry)
+                self.add(item.myself, self._compress(payload), len(payload))
+            return True
+
+        priorfile = os.path.join(priordir, 'content', prior['backuppath']) + '.json'
+        if not os.path.exists(priorfile):
+            return False
+        with open(priorfile, 'rb') as priorobject:
+            payload = priorobject.read()
+        self.add(item.myself, self._compress(payload), len(payload))
+        return True
+
+    def close(self):
+        """
+        Closes the pack and the packs of earlier runs, and writes its sorted index
+        """
+        for reader in self.readers.values():
+            reader.close()
+        self.readers = {}
+        self.fileobject.close()
+        spoolfile = f'{self.indexfile}.tmp'
+        with open(spoolfile, 'wb') as indexobject:
+            indexobject.write(PACKINDEXHEADER.pack(PACKINDEXMAGIC, len(self.entries)))
+            for key in sorted(self.entries):
+                (offset, length, size) = self.entries[key]
+                indexobject.write(PACKENTRY.pack(key, offset, length, size))
+        os.replace(spoolfile, self.indexfile)
+
+class PackReader():
+    """
+    Random access to the exports in a run pack. The index and the pack are memory mapped,
+    and an item is found by binary search over the fixed width index entries.
+    """
+
+    def __init__(self, rundir):
+        """
+        Maps the pack and its index
+        """
+        self.packfile = os.path.join(rundir, PACKNAME)
+        self.codec = self.read_header(self.packfile)
+        with open(os.path.join(rundir, PACKINDEXNAME), 'rb') as indexobject:
+            self.index = mmap.mmap(indexobject.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.packfile, 'rb') as packobject:
+            self.pack = mmap.mmap(packobject.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.count) = PACKINDEXHEADER.unpack_from(self.index, 0)
+        if magic != PACKINDEXMAGIC:
+            raise ValueError(f'{rundir} has no valid pack index')
+        self.keys = PackKeys(self.index, self.count)
+        self.decompressor = load_zstandard().ZstdDecompressor() if self.codec == 'zstd' else None
+
+    @staticmethod
+    def read_header(packfile):
+        """
+        Returns the codec of a pack
+        """
+        with open(packfile, 'rb') as packobject:
+            (magic, _version, codec) = PACKHEADER.unpack(packobject.read(PACKHEADER.size))
+        if magic != PACKMAGIC:
+            raise ValueError(f'{packfile} is not a pack')
+        return PACKCODECS[codec]
+
+    @staticmethod
+    def scan(packfile):
+        """
+        Rebuilds the entries of a pack from its record headers, stopping at a torn record
+        """
+        entries = {}
+        packsize = os.path.getsize(packfile)
+        with open(packfile, 'r+b') as packobject:
+            offset = PACKHEADER.size
+            packobject.seek(offset)
+            while offset + PACKRECORD.size <= packsize:
+                (key, length, size) = PACKRECORD.unpack(packobject.read(PACKRECORD.size))
+                if offset + PACKRECORD.size + length > packsize:
+                    break
+                entries[key] = (offset + PACKRECORD.size, length, size)
+                offset += PACKRECORD.size + length
+                packobject.seek(offset)
+            packobject.truncate(offset)
+        return entries
+
+    def find(self, contentid):
+        """
+        Returns the offset, length, and size of the record of an item, or None
+        """
+        key = pack_key(contentid)
+        position = bisect.bisect_left(self.keys, key)
+        if position == self.count or self.keys[position] != key:
+            return None
+        (_key, offset, length, size) = PACKENTRY.unpack_from(self.index, \
+            PACKINDEXHEADER.size + position * PACKENTRY.size)
+        return offset, length, size
+
+    def record(self, entry):
+        """
+        Returns the compressed bytes of a record
+        """
+        (offset, length, _size) = entry
+        return self.pack[offset:offset + length]
+
+    def payload(self, entry):
+        """
+        Returns the uncompressed bytes of a record
+        """
+        if self.decompressor is not None:
+            return self.decompressor.decompress(self.record(entry), max_output_size=entry[2])
+        return zlib.decompress(self.record(entry))
+
+    def get(self, contentid):
+        """
+        Returns the export of an item, or None if the pack does not hold it
+        """
+        entry = self.find(contentid)
+        if entry is None:
+            return None
+        return json.loads(self.payload(entry))
+
+    def __iter__(self):
+        """
+        Yields the key of every item, in index order
+        """
+        for position in range(self.count):
+            yield self.keys[position].rstrip(b'\0').decode('ascii', 'replace')
+
+    def close(self):
+        """
+        Unmaps the pack and its index
+        """
+        self.index.close()
+        self.pack.close()
+
+class PackKeys():
+    """
+    Sequence view of the keys in a memory mapped pack index, for bisect
+    """
+
+    def __init__(self, index, count):
+        """
+        Wraps the index
+        """
+        self.index = index
+        self.count = count
+
+    def __len__(self):
+        """
+        The number of entries
+        """
+        return self.count
+
+    def __getitem__(self, position):
+        """
+        The key of one entry
+        """
+        start = PACKINDEXHEADER.size + position * PACKENTRY.size
+        return self.index[start:start + PACKKEYSIZE]
+
+class ManifestWriter():
+    """
+    Streaming manifest of a run, appended to a CSV, a JSONL file, and an indexed SQLite
+    database as items come
+    """
+
+    HEADER = ('uid_myself', 'uid_parent', 'my_type', 'my_name', 'my_path', 'backup_oid', \
+              'backup_path')
+
+    def __init__(self, manifestdir, batch=1000):
+        """
+        Creates the manifest files, replacing any left by an earlier attempt at the run
+        """
+        self.batch = batch
+        self.rows = []
+
+        self.csvobject = open(os.path.join(manifestdir, MANIFESTNAME), 'w', \
+            encoding='utf8', newline='')
+        self.csvwriter = csv.writer(self.csvobject)
+        self.csvwriter.writerow(self.HEADER)
+        self.jsonobject = open(os.path.join(manifestdir, MANIFESTJSONNAME), 'w', \
+            encoding='utf8')
+
+        self.indexfile = os.path.join(manifestdir, MANIFESTDBNAME)
+        for stalefile in (self.indexfile, f'{self.indexfile}.tmp'):
+            if os.path.exists(stalefile):
+                os.remove(stalefile)
+        self.connection = sqlite3.connect(f'{self.indexfile}.tmp')
+        self.connection.execute('PRAGMA journal_mode = OFF')
+        self.connection.execute('PRAGMA synchronous = OFF')
+        self.connection.execute('CREATE TABLE items (id TEXT PRIMARY KEY, parent TEXT, ' + \
+            'type TEXT, name TEXT, path TEXT, backupname TEXT, backuppath TEXT, modified TEXT)')
+
+    def add(self, item):
+        """
+        Appends an item to the manifest
+        """
+        row = (item.myself, item.parent, item.type, item.name, item.path, \
+               item.backupname, item.backuppath, item.modified)
+        self.csvwriter.writerow(row[:7])
+        self.jsonobject.write(json.dumps({'id': row[0], 'parent': row[1], 'type': row[2], \
+            'name': row[3], 'path': row[4], 'backupname': row[5], 'backuppath': row[6], \
+            'modified': row[7]}) + '\n')
+        self.rows.append(row)
+        if len(self.rows) >= self.batch:
+            self._flush()
+
+    def _flush(self):
+        """
+        Writes the batched rows to the index
+        """
+        self.connection.executemany('INSERT OR REPLACE INTO items VALUES ' + \
+            '(?, ?, ?, ?, ?, ?, ?, ?)', self.rows)
+        self.rows = []
+
+    def close(self):
+        """
+        Flushes and closes every manifest file. The secondary indexes are built here,
+        in one pass, which is quicker than keeping them up to date row by row
+        """
+        self._flush()
+        for column in ('parent', 'type', 'path', 'backuppath'):
+            self.connection.execute(f'CREATE INDEX items_{column} ON items ({column})')
+        self.connection.execute('ANALYZE')
+        self.connection.commit()
+        self.connection.close()
+        os.replace(f'{self.indexfile}.tmp', self.indexfile)
+        self.csvobject.close()
+        self.jsonobject.close()
+
+class RunJournal():
+    """
+    Append only completion journal of a run. Each export job started and each item
+    written is recorded as it happens, so an interrupted run can be resumed.
+    """
+
+    def __init__(self, journalfile):
+        """
+        Opens the journal, loading the items already written and the jobs left in flight
+        """
+        self.done = set()
+        self.inflight = {}
+        self.starts = {}
+        if os.path.exists(journalfile):
+            with open(journalfile, 'r', encoding='utf8') as journalobject:
+                for line in journalobject:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry['event'] == 'started':
+                        self.inflight[entry['id']] = entry['job']
+                    elif entry['event'] == 'done':
+                        self.done.add(entry['id'])
+                        self.inflight.pop(entry['id'], None)
+        self.journal = open(journalfile, 'a', encoding='utf8', buffering=1)
+        self.held = None
+        self.lock = threading.Lock()
+
+    def _append(self, entry):
+        """
+        Appends an entry, one line at a time
+        """
+        with self.lock:
+            self.journal.write(json.dumps(entry) + '\n')
+
+    def hold(self):
+        """
+        Holds the items written from here on in a side file, to be journaled by release
+        once the store has made them durable
+        """
+        self.held = open(self.journal.name + '.held', 'w', encoding='utf8')
+
+    def release(self):
+        """
+        Journals the items held since hold
+        """
+        if self.held is None:
+            return
+        self.held.close()
+        with open(self.held.name, 'r', encoding='utf8') as heldobject, self.lock:
+            shutil.copyfileobj(heldobject, self.journal)
+        os.remove(self.held.name)
+        self.held = None
+
+    def started(self, contentid, exportjob):
+        """
+        Records that an export job is in flight
+        """
+        self.starts[contentid] = time.time()
+        self._append({'id': contentid, 'event': 'started', 'job': exportjob})
+
+    def finished(self, contentid, digest=None, size=None):
+        """
+        Records that an item has been written, with the seconds since its export job
+        started and the bytes it took, when known
+        """
+        entry = {'id': contentid, 'event': 'done', 'digest': digest}
+        starttime = self.starts.pop(contentid, None)
+        if starttime is not None:
+            entry['seconds'] = round(time.time() - starttime, 3)
+        if size is not None:
+            entry['bytes'] = size
+        if self.held is not None:
+            self.held.write(json.dumps(entry) + '\n')
+        else:
+            self._append(entry)
+
+    def close(self):
+        """
+        Closes the journal
+        """
+        self.journal.close()
+
+class ContentIndex():
+    """
+    Persistent SQLite index of exported content kept in the output directory. It records
+    the run holding the latest export of each item, and the modification time it had.
+    """
+
+    def __init__(self, indexfile):
+        """
+        Opens the index, creating its tables if needed
+        """
+        self.connection = sqlite3.connect(indexfile, timeout=60)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS runs (run TEXT PRIMARY KEY, ' + \
+            'target TEXT, started REAL, finished REAL, exported INTEGER, ' + \
+            'carried INTEGER, failed INTEGER)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS items (id TEXT PRIMARY KEY, ' + \
+            'parent TEXT, type TEXT, modified TEXT, run TEXT, backuppath TEXT, digest TEXT)')
+        columns = [ row[1] for row in self.connection.execute('PRAGMA table_info(items)') ]
+        if 'digest' not in columns:
+            self.connection.execute('ALTER TABLE items ADD COLUMN digest TEXT')
+        self.connection.commit()
+
+    def start_run(self, runtag, target):
+        """
+        Records the start of a run
+        """
+        self.connection.execute('INSERT OR REPLACE INTO runs (run, target, started) ' + \
+            'VALUES (?, ?, ?)', (runtag, target, time.time()))
+        self.connection.commit()
+
+    def finish_run(self, runtag, exported, carried, failed):
+        """
+        Records the end of a run, and commits every item recorded during it
+        """
+        self.connection.execute('UPDATE runs SET finished = ?, exported = ?, carried = ?, ' + \
+            'failed = ? WHERE run = ?', (time.time(), exported, carried, failed, runtag))
+        self.connection.commit()
+
+    def prior(self, item):
+        """
+        Returns the run, backup path, and digest of the earlier export of an item
+        if it has not been modified since, or None
+        """
+        if not item.modified:
+            return None
+        row = self.connection.execute('SELECT modified, run, backuppath, digest FROM items ' + \
+            'WHERE id = ?', (item.myself,)).fetchone()
+        if row is None or row[0] != item.modified:
+            return None
+        return {'run': row[1], 'backuppath': row[2], 'digest': row[3]}
+
+    def record(self, item, runtag, digest=None):
+        """
+        Records that a run holds the current export of an item
+        """
+        self.connection.execute('INSERT OR REPLACE INTO items ' + \
+            '(id, parent, type, modified, run, backuppath, digest) ' + \
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', (item.myself, item.parent, item.type, \
+             item.modified, runtag, item.backuppath, digest))
+
+    def close(self):
+        """
+        Commits and closes the index
+        """
+        self.connection.commit()
+        self.connection.close()
+
+class DiscoveryCache():
+    """
+    Opt-in cache of folder listings from earlier runs, reused while a folder keeps its
+    modification time, for at most maxage seconds
+    """
+
+    def __init__(self, cachefile, org, maxage):
+        """
+        Opens the cache in write ahead log mode, creating its table if needed
+        """
+        self.connection = sqlite3.connect(cachefile, timeout=5)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS listings (org TEXT, id TEXT, ' + \
+            'modified TEXT, listed REAL, listing TEXT, PRIMARY KEY (org, id))')
+        self.connection.commit()
+        self.org = org
+        self.maxage = maxage
+
+    def get(self, folder):
+        """
+        Returns the cached listing of a folder if it is still current, or None. A locked
+        cache is a miss.
+        """
+        if not folder.modified or self.maxage <= 0:
+            return None
+        try:
+            row = self.connection.execute('SELECT modified, listed, listing FROM listings ' + \
+                'WHERE org = ? AND id = ?', (self.org, folder.myself)).fetchone()
+        except sqlite3.OperationalError:
+            METRICS.add('listings_locked')
+            return None
+        if row is None or row[0] != folder.modified or time.time() - row[1] > self.maxage:
+            return None
+        METRICS.add('listings_cached')
+        return json.loads(row[2])
+
+    def put(self, folder, listing):
+        """
+        Caches the listing of a folder, along with the modification time it was listed with.
+        A listing that cannot be written to a locked cache is dropped.
+        """
+        if not folder.modified:
+            return
+        try:
+            with self.connection:
+                self.connection.execute('INSERT OR REPLACE INTO listings ' + \
+                    '(org, id, modified, listed, listing) VALUES (?, ?, ?, ?, ?)', \
+                    (self.org, folder.myself, folder.modified, time.time(), json.dumps(listing)))
+        except sqlite3.OperationalError:
+            METRICS.add('listings_locked')
+
+    def close(self):
+        """
+        Closes the cache
+        """
+        self.connection.close()
+
+class TokenBucket():
+    """
+    Client side rate limiter shared by every API call. Tokens refill at rate per second,
+    and a throttled response can hold the whole bucket until the server allows retries.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Initializes the bucket with a rate in requests per second, 0 for unlimited
+        """
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.held_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token, returning the seconds to wait before it may be used
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = max(self.held_until - now, 0.0)
+            if self.rate > 0:
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                self.tokens -= 1
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / self.rate)
+        return wait
+
+    def acquire(self):
+        """
+        Takes a token, sleeping until one is available. Returns the seconds slept
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def hold(self, seconds):
+        """
+        Stops handing out tokens for the given number of seconds
+        """
+        with self.lock:
+            self.held_until = max(self.held_until, time.monotonic() + seconds)
+
+class SumoApiClient():
+    """
+    This is defined SumoLogic API Client
+    The class includes the HTTP methods, cmdlets, and init methods
+    """
+
+    def __init__(self, access_id, access_key, endpoint=None, cookie_file=None, \
+                 pool_size=10, limiter=None, retries=5, endpoint_cache=None):
+        """
+        Initializes the Sumo Logic object, with the endpoint discovered on the first request
+        if it is not given
+        """
+        self.limiter = limiter if limiter is not None else TokenBucket(0)
+        self.retries = retries
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, \
+            pool_maxsize=max(pool_size, 10))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.auth = (access_id, access_key)
+        self.session.headers = {'content-type': 'application/json', \
+            'accept': 'application/json'}
+        self.cookiejar = open_cookie_jar(cookie_file)
+        if self.cookiejar is not None:
+            self.session.cookies = self.cookiejar
+        self.access_id = access_id
+        self.endpoint_cache = endpoint_cache
+        self.endpoint_lock = threading.Lock()
+        self._endpoint = resolve_endpoint_name(endpoint)
+
+    @property
+    def endpoint(self):
+        """
+        The API endpoint, discovered once on first use if it was not given
+        """
+        if self._endpoint is None:
+            with self.endpoint_lock:
+                if self._endpoint is None:
+                    self._endpoint = self._get_endpoint()
+        return self._endpoint
+
+    def _get_endpoint(self):
+        """
+        SumoLogic REST API endpoint changes based on the geo location of the client.
+        It contacts the default REST endpoint and caches the answer per access id
+        """
+        endpoint = read_endpoint_cache(self.endpoint_cache, self.access_id)
+        if endpoint is not None:
+            return endpoint
+
+        starttime = time.perf_counter()
+        self.response = self.session.get(DEFAULT_ENDPOINT + '/v1/collectors', \
+            timeout=API_TIMEOUT)
+        METRICS.call('GET /v1/collectors', time.perf_counter() - starttime, 0, \
+            len(self.response.content))
+        endpoint = self.response.url.replace('/v1/collectors', '')
+
+        write_endpoint_cache(self.endpoint_cache, self.access_id, endpoint)
+        return endpoint
+
+    @staticmethod
+    def _backoff(attempt, retry_after=None):
+        """
+        Returns the delay before a retry, from a valid Retry-After value or exponential backoff,
+        with jitter
+        """
+        jitter = random.uniform(0, RETRY_START)
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = email.utils.parsedate_to_datetime(retry_after).timestamp() - \
+                        time.time()
+                except (TypeError, ValueError, AttributeError):
+                    delay = None
+            if delay is not None and math.isfinite(delay):
+                return max(delay, 0.0) + jitter
+        return random.uniform(0, min(RETRY_LIMIT, RETRY_START * 2 ** attempt)) + jitter
+
+    def _request(self, verb, method, **kwargs):
+        """
+        Sends a request through the rate limiter, retrying throttled, server side,
+        and connection failures up to self.retries times
+        """
+        route = f'{verb} {ROUTEPATTERN.sub("/{id}", method)}'
+        sent = len(kwargs.get('data') or '')
+        attempt = 0
+        while True:
+            METRICS.add('throttle_seconds', self.limiter.acquire())
+            starttime = time.perf_counter()
+            try:
+                response = self.session.request(verb, self.endpoint + method, \
+                    timeout=API_TIMEOUT, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                METRICS.call(route, time.perf_counter() - starttime, sent, 0, 'connection')
+                if attempt >= self.retries:
+                    raise
+                delay = self._backoff(attempt)
+                METRICS.add('retries')
+                METRICS.add('backoff_seconds', delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            METRICS.call(route, time.perf_counter() - starttime, sent, len(response.content), \
+                response.status_code if response.status_code != 200 else None)
+
+            if response.status_code in RETRY_CODES and attempt < self.retries:
+                delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                if response.status_code == 429:
+                    self.limiter.hold(delay)
+                METRICS.add('retries')
+                METRICS.add('backoff_seconds', delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if response.status_code != 200:
+                response.reason = response.text
+            response.raise_for_status()
+            return response
+
+    def delete(self, method, params=None, headers=None, data=None):
+        """
+        Defines a Sumo Logic Delete operation
+        """
+        return self._request('DELETE', method, params=params, headers=headers, data=data)
+
+    def get(self, method, params=None, headers=None):
+        """
+        Defines a Sumo Logic Get operation
+        """
+        return self._request('GET', method, params=params, headers=headers)
+
+    def post(self, method, data, headers=None, params=None):
+        """
+        Defines a Sumo Logic Post operation
+        """
+        return self._request('POST', method, data=json.dumps(data), headers=headers, \
+            params=params)
+
+    def put(self, method, data, headers=None, params=None):
+        """
+        Defines a Sumo Logic Put operation
+        """
+        return self._request('PUT', method, data=json.dumps(data), headers=headers, \
+            params=params)
+
+    def close(self):
+        """
+        Closes the connection pool, saving cookies if they are kept in a file
+        """
+        self.session.close()
+        if self.cookiejar is not None:
+            self.cookiejar.save(ignore_discard=True)
+
+### class ###
+
+### methods ###
+
+    def get_myfolders(self):
+        """
+        Using an HTTP client, this uses a GET to retrieve all information.
         """
         url = "/v2/content/folders/personal/"
         body = self.get(url).text
@@ -485,7 +2985,6 @@ class SumoApiClient():
         """
         Using an HTTP client, this uses a GET to retrieve single information.
         """
-        time.sleep(DELAY_TIME)
         url = "/v2/content/folders/" + str(myself)
         body = self.get(url).text
         results = json.loads(body)
@@ -504,7 +3003,6 @@ class SumoApiClient():
         """
         Using an HTTP client, this uses a GET to retrieve single information.
         """
-        time.sleep(DELAY_TIME)
         url = "/v2/content/folders/global/" + str(myself) + "/status"
         body = self.get(url).text
         results = json.loads(body)
@@ -514,7 +3012,6 @@ class SumoApiClient():
         """
         Using an HTTP client, this uses a GET to retrieve single information.
         """
-        time.sleep(DELAY_TIME)
         url = "/v2/content/folders/global/" + str(myself) + "/result"
         body = self.get(url).text
         results = json.loads(body)
@@ -524,7 +3021,6 @@ class SumoApiClient():
         """
         Using an HTTP client, this starts an export job by passing in the content ID
         """
-        time.sleep(DELAY_TIME)
         url = "/v2/content/" + str(myself) + "/export"
         body = self.post(url, data=str(myself)).text
         results = json.loads(body)
@@ -534,7 +3030,6 @@ class SumoApiClient():
         """
         Using an HTTP client, this starts an export job by passing in the content ID
         """
-        time.sleep(DELAY_TIME)
         url = "/v2/content/" + str(myself) + "/export/" + str(jobid) + "/status"
         body = self.get(url).text
         results = json.loads(body)
@@ -544,13 +3039,344 @@ class SumoApiClient():
         """
         Using an HTTP client, this starts an export job by passing in the content ID
         """
-        time.sleep(DELAY_TIME)
         url = "/v2/content/" + str(myself) + "/export/" + str(jobid) + "/result"
         body = self.get(url).text
         results = json.loads(body)
         return results
 
+    def create_folder(self, name, parentid, description='', adminmode=False):
+        """
+        Using an HTTP client, this uses a POST to create a folder in a parent folder
+        """
+        url = "/v2/content/folders"
+        headers = {'isAdminMode': 'true'} if adminmode else None
+        body = self.post(url, data={'name': name, 'description': description, \
+            'parentId': str(parentid)}, headers=headers).text
+        results = json.loads(body)
+        return results
+
+    def start_import_job(self, folderid, definition, overwrite=False, adminmode=False):
+        """
+        Using an HTTP client, this starts an import job of a content definition into a folder
+        """
+        url = "/v2/content/folders/" + str(folderid) + "/import"
+        headers = {'isAdminMode': 'true'} if adminmode else None
+        body = self.post(url, data=definition, headers=headers, \
+            params={'overwrite': 'true' if overwrite else 'false'}).text
+        results = json.loads(body)
+        return results
+
+    def check_import_job_status(self, folderid, jobid, adminmode=False):
+        """
+        Using an HTTP client, this checks the status of an import job into a folder
+        """
+        url = "/v2/content/folders/" + str(folderid) + "/import/" + str(jobid) + "/status"
+        headers = {'isAdminMode': 'true'} if adminmode else None
+        body = self.get(url, headers=headers).text
+        results = json.loads(body)
+        return results
+
 ### methods ###
 
+class AsyncEngine():
+    """
+    Runs one asyncio event loop in a background thread, taking coroutines the way a
+    ThreadPoolExecutor takes calls
+    """
+
+    def __init__(self):
+        """
+        Starts the event loop
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='asyncio', \
+            daemon=True)
+        self.thread.start()
+
+    def submit(self, function, *args):
+        """
+        Schedules a coroutine function, or a function with a coroutine twin, on the loop
+        """
+        coroutinefunction = getattr(function, 'coroutine', function)
+        if not asyncio.iscoroutinefunction(coroutinefunction):
+            raise TypeError(f'{function!r} has no coroutine to run on the engine')
+        return asyncio.run_coroutine_threadsafe(coroutinefunction(*args), self.loop)
+
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the loop and waits for its result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def blocking(self, client):
+        """
+        Returns a blocking view of an asyncio client, for the sequential parts of a run
+        """
+        return BlockingClient(client, self)
+
+    def close(self):
+        """
+        Stops the loop and its thread
+        """
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+class BlockingClient():
+    """
+    Blocking view of an AsyncSumoApiClient, whose methods can also be submitted to the
+    engine through their coroutine attribute
+    """
+
+    def __init__(self, client, engine):
+        """
+        Wraps the client
+        """
+        self.client = client
+        self.engine = engine
+
+    def __getattr__(self, name):
+        """
+        Returns a blocking wrapper of a client method
+        """
+        attribute = getattr(self.client, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return self.engine.run(attribute(*args, **kwargs))
+        call.coroutine = attribute
+        return call
+
+class AsyncSumoApiClient():
+    """
+    Asyncio variant of SumoApiClient, with the same methods as coroutines over one
+    pooled aiohttp session
+    """
+
+    def __init__(self, access_id, access_key, endpoint=None, pool_size=10, limiter=None, \
+                 retries=5, endpoint_cache=None):
+        """
+        Initializes the client. The session is opened on first use, inside the event loop.
+        """
+        load_aiohttp()
+        self.limiter = limiter if limiter is not None else TokenBucket(0)
+        self.retries = retries
+        self.pool_size = max(pool_size, 1)
+        self.session = None
+        self.authorization = 'Basic ' + \
+            base64.b64encode(f'{access_id}:{access_key}'.encode('utf8')).decode('ascii')
+        self.access_id = access_id
+        self.endpoint_cache = endpoint_cache
+        self.endpoint_lock = None
+        self._endpoint = resolve_endpoint_name(endpoint)
+
+    def _open(self):
+        """
+        Returns the session, opening it on first use
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(headers={'authorization': self.authorization, \
+                'content-type': 'application/json', 'accept': 'application/json'}, \
+                connector=aiohttp.TCPConnector(limit=self.pool_size), \
+                timeout=aiohttp.ClientTimeout(total=60))
+        return self.session
+
+    async def endpoint(self):
+        """
+        Returns the API endpoint, discovered once on first use if it was not given
+        """
+        if self._endpoint is None:
+            if self.endpoint_lock is None:
+                self.endpoint_lock = asyncio.Lock()
+            async with self.endpoint_lock:
+                if self._endpoint is None:
+                    self._endpoint = await self._get_endpoint()
+        return self._endpoint
+
+    async def _get_endpoint(self):
+        """
+        Resolves the endpoint from the redirect of the default endpoint, as SumoApiClient does
+        """
+        endpoint = read_endpoint_cache(self.endpoint_cache, self.access_id)
+        if endpoint is not None:
+            return endpoint
+
+        starttime = time.perf_counter()
+        async with self._open().get(DEFAULT_ENDPOINT + '/v1/collectors') as response:
+            body = await response.read()
+            url = str(response.url)
+        METRICS.call('GET /v1/collectors', time.perf_counter() - starttime, 0, len(body))
+        endpoint = url.replace('/v1/collectors', '')
+
+        write_endpoint_cache(self.endpoint_cache, self.access_id, endpoint)
+        return endpoint
+
+    async def _request(self, verb, method, **kwargs):
+        """
+        Sends a request through the rate limiter, retrying throttled, server side,
+        and connection failures up to self.retries times, and returns the response body
+        """
+        route = f'{verb} {ROUTEPATTERN.sub("/{id}", method)}'
+        sent = len(kwargs.get('data') or '')
+        url = await self.endpoint() + method
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            METRICS.add('throttle_seconds', wait)
+            starttime = time.perf_counter()
+            try:
+                async with self._open().request(verb, url, **kwargs) as response:
+                    body = await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as myerror:
+                METRICS.call(route, time.perf_counter() - starttime, sent, 0, 'connection')
+                if attempt >= self.retries:
+                    raise requests.exceptions.ConnectionError(str(myerror)) from myerror
+                delay = SumoApiClient._backoff(attempt)
+                METRICS.add('retries')
+                METRICS.add('backoff_seconds', delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            METRICS.call(route, time.perf_counter() - starttime, sent, len(body), \
+                response.status if response.status != 200 else None)
+
+            if response.status in RETRY_CODES and attempt < self.retries:
+                delay = SumoApiClient._backoff(attempt, response.headers.get('Retry-After'))
+                if response.status == 429:
+                    self.limiter.hold(delay)
+                METRICS.add('retries')
+                METRICS.add('backoff_seconds', delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            if response.status >= 400:
+                raise requests.exceptions.HTTPError(f'{response.status} Error: ' + \
+                    f'{body} for url: {response.url}')
+            return body
+
+    async def delete(self, method, params=None, headers=None, data=None):
+        """
+        Defines a Sumo Logic Delete operation
+        """
+        return await self._request('DELETE', method, params=params, headers=headers, \
+            data=data)
+
+    async def get(self, method, params=None, headers=None):
+        """
+        Defines a Sumo Logic Get operation
+        """
+        return await self._request('GET', method, params=params, headers=headers)
+
+    async def post(self, method, data, headers=None, params=None):
+        """
+        Defines a Sumo Logic Post operation
+        """
+        return await self._request('POST', method, data=json.dumps(data), \
+            headers=headers, params=params)
+
+    async def put(self, method, data, headers=None, params=None):
+        """
+        Defines a Sumo Logic Put operation
+        """
+        return await self._request('PUT', method, data=json.dumps(data), \
+            headers=headers, params=params)
+
+    async def aclose(self):
+        """
+        Closes the connection pool
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def close(self):
+        """
+        Closes the client from outside the event loop
+        """
+        asyncio.run_coroutine_threadsafe(self.aclose(), ENGINE.loop).result()
+
+    async def get_myfolders(self):
+        """
+        Using an HTTP client, this uses a GET to retrieve all information.
+        """
+        return json.loads(await self.get("/v2/content/folders/personal/"))
+
+    async def get_myfolder(self, myself):
+        """
+        Using an HTTP client, this uses a GET to retrieve single information.
+        """
+        return json.loads(await self.get("/v2/content/folders/" + str(myself)))
+
+    async def get_globalfolder_job(self):
+        """
+        Using an HTTP client, this uses a GET to retrieve all information.
+        """
+        return json.loads(await self.get("/v2/content/folders/global"))
+
+    async def get_globalfolder_job_status(self, myself):
+        """
+        Using an HTTP client, this uses a GET to retrieve single information.
+        """
+        url = "/v2/content/folders/global/" + str(myself) + "/status"
+        return json.loads(await self.get(url))
+
+    async def get_globalfolder_job_result(self, myself):
+        """
+        Using an HTTP client, this uses a GET to retrieve single information.
+        """
+        url = "/v2/content/folders/global/" + str(myself) + "/result"
+        return json.loads(await self.get(url))
+
+    async def start_export_job(self, myself):
+        """
+        Using an HTTP client, this starts an export job by passing in the content ID
+        """
+        url = "/v2/content/" + str(myself) + "/export"
+        return json.loads(await self.post(url, data=str(myself)))
+
+    async def check_export_job_status(self, myself, jobid):
+        """
+        Using an HTTP client, this checks the status of an export job
+        """
+        url = "/v2/content/" + str(myself) + "/export/" + str(jobid) + "/status"
+        return json.loads(await self.get(url))
+
+    async def check_export_job_result(self, myself, jobid):
+        """
+        Using an HTTP client, this retrieves the result of an export job
+        """
+        url = "/v2/content/" + str(myself) + "/export/" + str(jobid) + "/result"
+        return json.loads(await self.get(url))
+
+    async def create_folder(self, name, parentid, description='', adminmode=False):
+        """
+        Using an HTTP client, this uses a POST to create a folder in a parent folder
+        """
+        headers = {'isAdminMode': 'true'} if adminmode else None
+        return json.loads(await self.post("/v2/content/folders", data={'name': name, \
+            'description': description, 'parentId': str(parentid)}, headers=headers))
+
+    async def start_import_job(self, folderid, definition, overwrite=False, adminmode=False):
+        """
+        Using an HTTP client, this starts an import job of a content definition into a folder
+        """
+        url = "/v2/content/folders/" + str(folderid) + "/import"
+        headers = {'isAdminMode': 'true'} if adminmode else None
+        return json.loads(await self.post(url, data=definition, headers=headers, \
+            params={'overwrite': 'true' if overwrite else 'false'}))
+
+    async def check_import_job_status(self, folderid, jobid, adminmode=False):
+        """
+        Using an HTTP client, this checks the status of an import job into a folder
+        """
+        url = "/v2/content/folders/" + str(folderid) + "/import/" + str(jobid) + "/status"
+        headers = {'isAdminMode': 'true'} if adminmode else None
+        return json.loads(await self.get(url, headers=headers))
+
 if __name__ == '__main__':
     main()
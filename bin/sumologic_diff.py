@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Reports what changed between two sumologic_backup runs
+
+Items are matched by id across the manifest indexes of the two runs, so added,
+removed, moved, and renamed items come out of a few SQL joins. Only the exports
+of items in both runs are compared: hardlinked files, equal blob digests, and
+equal bytes are skipped without parsing, and the rest are compared structurally.
+
+Usage:
+   $ python  sumologic_diff  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           sumologic_diff
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+import sumologic_backup
+
+sys.dont_write_bytecode = 1
+
+PARSER = argparse.ArgumentParser(description="""
+
+Compares two backup runs and writes a JSON report of what changed
+
+""")
+
+PARSER.add_argument("-a", metavar='<oldrun>', dest='OLDRUN', required=True, \
+                    help="set the earlier run directory")
+
+PARSER.add_argument("-b", metavar='<newrun>', dest='NEWRUN', required=True, \
+                    help="set the later run directory")
+
+PARSER.add_argument("-o", metavar='<reportfile>', dest='REPORTFILE', default=None, \
+                    help="write the report to a file (default: stdout)")
+
+PARSER.add_argument("-m", action='store_true', default=False, dest='TRUSTMODIFIED', \
+                    help="treat items with an unchanged modified time as unchanged")
+
+PARSER.add_argument("-s", action='store_true', default=False, dest='SUMMARY', \
+                    help="only report the counts of each kind of change")
+
+PARSER.add_argument("-v", type=int, default=0, metavar='<verbose>', \
+                    dest='verbose', help="increase verbosity")
+
+COLUMNS = ('id', 'parent', 'type', 'name', 'path', 'backupname', 'backuppath', 'modified')
+
+def attach_manifest(connection, schema, rundir):
+    """
+    Attaches the manifest index of a run, or loads its JSONL manifest if it has no index
+    """
+
+    manifestdir = os.path.join(rundir, 'manifest')
+    indexfile = os.path.join(manifestdir, sumologic_backup.MANIFESTDBNAME)
+    if os.path.isfile(indexfile):
+        connection.execute(f'ATTACH DATABASE ? AS {schema}', \
+            (f'file:{os.path.abspath(indexfile)}?mode=ro',))
+        return
+
+    jsonfile = os.path.join(manifestdir, sumologic_backup.MANIFESTJSONNAME)
+    if not os.path.isfile(jsonfile):
+        print(f'Manifest Not Found :: {rundir}')
+        sys.exit(1)
+    connection.execute(f'ATTACH DATABASE \':memory:\' AS {schema}')
+    connection.execute(f'CREATE TABLE {schema}.items ({", ".join(COLUMNS)})')
+    connection.execute(f'CREATE UNIQUE INDEX {schema}.items_id ON items (id)')
+    with open(jsonfile, 'r', encoding='utf8') as jsonobject:
+        connection.executemany(f'INSERT OR REPLACE INTO {schema}.items VALUES ' + \
+            f'({", ".join("?" * len(COLUMNS))})', \
+            ([ item.get(column) for column in COLUMNS ] \
+             for item in map(json.loads, jsonobject)))
+
+def select_items(connection, query):
+    """
+    Yields the rows of a query as dictionaries
+    """
+
+    cursor = connection.execute(query)
+    names = [ column[0] for column in cursor.description ]
+    for row in cursor:
+        yield dict(zip(names, row))
+
+def compare_manifests(connection):
+    """
+    Returns the added, removed, and relocated items, and the pairs of items in both runs
+    """
+
+    itemcolumns = ', '.join(f'{{0}}.{column}' for column in COLUMNS)
+    added = list(select_items(connection, f'SELECT {itemcolumns.format("n")} ' + \
+        'FROM new.items n LEFT JOIN old.items o ON o.id = n.id WHERE o.id IS NULL ORDER BY n.path'))
+    removed = list(select_items(connection, f'SELECT {itemcolumns.format("o")} ' + \
+        'FROM old.items o LEFT JOIN new.items n ON n.id = o.id WHERE n.id IS NULL ORDER BY o.path'))
+
+    relocated = []
+    for item in select_items(connection, 'SELECT n.id, n.type, o.parent AS old_parent, ' + \
+            'n.parent AS new_parent, o.name AS old_name, n.name AS new_name, ' + \
+            'o.path AS old_path, n.path AS new_path FROM new.items n JOIN old.items o ' + \
+            'ON o.id = n.id WHERE o.parent IS NOT n.parent OR o.name IS NOT n.name ' + \
+            'ORDER BY n.path'):
+        item['change'] = 'moved' if item['old_parent'] != item['new_parent'] else 'renamed'
+        relocated.append(item)
+
+    common = select_items(connection, 'SELECT n.id, n.type, n.path, ' + \
+        'o.backuppath AS old_backuppath, n.backuppath AS new_backuppath, ' + \
+        'o.modified AS old_modified, n.modified AS new_modified FROM new.items n ' + \
+        'JOIN old.items o ON o.id = n.id WHERE n.type != \'Folder\' ORDER BY n.path')
+    return added, removed, relocated, common
+
+def compare_exports(old, new, path=''):
+    """
+    Returns the differences between two exports, each with the JSON pointer where it is
+    """
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in sorted(set(old) | set(new), key=str):
+            pointer = f'{path}/{str(key).replace("~", "~0").replace("/", "~1")}'
+            if key not in new:
+                changes.append({'op': 'removed', 'path': pointer, 'old': old[key]})
+            elif key not in old:
+                changes.append({'op': 'added', 'path': pointer, 'new': new[key]})
+            else:
+                changes.extend(compare_exports(old[key], new[key], pointer))
+        return changes
+
+    if isinstance(old, list) and isinstance(new, list):
+        changes = []
+        for position in range(max(len(old), len(new))):
+            pointer = f'{path}/{position}'
+            if position >= len(new):
+                changes.append({'op': 'removed', 'path': pointer, 'old': old[position]})
+            elif position >= len(old):
+                changes.append({'op': 'added', 'path': pointer, 'new': new[position]})
+            else:
+                changes.extend(compare_exports(old[position], new[position], pointer))
+        return changes
+
+    if old == new and type(old) is type(new):
+        return []
+    return [ {'op': 'changed', 'path': path or '/', 'old': old, 'new': new} ]
+
+def compare_content(oldrun, newrun, pair, trustmodified=False):
+    """
+    Returns how an item in both runs compares, as unchanged, missing, or a list of changes,
+    reading and parsing its exports only when cheaper checks cannot tell
+    """
+
+    if trustmodified and pair['old_modified'] and pair['old_modified'] == pair['new_modified']:
+        return 'unchanged', None
+
+    olddigest = oldrun.digest(pair['id'])
+    newdigest = newrun.digest(pair['id'])
+    if olddigest is not None and olddigest == newdigest:
+        return 'unchanged', None
+
+    oldstat = oldrun.stat(pair['old_backuppath'])
+    newstat = newrun.stat(pair['new_backuppath'])
+    if oldstat is not None and oldstat == newstat:
+        return 'unchanged', None
+
+    oldpayload = oldrun.payload(pair['id'], pair['old_backuppath'])
+    newpayload = newrun.payload(pair['id'], pair['new_backuppath'])
+    if oldpayload is None or newpayload is None:
+        return 'missing', None
+    if oldpayload == newpayload:
+        return 'unchanged', None
+
+    changes = compare_exports(json.loads(oldpayload), json.loads(newpayload))
+    if not changes:
+        return 'unchanged', None
+    return 'changed', {'id': pair['id'], 'type': pair['type'], 'path': pair['path'], \
+        'old_modified': pair['old_modified'], 'new_modified': pair['new_modified'], \
+        'old_digest': olddigest or hashlib.sha256(oldpayload).hexdigest(), \
+        'new_digest': newdigest or hashlib.sha256(newpayload).hexdigest(), \
+        'changes': changes}
+
+def main(argv=None):
+    """
+    Compares the manifests of two runs, then the exports of the items in both
+    """
+
+    args = PARSER.parse_args(argv)
+    starttime = time.perf_counter()
+
+    connection = sqlite3.connect(':memory:', uri=True)
+    attach_manifest(connection, 'old', args.OLDRUN)
+    attach_manifest(connection, 'new', args.NEWRUN)
+    (added, removed, relocated, common) = compare_manifests(connection)
+
+    counts = {'added': len(added), 'removed': len(removed), \
+              'moved': sum(1 for item in relocated if item['change'] == 'moved'), \
+              'renamed': sum(1 for item in relocated if item['change'] == 'renamed'), \
+              'changed': 0, 'unchanged': 0, 'missing': 0}
+    changed = []
+    missing = []
+    with RunContent(args.OLDRUN) as oldrun, RunContent(args.NEWRUN) as newrun:
+        for pair in common:
+            (status, change) = compare_content(oldrun, newrun, pair, args.TRUSTMODIFIED)
+            counts[status] += 1
+            if status == 'changed':
+                changed.append(change)
+            elif status == 'missing':
+                missing.append(pair['id'])
+    connection.close()
+
+    report = {'old': os.path.abspath(args.OLDRUN), 'new': os.path.abspath(args.NEWRUN), \
+              'summary': counts}
+    if not args.SUMMARY:
+        report.update(added=added, removed=removed, relocated=relocated, changed=changed, \
+                      missing=missing)
+
+    if args.REPORTFILE:
+        with open(f'{args.REPORTFILE}.tmp', 'w', encoding='utf8') as reportobject:
+            json.dump(report, reportobject, indent=4)
+        os.replace(f'{args.REPORTFILE}.tmp', args.REPORTFILE)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        sys.stdout.write('\n')
+
+    if args.verbose > 0:
+        elapsed = time.perf_counter() - starttime
+        print(f'Compared: {counts["unchanged"] + counts["changed"] + counts["missing"]} ' + \
+              f'items in {elapsed:.2f} seconds - ' + \
+              ' - '.join(f'{count} {kind}' for kind, count in counts.items()), file=sys.stderr)
+
+### class ###
+
+class RunContent():
+    """
+    Reads the exports of a run from whichever layout it was written in: a content tree,
+    a blob snapshot, a pack, or archive parts. Digests and file identities are offered
+    where the layout has them, so unchanged items can be skipped without reading them.
+    """
+
+    def __init__(self, rundir):
+        """
+        Finds the layout of the run and opens it
+        """
+        self.rundir = rundir
+        self.contentdir = os.path.join(rundir, 'content')
+        self.digests = {}
+        self.objectdir = None
+        self.pack = None
+        self.members = {}
+        self.spooldir = None
+        self.archives = []
+
+        snapshotfile = os.path.join(rundir, 'manifest', sumologic_backup.SNAPSHOTNAME)
+        if os.path.isfile(snapshotfile):
+            self.objectdir = os.path.join(os.path.dirname(os.path.abspath(rundir)), 'objects')
+            with open(snapshotfile, 'r', encoding='utf8') as snapshotobject:
+                for line in snapshotobject:
+                    entry = json.loads(line)
+                    self.digests[entry['id']] = entry['digest']
+        elif os.path.isfile(os.path.join(rundir, sumologic_backup.PACKINDEXNAME)):
+            self.pack = sumologic_backup.PackReader(rundir)
+        elif not os.path.isdir(self.contentdir):
+            for archivefile in sorted(glob.glob(os.path.join(rundir, 'content*.zip')) + \
+                                      glob.glob(os.path.join(rundir, 'content*.tar.*'))):
+                self.open_archive(archivefile)
+
+    def open_archive(self, archivefile):
+        """
+        Indexes the entries of an archive part. Compressed tars are unpacked to a spool
+        file once, so their entries can be read in any order.
+        """
+        if archivefile.endswith('.zip'):
+            archive = zipfile.ZipFile(archivefile, 'r')
+            for name in archive.namelist():
+                self.members[name] = (archive, name)
+        else:
+            if self.spooldir is None:
+                self.spooldir = tempfile.mkdtemp(prefix='sumologic_diff.')
+            spoolfile = os.path.join(self.spooldir, f'{len(self.archives)}.tar')
+            with open(archivefile, 'rb') as archiveobject, \
+                 open(spoolfile, 'wb') as spoolobject:
+                if archivefile.endswith('.zst'):
+                    reader = sumologic_backup.load_zstandard().ZstdDecompressor().stream_reader( \
+                        archiveobject)
+                else:
+                    reader = gzip.GzipFile(fileobj=archiveobject, mode='rb')
+                with reader:
+                    shutil.copyfileobj(reader, spoolobject)
+            archive = tarfile.open(spoolfile, 'r:')
+            for member in archive:
+                self.members[member.name] = (archive, member)
+        self.archives.append(archive)
+
+    def digest(self, contentid):
+        """
+        Returns the blob digest of an item, if the run keeps digests
+        """
+        return self.digests.get(contentid)
+
+    def stat(self, backuppath):
+        """
+        Returns the device and inode of the file of an item in a content tree, or None.
+        Incremental runs hardlink unchanged files, so the same inode means the same export.
+        """
+        if self.objectdir is not None or self.pack is not None or self.archives:
+            return None
+        try:
+            stat = os.stat(os.path.join(self.contentdir, backuppath) + '.json')
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def payload(self, contentid, backuppath):
+        """
+        Returns the export bytes of an item, or None if the run does not hold it
+        """
+        try:
+            if self.objectdir is not None:
+                digest = self.digests.get(contentid)
+                if digest is None:
+                    return None
+                filename = os.path.join(self.objectdir, digest[:2], digest[2:]) + '.json'
+            elif self.pack is not None:
+                entry = self.pack.find(contentid)
+                return None if entry is None else self.pack.payload(entry)
+            elif self.archives:
+                (archive, member) = self.members.get(f'content/{backuppath}.json', (None, None))
+                if archive is None:
+                    return None
+                if isinstance(archive, zipfile.ZipFile):
+                    return archive.read(member)
+                return archive.extractfile(member).read()
+            else:
+                filename = os.path.join(self.contentdir, backuppath) + '.json'
+            with open(filename, 'rb') as backupobject:
+                return backupobject.read()
+        except (OSError, KeyError):
+            return None
+
+    def close(self):
+        """
+        Closes the pack or archives, and removes any spooled tars
+        """
+        if self.pack is not None:
+            self.pack.close()
+        for archive in self.archives:
+            archive.close()
+        if self.spooldir is not None:
+            shutil.rmtree(self.spooldir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+if __name__ == '__main__':
+    main()
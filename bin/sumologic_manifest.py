@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Finds content in the manifest index of a sumologic_backup run
+
+Looks up an item, the children of a folder, or everything below an item or a
+path, using the SQLite index each run writes to its manifest folder.
+
+Usage:
+   $ python  sumologic_manifest  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           sumologic_manifest
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import sumologic_backup
+
+sys.dont_write_bytecode = 1
+
+PARSER = argparse.ArgumentParser(description="""
+
+Finds content in the manifest index of a backup run, by id, folder, or path
+
+""")
+
+PARSER.add_argument("-m", metavar='<manifest>', dest='MANIFEST', required=True, \
+                    help="set run directory, manifest directory, or manifest index file")
+
+PARSER.add_argument("-i", metavar='<id>', dest='ITEMID', \
+                    help="show the item with this id")
+
+PARSER.add_argument("-c", metavar='<id>', dest='CHILDREN', \
+                    help="list the children of the folder with this id")
+
+PARSER.add_argument("-s", metavar='<id>', dest='SUBTREE', \
+                    help="list the item with this id and everything below it")
+
+PARSER.add_argument("-p", metavar='<path>', dest='PATH', \
+                    help="list the item at this path and everything below it")
+
+PARSER.add_argument("-t", metavar='<type>', dest='ITEMTYPE', \
+                    help="only list items of this type, for example Folder or Search")
+
+PARSER.add_argument("-f", default='csv', metavar='<format>', choices=['csv', 'jsonl'], \
+                    dest='FORMAT', help="set output format: csv, jsonl (default: csv)")
+
+PARSER.add_argument("-v", type=int, default=0, metavar='<verbose>', \
+                    dest='verbose', help="increase verbosity")
+
+MANIFESTDBNAME = sumologic_backup.MANIFESTDBNAME
+
+COLUMNS = ('id', 'parent', 'type', 'name', 'path', 'backupname', 'backuppath', 'modified')
+
+def find_index(manifest):
+    """
+    Returns the manifest index file for a run directory, manifest directory, or index file
+    """
+
+    for candidate in (manifest, os.path.join(manifest, MANIFESTDBNAME), \
+                      os.path.join(manifest, 'manifest', MANIFESTDBNAME)):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+def write_items(items, outputformat):
+    """
+    Writes items to stdout, returning how many there were
+    """
+
+    count = 0
+    if outputformat == 'csv':
+        csvwriter = csv.writer(sys.stdout)
+        csvwriter.writerow(COLUMNS)
+        for item in items:
+            csvwriter.writerow([ item[column] for column in COLUMNS ])
+            count += 1
+    else:
+        for item in items:
+            sys.stdout.write(json.dumps(item) + '\n')
+            count += 1
+    return count
+
+def main(argv=None):
+    """
+    Opens the manifest index, runs the query asked for, and writes out what it found
+    """
+
+    args = PARSER.parse_args(argv)
+
+    indexfile = find_index(args.MANIFEST)
+    if indexfile is None:
+        print(f'Manifest Not Found :: {args.MANIFEST}')
+        sys.exit(1)
+
+    starttime = time.perf_counter()
+    manifest = ManifestIndex(indexfile)
+    if args.ITEMID:
+        item = manifest.item(args.ITEMID)
+        items = [ item ] if item is not None else []
+    elif args.CHILDREN:
+        items = manifest.children(args.CHILDREN, args.ITEMTYPE)
+    elif args.SUBTREE:
+        items = manifest.subtree(args.SUBTREE, args.ITEMTYPE)
+    elif args.PATH:
+        items = manifest.below(args.PATH, args.ITEMTYPE)
+    else:
+        items = manifest.every(args.ITEMTYPE)
+
+    count = write_items(items, args.FORMAT)
+    manifest.close()
+
+    if args.verbose > 0:
+        elapsed = (time.perf_counter() - starttime) * 1000
+        print(f'Found: {count} items in {elapsed:.1f} ms', file=sys.stderr)
+
+### class ###
+
+class ManifestIndex():
+    """
+    Read only view of the SQLite manifest index of a run. Items are keyed by id, and
+    indexed by parent, type, path, and backup path. Backup paths are id paths, so the
+    items below an item are a single range of the backup path index.
+    """
+
+    def __init__(self, indexfile):
+        """
+        Opens the index read only
+        """
+        self.connection = sqlite3.connect(f'file:{os.path.abspath(indexfile)}?mode=ro', \
+            uri=True)
+        self.connection.row_factory = sqlite3.Row
+
+    def _select(self, where, params, itemtype=None):
+        """
+        Yields the items matching a condition, and a type if one is given
+        """
+        if itemtype is not None:
+            where = f'({where}) AND type = ?'
+            params = tuple(params) + (itemtype,)
+        for row in self.connection.execute(f'SELECT {", ".join(COLUMNS)} FROM items ' + \
+                                           f'WHERE {where}', params):
+            yield dict(row)
+
+    def item(self, itemid):
+        """
+        Returns the item with an id, or None
+        """
+        for item in self._select('id = ?', (itemid,)):
+            return item
+        return None
+
+    def children(self, itemid, itemtype=None):
+        """
+        Yields the children of a folder
+        """
+        return self._select('parent = ?', (itemid,), itemtype)
+
+    def subtree(self, itemid, itemtype=None):
+        """
+        Yields an item and everything below it
+        """
+        item = self.item(itemid)
+        if item is None:
+            return iter(())
+        return self._below('backuppath', item['backuppath'], itemtype)
+
+    def below(self, path, itemtype=None):
+        """
+        Yields the item at a name path and everything below it
+        """
+        return self._below('path', path.rstrip('/'), itemtype)
+
+    def _below(self, column, prefix, itemtype=None):
+        """
+        Yields the items whose column is a prefix, or starts with the prefix and a slash
+        """
+        return self._select(f'{column} = ? OR ({column} > ? AND {column} < ?)', \
+            (prefix, f'{prefix}/', f'{prefix}0'), itemtype)
+
+    def every(self, itemtype=None):
+        """
+        Yields every item
+        """
+        return self._select('1 = 1', (), itemtype)
+
+    def close(self):
+        """
+        Closes the index
+        """
+        self.connection.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Backs up many Sumo Logic orgs at once with sumologic_backup
+
+Each section of a multi-profile config file is one org. Orgs are backed up in
+a process pool, one fresh process per org so a failure stays with its org,
+each at the SUMO_RPS rate limit of its own section. Progress is reported
+for every running org, and a combined summary is written at the end.
+
+Usage:
+   $ python  sumologic_multiorg  [ options ] [ -- backup options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           sumologic_multiorg
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import concurrent.futures
+import configparser
+import contextlib
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+import sumologic_backup
+
+sys.dont_write_bytecode = 1
+
+PARSER = argparse.ArgumentParser(description="""
+
+Backs up every org in a multi-profile config file, several orgs at a time
+
+""")
+
+PARSER.add_argument("-c", metavar='<configfile>', dest='CONFIG', required=True, \
+                    help="Specify config file, with one section per org")
+
+PARSER.add_argument("-p", metavar='<profiles>', dest='PROFILES', default=None, \
+                    help="set comma separated sections to back up (default: all orgs)")
+
+PARSER.add_argument("-t", metavar='<target>', dest='BACKUPTARGET', \
+                    default='Personal', help="Specify backup target (Personal or Global)")
+
+PARSER.add_argument("-o", metavar='<outputdir>', dest='OUTPUTDIR', \
+                    default='/var/tmp/sumologic-backup', \
+                    help="Specify output dir, one folder per org")
+
+PARSER.add_argument("-j", type=int, default=4, metavar='<orgs>', \
+                    dest='ORGS', help="set number of orgs backed up at once (default: 4)")
+
+PARSER.add_argument("-v", type=int, default=4, metavar='<verbose>', \
+                    dest='verbose', help="increase verbosity")
+
+PARSER.add_argument('BACKUPOPTIONS', nargs=argparse.REMAINDER, \
+                    help="extra options for every sumologic_backup run, after --")
+
+PROGRESS_INTERVAL = 5.0
+
+SUMMARYNAME = f'{sumologic_backup.REPORTTAG}.multiorg.json'
+
+LOGNAME = f'{sumologic_backup.REPORTTAG}.log'
+
+PROGRESS = None
+
+def list_profiles(configfile, profiles=None):
+    """
+    Returns the sections to back up: those asked for, or every section with its own
+    SUMO_UID, or Default alone if no other section has one
+    """
+
+    configobj = configparser.ConfigParser()
+    configobj.optionxform = str
+    configobj.read(os.path.abspath(configfile))
+
+    if profiles:
+        selected = [ profile.strip() for profile in profiles.split(',') if profile.strip() ]
+        missing = [ profile for profile in selected if not configobj.has_section(profile) ]
+        if missing:
+            print(f'Profile Not Found :: {", ".join(missing)}')
+            sys.exit(1)
+        return selected
+
+    selected = [ section for section in configobj.sections() \
+                 if section != 'Default' and configobj.has_option(section, 'SUMO_UID') ]
+    return selected or [ 'Default' ]
+
+def initialize_worker(progress):
+    """
+    Keeps the shared progress queue in each worker process
+    """
+
+    global PROGRESS
+    PROGRESS = progress
+
+def report_progress(profile, stopped):
+    """
+    Sends the stage and item counts of the running backup until it stops
+    """
+
+    while not stopped.wait(PROGRESS_INTERVAL / 2):
+        metrics = sumologic_backup.METRICS
+        PROGRESS.put((profile, metrics.current, metrics.counters['items_exported'] + \
+            metrics.counters['items_carried'], metrics.counters['items_failed']))
+
+def backup_org(profile, argv, orgdir):
+    """
+    Runs the backup of one org in this worker process, with its output in a log file,
+    and returns its summary. Any failure is reported in the summary, not raised.
+    """
+
+    summary = {'profile': profile, 'status': 'ok', 'error': None, 'outputdir': orgdir}
+    os.makedirs(orgdir, exist_ok = True)
+    stopped = threading.Event()
+    threading.Thread(target=report_progress, args=(profile, stopped), daemon=True).start()
+
+    starttime = time.time()
+    with open(os.path.join(orgdir, LOGNAME), 'a', encoding='utf8') as logobject, \
+         contextlib.redirect_stdout(logobject):
+        try:
+            sumologic_backup.main(argv)
+        except SystemExit as myexit:
+            if myexit.code not in (None, 0):
+                summary.update(status='failed', error=f'exit {myexit.code}')
+        except Exception as myerror: # pylint: disable=broad-except
+            summary.update(status='failed', error=repr(myerror))
+        if summary['error'] is not None:
+            print(f'Failed: {profile} - {summary["error"]}')
+    stopped.set()
+
+    report = sumologic_backup.METRICS.report()
+    runs = sorted(d for d in os.listdir(orgdir) if sumologic_backup.RUNPATTERN.match(d))
+    summary.update(seconds=time.time() - starttime, requests=report['requests'], \
+        exported=report['counters'].get('items_exported', 0), \
+        carried=report['counters'].get('items_carried', 0), \
+        failed=report['counters'].get('items_failed', 0), \
+        rundir=os.path.join(orgdir, runs[-1]) if runs else None)
+    return summary
+
+def print_progress(running, progress, finished, total):
+    """
+    Prints one line with the stage and items done of every running org
+    """
+
+    states = []
+    for profile in running:
+        (stage, done, failed) = progress.get(profile, ('starting', 0, 0))
+        states.append(f'{profile} {stage or "starting"} {done}' + \
+                      (f'/{failed} failed' if failed else ''))
+    print(f'Progress: {finished}/{total} orgs done - ' + ' - '.join(states), flush=True)
+
+def print_summary(summaries, elapsed):
+    """
+    Prints the combined summary of every org
+    """
+
+    print(f'{"profile":<24} {"status":<8} {"exported":>9} {"unchanged":>10} ' + \
+          f'{"failed":>7} {"seconds":>8}  error')
+    for summary in summaries:
+        print(f'{summary["profile"]:<24} {summary["status"]:<8} {summary["exported"]:>9} ' + \
+              f'{summary["carried"]:>10} {summary["failed"]:>7} {summary["seconds"]:>8.1f}  ' + \
+              f'{(summary["error"] or "")[:80]}')
+    failed_orgs = sum(1 for summary in summaries if summary['status'] != 'ok')
+    print(f'Completed: {len(summaries)} orgs in {elapsed:.1f} seconds - ' + \
+          f'{len(summaries) - failed_orgs} ok - {failed_orgs} failed - ' + \
+          f'{sum(summary["exported"] for summary in summaries)} items exported')
+
+def main(argv=None):
+    """
+    Backs up each selected org in its own process, a few at a time, then summarizes
+    """
+
+    args = PARSER.parse_args(argv)
+    profiles = list_profiles(args.CONFIG, args.PROFILES)
+    extra = [ option for option in args.BACKUPOPTIONS if option != '--' ]
+    outputdir = os.path.abspath(args.OUTPUTDIR)
+    os.makedirs(outputdir, exist_ok = True)
+
+    context = multiprocessing.get_context('spawn')
+    progress_queue = context.Queue()
+    progress = {}
+    summaries = []
+    starttime = time.time()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(args.ORGS, 1), \
+            mp_context=context, max_tasks_per_child=1, initializer=initialize_worker, \
+            initargs=(progress_queue,)) as executor:
+        pending = {}
+        for profile in profiles:
+            orgdir = os.path.join(outputdir, re.sub(r'[^0-9A-Za-z_.-]', '_', profile))
+            backupargv = ['-c', os.path.abspath(args.CONFIG), '-p', profile, \
+                          '-t', args.BACKUPTARGET, '-o', orgdir] + extra
+            pending[executor.submit(backup_org, profile, backupargv, orgdir)] = profile
+
+        running = list(profiles)
+        while pending:
+            done, _not_done = concurrent.futures.wait(pending, timeout=PROGRESS_INTERVAL, \
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                profile = pending.pop(future)
+                running.remove(profile)
+                try:
+                    summary = future.result()
+                except Exception as myerror: # pylint: disable=broad-except
+                    summary = {'profile': profile, 'status': 'failed', 'error': repr(myerror), \
+                        'seconds': 0.0, 'requests': 0, 'exported': 0, 'carried': 0, \
+                        'failed': 0, 'outputdir': None, 'rundir': None}
+                summaries.append(summary)
+                if args.verbose > 4:
+                    print(f'Finished: {profile} - {summary["status"]}', flush=True)
+
+            while True:
+                try:
+                    (profile, stage, items, failed) = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+                progress[profile] = (stage, items, failed)
+
+            if pending and args.verbose > 3:
+                print_progress([ profile for profile in running if profile in progress ] or \
+                    running[:args.ORGS], progress, len(summaries), len(profiles))
+
+    elapsed = time.time() - starttime
+    summaries.sort(key=lambda summary: profiles.index(summary['profile']))
+    print_summary(summaries, elapsed)
+
+    summaryfile = os.path.join(outputdir, SUMMARYNAME)
+    with open(f'{summaryfile}.tmp', 'w', encoding='utf8') as summaryobject:
+        json.dump({'started': starttime, 'elapsed': elapsed, 'orgs': summaries}, \
+            summaryobject, indent=4)
+    os.replace(f'{summaryfile}.tmp', summaryfile)
+
+    if any(summary['status'] != 'ok' for summary in summaries):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Explanation: Restores a sumologic_backup run into a Sumo Logic org
+
+Recreates the folder tree of a backup run below a destination folder, then
+imports every item into its new folder through content import jobs. Folder
+ids are mapped old to new once, up front, a level of the tree at a time with
+each level created concurrently. Imports are then kept in flight concurrently
+and polled until they finish. Progress is journaled so a restore can be resumed.
+
+Usage:
+   $ python  sumologic_restore  [ options ]
+
+Style:
+   Google Python Style Guide:
+   http://google.github.io/styleguide/pyguide.html
+
+    @name           sumologic_restore
+    @version        1.00
+    @author-name    Wayne Schmidt
+    @author-email   wschmidt@sumologic.com
+    @license-name   Apache 2.0
+    @license-url    https://www.apache.org/licenses/LICENSE-2.0
+"""
+
+__version__ = 1.00
+__author__ = "Wayne Schmidt (wschmidt@sumologic.com)"
+
+### beginning ###
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+import requests
+
+import sumologic_backup
+import sumologic_diff
+import sumologic_manifest
+
+sys.dont_write_bytecode = 1
+
+PARSER = argparse.ArgumentParser(description="""
+
+Restores the folders and content of a backup run into a Sumo Logic org
+
+""")
+
+PARSER.add_argument("-a", metavar='<secret>', dest='MY_SECRET', \
+                    help="set api (format: <key>:<secret>) ")
+
+PARSER.add_argument("-k", metavar='<client>', dest='MY_CLIENT', \
+                    help="set key (format: <site>_<orgid>) ")
+
+PARSER.add_argument("-c", metavar='<configfile>', dest='CONFIG', \
+                    help="Specify config file")
+
+PARSER.add_argument("-p", metavar='<profile>', dest='PROFILE', default='Default', \
+                    help="set config file section to use, on top of Default (default: Default)")
+
+PARSER.add_argument("-b", metavar='<backup>', dest='BACKUP', required=True, \
+                    help="set backup run directory, or the zip or tar.zst archive of a run")
+
+PARSER.add_argument("-d", metavar='<folderid>', dest='DESTINATION', default=None, \
+                    help="set folder to restore into (default: the Personal folder)")
+
+PARSER.add_argument("-j", type=int, default=8, metavar='<workers>', \
+                    dest='WORKERS', help="set number of concurrent import jobs (default: 8)")
+
+PARSER.add_argument("-w", type=float, default=600, metavar='<seconds>', \
+                    dest='JOBTIMEOUT', help="set deadline for each import job (default: 600)")
+
+PARSER.add_argument("-r", type=float, default=None, metavar='<rate>', dest='RATELIMIT', \
+                    help="set API requests per second, 0 for unlimited (default: SUMO_RPS, or 4)")
+
+PARSER.add_argument("-n", type=int, default=5, metavar='<retries>', \
+                    dest='RETRIES', help="set retries for throttled or failed API calls " + \
+                    "(default: 5)")
+
+PARSER.add_argument("--overwrite", action='store_true', default=False, dest='OVERWRITE', \
+                    help="replace content of the same name in a folder (default: False)")
+
+PARSER.add_argument("--admin", action='store_true', default=False, dest='ADMINMODE', \
+                    help="restore in admin mode, as needed for Global folders (default: False)")
+
+PARSER.add_argument("-v", type=int, default=4, metavar='<verbose>', \
+                    dest='verbose', help="increase verbosity")
+
+RESTORETAG = f'{sumologic_backup.REPORTTAG}.restore'
+
+JOBTIMES = None
+
+def unsafe_member(name):
+    """
+    Returns True if an archive member would be written outside the run directory
+    """
+
+    return name.startswith(('/', '\\')) or bool(os.path.splitdrive(name)[0]) or \
+        '..' in name.replace('\\', '/').split('/')
+
+def open_backup(backup):
+    """
+    Returns the run directory of a backup and a reader for its exports. The zipfile of
+    a run is unpacked to a temporary directory, except its content tree, which is read
+    from the zipfile as it is needed. A tar.zst archive of a run is unpacked whole.
+    """
+
+    if backup.endswith('.tar.zst') and os.path.isfile(backup):
+        rundir = tempfile.mkdtemp(prefix='sumologic_restore.')
+        try:
+            with open(backup, 'rb') as archiveobject, \
+                 sumologic_backup.load_zstandard().ZstdDecompressor().stream_reader( \
+                     archiveobject, read_across_frames=True) as reader, \
+                 tarfile.open(fileobj=reader, mode='r|') as archive:
+                if hasattr(tarfile, 'data_filter'):
+                    archive.extractall(rundir, filter='data')
+                else:
+                    for member in archive:
+                        if unsafe_member(member.name):
+                            raise tarfile.TarError(f'unsafe member {member.name}')
+                        if member.isfile() or member.isdir():
+                            archive.extract(member, rundir)
+        except tarfile.TarError as myerror:
+            shutil.rmtree(rundir, ignore_errors=True)
+            print(f'Archive Not Restorable :: {backup} - {myerror}')
+            sys.exit(1)
+        return rundir, sumologic_diff.RunContent(rundir)
+
+    if not zipfile.is_zipfile(backup):
+        return os.path.abspath(backup), sumologic_diff.RunContent(backup)
+
+    with zipfile.ZipFile(backup, 'r') as zipobject:
+        members = zipobject.namelist()
+        unsafe = [ name for name in members if unsafe_member(name) ]
+        if unsafe:
+            print(f'Archive Not Restorable :: {backup} - unsafe member {unsafe[0]}')
+            sys.exit(1)
+        rundir = tempfile.mkdtemp(prefix='sumologic_restore.')
+        zipobject.extractall(rundir, [ name for name in members \
+                                       if not name.startswith('content/') ])
+    content = sumologic_diff.RunContent(rundir)
+    if any(name.startswith('content/') for name in members):
+        content.open_archive(backup)
+    return rundir, content
+
+def load_items(rundir):
+    """
+    Returns every item in the manifest of a run, from its index or its JSONL manifest
+    """
+
+    manifestdir = os.path.join(rundir, 'manifest')
+    indexfile = os.path.join(manifestdir, sumologic_backup.MANIFESTDBNAME)
+    if os.path.isfile(indexfile):
+        index = sumologic_manifest.ManifestIndex(indexfile)
+        items = list(index.every())
+        index.close()
+        return items
+
+    jsonfile = os.path.join(manifestdir, sumologic_backup.MANIFESTJSONNAME)
+    if not os.path.isfile(jsonfile):
+        print(f'Manifest Not Found :: {rundir}')
+        sys.exit(1)
+    with open(jsonfile, 'r', encoding='utf8') as jsonobject:
+        return [ json.loads(line) for line in jsonobject ]
+
+def plan_restore(items):
+    """
+    Returns the folders of a run a tree level at a time, parents first, and its other items
+    """
+
+    itemids = { item['id'] for item in items }
+    children = collections.defaultdict(list)
+    for item in items:
+        children[item['parent'] if item['parent'] in itemids else None].append(item)
+
+    levels = []
+    contents = []
+    level = children[None]
+    while level:
+        contents.extend(item for item in level if item['type'] != 'Folder')
+        folders = [ item for item in level if item['type'] == 'Folder' ]
+        if folders:
+            levels.append(folders)
+        level = [ child for folder in folders for child in children[folder['id']] ]
+    return levels, contents
+
+def list_folder(source, folderid, adminmode):
+    """
+    Returns the names and ids of the folders already in a folder
+    """
+
+    headers = {'isAdminMode': 'true'} if adminmode else None
+    listing = json.loads(source.get(f'/v2/content/folders/{folderid}', headers=headers).text)
+    return { child['name']: child['id'] for child in listing.get('children', []) \
+             if child['itemType'] == 'Folder' }
+
+def map_folders(source, levels, destination, journal, args):
+    """
+    Maps every folder of the run to a folder in the org, a level at a time, reusing
+    folders that already exist, and returns the map of old to new folder ids
+    """
+
+    folders = dict(journal.folders)
+    existing = {destination: None}
+    roots = { folder['id'] for folder in levels[0] } if levels else set()
+    failed = 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(args.WORKERS, 1)) as executor:
+        for level in levels:
+            pending = {}
+            for folder in level:
+                if folder['id'] in folders:
+                    continue
+                name = folder['name'].lstrip('/')
+                if folder['parent'] in folders:
+                    parentid = folders[folder['parent']]
+                elif folder['id'] in roots:
+                    if name == 'Personal' and args.DESTINATION is None:
+                        folders[folder['id']] = destination
+                        continue
+                    parentid = destination
+                else:
+                    failed += 1
+                    sumologic_backup.METRICS.add('folders_failed')
+                    continue
+
+                if parentid in existing:
+                    if existing[parentid] is None:
+                        existing[parentid] = list_folder(source, parentid, args.ADMINMODE)
+                    if name in existing[parentid]:
+                        folders[folder['id']] = existing[parentid][name]
+                        existing[folders[folder['id']]] = None
+                        journal.folder(folder['id'], folders[folder['id']])
+                        continue
+
+                pending[executor.submit(source.create_folder, name, parentid, \
+                    adminmode=args.ADMINMODE)] = folder
+
+            for future in concurrent.futures.as_completed(pending):
+                folder = pending[future]
+                try:
+                    folders[folder['id']] = future.result()['id']
+                except requests.exceptions.RequestException as myerror:
+                    failed += 1
+                    sumologic_backup.METRICS.add('folders_failed')
+                    print(f'Failed: {folder["id"]} - {folder["path"]} - {myerror}')
+                    continue
+                journal.folder(folder['id'], folders[folder['id']])
+                sumologic_backup.METRICS.add('folders_created')
+                if args.verbose > 4:
+                    print(f'Creating: {folder["path"]} - {folders[folder["id"]]}')
+
+    if args.verbose > 3:
+        print(f'Mapped: {len(folders)} folders - {failed} failed')
+    return folders
+
+def import_item(source, folderid, definition, journal, contentid, args, priorjob=None):
+    """
+    Imports one item into a folder and waits for its import job, first polling once
+    most jobs so far would have finished
+    """
+
+    poller = sumologic_backup.JobPoller(args.JOBTIMEOUT)
+    if priorjob is not None:
+        try:
+            return poller.wait(lambda: source.check_import_job_status(folderid, priorjob, \
+                args.ADMINMODE), f'import job {priorjob}')
+        except (requests.exceptions.HTTPError, sumologic_backup.JobFailure):
+            pass
+
+    importjob = source.start_import_job(folderid, definition, args.OVERWRITE, \
+        args.ADMINMODE)['id']
+    journal.started(contentid, importjob)
+    polls = []
+    def get_status():
+        polls.append(None)
+        return source.check_import_job_status(folderid, importjob, args.ADMINMODE)
+
+    delay = JOBTIMES.estimate()
+    starttime = time.perf_counter()
+    jobstatus = poller.wait(get_status, f'import job {importjob}', delay)
+    if len(polls) == 1 and delay > 0:
+        JOBTIMES.record(delay * .9)
+    else:
+        JOBTIMES.record(time.perf_counter() - starttime)
+    return jobstatus
+
+def import_content(source, content, contents, folders, known, destination, journal, args):
+    """
+    Imports every item into its mapped folder, keeping up to args.WORKERS import jobs
+    in flight, and returns the items imported and the items that failed
+    """
+
+    starttime = time.time()
+    imported = 0
+    failed = 0
+    contents = iter(contents)
+    window = max(args.WORKERS, 1) * 2
+    pending = {}
+    exhausted = False
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(args.WORKERS, 1)) as executor:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                item = next(contents, None)
+                if item is None:
+                    exhausted = True
+                    break
+                if item['id'] in journal.done:
+                    continue
+
+                if item['parent'] in folders:
+                    folderid = folders[item['parent']]
+                elif item['parent'] not in known:
+                    folderid = destination
+                else:
+                    folderid = None
+                payload = content.payload(item['id'], item['backuppath']) \
+                    if folderid is not None else None
+                if payload is None:
+                    failed += 1
+                    sumologic_backup.METRICS.add('items_failed')
+                    print(f'Failed: {item["id"]} - {item["path"]} - ' + \
+                          ('no folder' if folderid is None else 'no export in backup'))
+                    continue
+
+                future = executor.submit(import_item, source, folderid, json.loads(payload), \
+                    journal, item['id'], args, journal.inflight.get(item['id']))
+                pending[future] = item
+
+            if not pending:
+                continue
+
+            done, _not_done = concurrent.futures.wait(pending, \
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    future.result()
+                except (requests.exceptions.RequestException, \
+                        sumologic_backup.JobFailure) as myerror:
+                    failed += 1
+                    sumologic_backup.METRICS.add('items_failed')
+                    print(f'Failed: {item["id"]} - {item["path"]} - {myerror}')
+                    continue
+
+                journal.finished(item['id'])
+                imported += 1
+                sumologic_backup.METRICS.add('items_imported')
+                if args.verbose > 4:
+                    print(f'Importing: {item["id"]} - {item["path"]}')
+
+    elapsed = time.time() - starttime
+    if args.verbose > 3:
+        rate = imported / elapsed if elapsed > 0 else 0.0
+        print(f'Completed: {imported} items in {elapsed:.1f} seconds - ' + \
+              f'{rate:.2f} items/sec - {failed} failed - {args.WORKERS} workers')
+    return imported, failed
+
+def main(argv=None):
+    """
+    Connects to the org, maps the folders of the run into it, then imports its content
+    """
+
+    global JOBTIMES
+    args = PARSER.parse_args(argv)
+    sumologic_backup.ARGS = args
+    JOBTIMES = JobTimes()
+    metrics = sumologic_backup.METRICS = sumologic_backup.RunMetrics()
+
+    if args.verbose > 3:
+        print("Step-001: - Authenticating")
+
+    with metrics.stage('authenticate'):
+        ( sumo_uid, sumo_key ) = sumologic_backup.initialize_variables()
+
+        if args.RATELIMIT is None:
+            args.RATELIMIT = float(os.environ.get('SUMO_RPS', 4))
+
+        source = sumologic_backup.SumoApiClient(sumo_uid, sumo_key, \
+            os.environ.get('SUMO_END') or os.environ.get('SUMO_LOC'), \
+            pool_size=args.WORKERS, \
+            limiter=sumologic_backup.TokenBucket(args.RATELIMIT), retries=args.RETRIES, \
+            endpoint_cache=os.path.expanduser(sumologic_backup.ENDPOINTCACHE))
+        destination = args.DESTINATION or source.get_myfolders()['id']
+
+    if args.verbose > 3:
+        print("Step-002: - Reading the backup manifest")
+
+    (rundir, content) = open_backup(args.BACKUP)
+    try:
+        with metrics.stage('plan'):
+            (levels, contents) = plan_restore(load_items(rundir))
+
+        if os.path.isdir(args.BACKUP):
+            journaldir = os.path.join(rundir, 'manifest')
+        else:
+            journaldir = os.path.dirname(os.path.abspath(args.BACKUP))
+        backupname = os.path.basename(os.path.normpath(args.BACKUP))
+        if backupname.startswith(f'{sumologic_backup.REPORTTAG}.'):
+            backupname = backupname[len(sumologic_backup.REPORTTAG) + 1:]
+        restoretag = f'{RESTORETAG}.{backupname}.{destination}'
+        journal = RestoreJournal(os.path.join(journaldir, f'{restoretag}.jsonl'))
+
+        if args.verbose > 3:
+            print(f'Step-003: - Mapping {sum(len(level) for level in levels)} folders ' + \
+                  f'into {destination}')
+
+        with metrics.stage('folders'):
+            folders = map_folders(source, levels, destination, journal, args)
+
+        if args.verbose > 3:
+            print(f'Step-004: - Importing {len(contents)} items')
+
+        with metrics.stage('import'):
+            (_imported, failed) = import_content(source, content, contents, folders, \
+                { folder['id'] for level in levels for folder in level }, destination, \
+                journal, args)
+        journal.close()
+    finally:
+        content.close()
+        if rundir != os.path.abspath(args.BACKUP):
+            shutil.rmtree(rundir, ignore_errors=True)
+
+    metrics.write_report(os.path.join(journaldir, f'{restoretag}.report.json'))
+    if failed or metrics.counters['folders_failed']:
+        sys.exit(1)
+
+### class ###
+
+class JobTimes():
+    """
+    Running estimate of how long import jobs take, shared by every worker, from a low
+    quantile of recent jobs
+    """
+
+    def __init__(self, window=200, quantile=.25):
+        """
+        Initializes an empty record of the last window jobs
+        """
+        self.durations = collections.deque(maxlen=window)
+        self.quantile = quantile
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        """
+        Records how long a job took
+        """
+        with self.lock:
+            self.durations.append(seconds)
+
+    def estimate(self):
+        """
+        Returns the seconds to wait before the first poll, none until a few jobs are done
+        """
+        with self.lock:
+            if len(self.durations) < 10:
+                return 0.0
+            ordered = sorted(self.durations)
+        return ordered[int(self.quantile * (len(ordered) - 1))]
+
+class RestoreJournal():
+    """
+    Append only journal of a restore. The new id of each folder, each import job started,
+    and each item imported are recorded as they happen, so a restore can be resumed.
+    """
+
+    def __init__(self, journalfile):
+        """
+        Opens the journal, loading the folders mapped, the items imported, and the jobs
+        left in flight
+        """
+        self.folders = {}
+        self.done = set()
+        self.inflight = {}
+        if os.path.exists(journalfile):
+            with open(journalfile, 'r', encoding='utf8') as journalobject:
+                for line in journalobject:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry['event'] == 'folder':
+                        self.folders[entry['id']] = entry['new']
+                    elif entry['event'] == 'started':
+                        self.inflight[entry['id']] = entry['job']
+                    elif entry['event'] == 'done':
+                        self.done.add(entry['id'])
+                        self.inflight.pop(entry['id'], None)
+        self.journal = open(journalfile, 'a', encoding='utf8', buffering=1)
+        self.lock = threading.Lock()
+
+    def _append(self, entry):
+        """
+        Appends an entry, one line at a time
+        """
+        with self.lock:
+            self.journal.write(json.dumps(entry) + '\n')
+
+    def folder(self, contentid, newid):
+        """
+        Records the new id of a folder
+        """
+        self._append({'id': contentid, 'event': 'folder', 'new': newid})
+
+    def started(self, contentid, importjob):
+        """
+        Records that an import job is in flight
+        """
+        self._append({'id': contentid, 'event': 'started', 'job': importjob})
+
+    def finished(self, contentid):
+        """
+        Records that an item has been imported
+        """
+        self._append({'id': contentid, 'event': 'done'})
+
+    def close(self):
+        """
+        Closes the journal
+        """
+        self.journal.close()
+
+if __name__ == '__main__':
+    main()